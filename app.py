@@ -1,5 +1,6 @@
 # app.py
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -8,29 +9,17 @@ load_dotenv(dotenv_path=Path(__file__).with_name(".env"), override=True)
 from config import Config
 
 from src.audio.record import record_wav
-from src.audio.tts import speak_text
-from src.data.dataset_ingest import ensure_index
-from src.data.retriever import CBTRetriever
-from src.llm.client import transcribe_audio, chat_completion
-from src.llm.prompt import (
-    build_messages,
-    safety_check,
-    safety_reply,
-    is_mostly_filler,
-    is_stop_intent,
-)
-
-# (opsional) pesan untuk filler
-FILLER_REPLY = (
-    "Aku denger kok. Nggak apa-apa kalau kamu lagi mikir atau jeda sebentar. "
-    "Lanjutkan aja pelan-pelan, aku dengerin."
-)
-
-# (opsional) pesan penutup saat user bilang "sudah/stop"
-STOP_REPLY = (
-    "Oke, kita berhenti dulu ya. Terima kasih sudah cerita—jaga diri baik-baik. "
-    "Kalau kapan-kapan kamu mau lanjut, aku siap dengerin. Sampai ketemu lagi."
-)
+from src.audio.tts import prepare_ack_clip, speak_text
+from src.audio.duplex import DuplexAudioEngine
+from src.audio.formats import tts_extension
+from src.data.index_service import IndexService
+from src.data.transcript_store import TranscriptStore
+from src.llm.client import transcribe_audio
+from src.llm.safety import build_semantic_safety
+from src.llm.scheduler import PRIORITY_INTERACTIVE, api_context
+from src.monitoring import metrics
+from src.pipeline.speculative import SpeculativeRetriever, make_partial_transcriber
+from src.pipeline.turn import run_text_turn
 
 
 def main():
@@ -41,61 +30,122 @@ def main():
     # set di .env: FORCE_REBUILD=1
     force_rebuild = os.getenv("FORCE_REBUILD", "0") == "1"
 
-    ensure_index(cfg, force_rebuild=force_rebuild)
-    retriever = CBTRetriever(cfg)
+    if cfg.METRICS_TRACEMALLOC:
+        metrics.enable_tracemalloc()
+
+    # index di-build di background kalau perlu; sementara turn dijawab tanpa RAG
+    retriever = IndexService(cfg, force_rebuild=force_rebuild, background=cfg.INDEX_BUILD_BACKGROUND)
+
+    # safety semantik (vektor query retrieval vs contoh kalimat krisis), di atas keyword
+    safety = build_semantic_safety(cfg, retriever)
+
+    # (opsional) retrieval spekulatif dari transkrip sementara saat user jeda
+    speculative = None
+    on_pause = None
+    if cfg.SPECULATIVE_RETRIEVAL:
+        speculative = SpeculativeRetriever(retriever, k=cfg.TOP_K, min_overlap=cfg.SPECULATIVE_MIN_OVERLAP)
+        on_pause = make_partial_transcriber(speculative, cfg.TMP_DIR, cfg.STT_MODEL)
+
+    metrics.serve_runtime_metrics(cfg, retriever, speculative)
+
+    # (opsional) full-duplex: playback di background + barge-in
+    engine = None
+    if cfg.FULL_DUPLEX:
+        engine = DuplexAudioEngine(
+            sample_rate=cfg.SAMPLE_RATE,
+            barge_in_threshold=cfg.BARGE_IN_THRESHOLD,
+            echo_coupling=cfg.ECHO_COUPLING,
+        ).start()
 
     in_wav = os.path.join(cfg.TMP_DIR, "user.wav")
-    out_audio = os.path.join(cfg.TMP_DIR, "assistant.mp3")
+    out_audio = os.path.join(cfg.TMP_DIR, "assistant" + tts_extension(cfg.TTS_FORMAT))
+
+    # klip "sebentar ya" untuk TTS yang lewat deadline (di-generate sekali, di-cache di TMP_DIR)
+    ack_clip = prepare_ack_clip(cfg.TMP_DIR, cfg.TTS_MODEL, cfg.TTS_VOICE) if cfg.TTS_DEADLINE_MS else None
+
+    # transcript sesi (append di-batch oleh thread writer, tidak menahan turn)
+    store = TranscriptStore(cfg.TRANSCRIPT_DB)
+    session_id = store.new_session(source="cli")
 
     print("Voice CBT Chatbot (HOPE+HQC RAG). Ctrl+C untuk keluar.\n")
 
+    try:
+        # semua panggilan API turn ini: prioritas interaktif, antrean fair per sesi
+        with api_context(PRIORITY_INTERACTIVE, session=session_id):
+            _conversation_loop(cfg, retriever, speculative, on_pause, engine, in_wav, out_audio,
+                               ack_clip, store, session_id, safety)
+    finally:
+        if engine is not None:
+            engine.close()
+        store.close()
+        print(f"🗂️ Transcript: {session_id} (python -m src.data.transcript_store export {session_id})")
+
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+def _conversation_loop(cfg, retriever, speculative, on_pause, engine, in_wav, out_audio,
+                       ack_clip, store, session_id, safety=None):
     while True:
         # A) Record
-        record_wav(in_wav, seconds=cfg.RECORD_SECONDS, sample_rate=cfg.SAMPLE_RATE)
+        if speculative:
+            speculative.begin_turn()
+        in_path = record_wav(in_wav, seconds=cfg.RECORD_SECONDS, sample_rate=cfg.SAMPLE_RATE,
+                             on_pause=on_pause, source=engine,
+                             upload_format=cfg.STT_UPLOAD_FORMAT,
+                             upload_sample_rate=cfg.STT_UPLOAD_SAMPLE_RATE,
+                             trim_silence=cfg.TRIM_SILENCE,
+                             max_pause_seconds=cfg.MAX_PAUSE_SECONDS,
+                             normalize_gain=cfg.NORMALIZE_GAIN)
+        if engine is not None and engine.barge_in.is_set():
+            print("✋ (barge-in: playback dihentikan)")
+            engine.barge_in.clear()
 
         # B) STT
-        user_text = transcribe_audio(in_wav, model=cfg.STT_MODEL)
+        t0 = time.perf_counter()
+        user_text = transcribe_audio(in_path, model=cfg.STT_MODEL)
         user_text = (user_text or "").strip()
+        timings = {"stt_ms": _ms_since(t0)}
 
         if not user_text:
             print("📝 (kosong) Coba ngomong lagi.\n")
             continue
 
         print(f"📝 You: {user_text}")
-
-        # ✅ B0) STOP INTENT: user bilang "sudah/stop/selesai" -> tutup sesi tanpa tanya lagi
-        if is_stop_intent(user_text):
-            reply = STOP_REPLY
-            print(f"😊 Therapist: {reply}\n")
-            speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
+        store.append(session_id, "user", user_text, timings=timings)
+
+        # C) Gate stop/filler/safety -> retrieve (HOPE + HQC) -> LLM
+        turn = run_text_turn(user_text, cfg, retriever, speculative=speculative, safety=safety)
+        if turn.speculative_hit is not None:
+            st = speculative.summary()
+            print(f"⚡ speculative {'hit' if turn.speculative_hit else 'miss'} "
+                  f"(hit rate {st['hit_rate']:.0%}, waste {st['waste_rate']:.0%})")
+
+        if turn.degraded:
+            print(f"⏱️ degraded: {', '.join(turn.degraded)}")
+
+        print(f"😊 Therapist: {turn.reply}\n")
+
+        # D) TTS
+        t0 = time.perf_counter()
+        tts_stats = speak_text(turn.reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE, engine=engine,
+                               response_format=cfg.TTS_FORMAT,
+                               deadline_s=cfg.TTS_DEADLINE_MS / 1000.0 if cfg.TTS_DEADLINE_MS else None,
+                               fallback_clip=ack_clip,
+                               bridge_s=cfg.TTS_BRIDGE_MS / 1000.0 if cfg.TTS_BRIDGE_MS else None)
+        turn.timings["tts_ms"] = _ms_since(t0)
+        if tts_stats.get("degraded"):
+            turn.degraded.append(tts_stats["degraded"])
+        if turn.degraded:
+            turn.timings["degraded"] = turn.degraded
+        store.append(session_id, "assistant", turn.reply, examples=turn.examples or None, timings=turn.timings)
+
+        if turn.kind == "stop":
+            if engine is not None:
+                engine.wait_playback()
             break  # <- keluar dari sesi
 
-        # ✅ B1) FILLER/GUMAMAN: "mmm/eh/hah/oh" -> jangan proses RAG/LLM
-        if is_mostly_filler(user_text):
-            reply = FILLER_REPLY
-            print(f"😊 Therapist: {reply}\n")
-            speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-            continue
-
-        # C) Safety gate
-        if cfg.ENABLE_SAFETY and safety_check(user_text):
-            reply = safety_reply()
-            print(f"😊 Therapist: {reply}\n")
-            speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-            continue
-
-        # D) Retrieve (gabungan HOPE + HQC)
-        examples = retriever.search(user_text, k=cfg.TOP_K)
-
-        # E) LLM
-        messages = build_messages(user_text, examples)
-        reply = chat_completion(messages, model=cfg.CHAT_MODEL, temperature=0.4)
-
-        print(f"😊 Therapist: {reply}\n")
-
-        # F) TTS
-        speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-
 
 if __name__ == "__main__":
     main()
@@ -11,25 +11,60 @@ load_dotenv(dotenv_path=Path(__file__).with_name(".env"), override=True)
 from config import Config
 from src.audio.record import record_wav
 from src.audio.tts import speak_text
-from src.data.dataset_ingest import ensure_index
-from src.data.retriever import CBTRetriever
-from src.llm.client import transcribe_audio, chat_completion
+from src.audio.formats import tts_extension, tts_mime
+from src.data.index_service import IndexService
+from src.data.transcript_store import TranscriptStore
+from src.llm.client import transcribe_audio
+from src.llm.safety import build_semantic_safety
+from src.llm.scheduler import PRIORITY_INTERACTIVE, api_context
+from src.monitoring import metrics
 from src.llm.prompt import (
-    build_messages,
-    safety_check,
-    safety_reply,
-    is_mostly_filler,
-    is_stop_intent,
+    analyze_text,
+    MOOD_NEUTRAL_SCORE,
 )
+from src.pipeline.turn import run_text_turn
 
 # --- KONFIGURASI HALAMAN ---
 st.set_page_config(page_title="BioPsy Voice Assistant", page_icon="otak.png")
 
+# --- TRANSCRIPT STORE (persisten, dipakai bersama semua sesi browser) ---
+@st.cache_resource
+def get_transcript_store():
+    return TranscriptStore(Config().TRANSCRIPT_DB)
+
+store = get_transcript_store()
+
 # --- SETUP SESSION STATE (Memori Chat) ---
+GREETING = "Halo, aku BioPsy😆👋🏼 Ada yang ingin kamu ceritakan hari ini? 🤗"
 if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": "Halo, aku BioPsy😆👋🏼 Ada yang ingin kamu ceritakan hari ini? 🤗"}
-    ]
+    st.session_state.messages = [{"role": "assistant", "content": GREETING}]
+    st.session_state.transcript_id = store.new_session(source="gui")
+    store.append(st.session_state.transcript_id, "assistant", GREETING)
+
+
+def log_turn(role: str, content: str, examples=None, timings=None):
+    """Tambah ke chat di layar + transcript store (append di-batch, tidak menahan UI)."""
+    msg = {"role": role, "content": content}
+    if examples is not None:
+        msg["debug_info"] = examples
+    st.session_state.messages.append(msg)
+    store.append(st.session_state.transcript_id, role, content, examples=examples, timings=timings)
+
+
+def chat_log_file():
+    """Export transcript sesi ini; dibangun ulang hanya kalau ada turn baru (kunci: session_id, seq terakhir)."""
+    key = (st.session_state.transcript_id, store.last_seq(st.session_state.transcript_id))
+    if st.session_state.get("export_key") != key:
+        store.flush()  # turn terakhir sudah tertulis sebelum dibaca
+        if st.session_state.get("export_file") is not None:
+            st.session_state.export_file.close()
+        st.session_state.export_file = store.export_file(key[0], fmt="txt")
+        st.session_state.export_key = key
+    return st.session_state.export_file
+
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000.0, 1)
 
 # --- SIDEBAR (Menu Samping) ---
 with st.sidebar:
@@ -49,24 +84,9 @@ with st.sidebar:
     st.markdown("---")
     st.subheader("📊 Kondisi Emosional")
     
-    # Logika Simpel: Cek kata-kata di pesan TERAKHIR user
-    # (Ini simulasi cerdas tanpa perlu panggil AI mahal-mahal)
-    last_mood_score = 5 # Default netral
-    
-    if st.session_state.messages:
-        # Ambil pesan terakhir dari User (bukan Bot)
-        last_user_msg = next((m["content"] for m in reversed(st.session_state.messages) if m["role"] == "user"), "")
-        last_user_msg = last_user_msg.lower()
-        
-        # Deteksi kata kunci sederhana
-        if any(w in last_user_msg for w in ["sedih", "takut", "cemas", "bingung", "sakit", "capek", "lelah", "mati"]):
-            last_mood_score = 8 # Zona Merah
-        elif any(w in last_user_msg for w in ["marah", "kesal", "benci", "sebal"]):
-            last_mood_score = 7 # Zona Oranye
-        elif any(w in last_user_msg for w in ["senang", "bahagia", "tenang", "lega", "makasih", "baik"]):
-            last_mood_score = 2 # Zona Hijau
-        else:
-            last_mood_score = 5 # Netral
+    # Skor mood dihitung SEKALI saat pesan user masuk (lihat process_voice_input),
+    # jadi rerun Streamlit tidak perlu scan ulang riwayat chat.
+    last_mood_score = st.session_state.get("mood_score", MOOD_NEUTRAL_SCORE)
             
     # Tampilkan Slider (Otomatis berubah sesuai score di atas)
     mood_display = st.progress(last_mood_score / 10)
@@ -83,18 +103,10 @@ with st.sidebar:
     st.markdown("---")
     st.subheader("📥 Dokumentasi")
 
-    # Susun teks chat log dari awal sampai akhir
-    chat_log_text = "RIWAYAT SESI KONSELING 13CBT\n"
-    chat_log_text += "============================\n\n"
-    
-    for msg in st.session_state.messages:
-        role = "PASIEN" if msg["role"] == "user" else "TERAPIS (AI)"
-        chat_log_text += f"[{role}]: {msg['content']}\n\n"
-
-    # Tombol Download (Selalu update isinya)
+    # Chat log dibaca dari transcript store (file seekable, di-cache sampai ada turn baru)
     st.download_button(
         label="Simpan Chat Log (.txt)",
-        data=chat_log_text,
+        data=chat_log_file(),
         file_name="Rekam_Medis_13CBT.txt",
         mime="text/plain",
         help="Klik untuk menyimpan seluruh percakapan sejauh ini."
@@ -139,13 +151,23 @@ def setup_system():
     
     # Cek index dataset
     force_rebuild = os.getenv("FORCE_REBUILD", "0") == "1"
-    ensure_index(cfg, force_rebuild=force_rebuild)
-    
-    # Load retriever
-    retriever = CBTRetriever(cfg)
-    return cfg, retriever
+    if cfg.METRICS_TRACEMALLOC:
+        metrics.enable_tracemalloc()
+
+    # Load retriever (index di-build di background kalau perlu)
+    retriever = IndexService(cfg, force_rebuild=force_rebuild, background=cfg.INDEX_BUILD_BACKGROUND)
+    metrics.serve_runtime_metrics(cfg, retriever)
+    return cfg, retriever, build_semantic_safety(cfg, retriever)
 
-cfg, retriever = setup_system()
+cfg, retriever, safety = setup_system()
+
+if not retriever.ready:
+    build = retriever.status()
+    st.info(
+        f"📚 Index referensi sedang dibangun ({build['embedded']}/{build['total']}). "
+        "Sementara ini jawaban belum memakai contoh dari dataset."
+        if build["state"] == "building" else f"⚠️ Build index gagal: {build['error']}"
+    )
 
 # --- FUNGSI UTAMA ---
 def process_voice_input():
@@ -153,80 +175,63 @@ def process_voice_input():
     
     # Path file sementara
     in_wav = os.path.join(cfg.TMP_DIR, "user_gui.wav")
-    out_audio = os.path.join(cfg.TMP_DIR, f"assistant_gui_{int(time.time())}.mp3") # Pake timestamp biar browser gak cache file lama
+    out_audio = os.path.join(cfg.TMP_DIR, f"assistant_gui_{int(time.time())}{tts_extension(cfg.TTS_FORMAT)}") # Pake timestamp biar browser gak cache file lama
 
     # 1. REKAM SUARA
     with st.spinner("🎙️ Mendengarkan... (Bicara sekarang)"):
         # Kita pakai durasi dari config, atau bisa di-hardcode misal 5 detik
-        record_wav(in_wav, seconds=cfg.RECORD_SECONDS, sample_rate=cfg.SAMPLE_RATE)
+        in_path = record_wav(in_wav, seconds=cfg.RECORD_SECONDS, sample_rate=cfg.SAMPLE_RATE,
+                             upload_format=cfg.STT_UPLOAD_FORMAT,
+                             upload_sample_rate=cfg.STT_UPLOAD_SAMPLE_RATE,
+                             trim_silence=cfg.TRIM_SILENCE,
+                             max_pause_seconds=cfg.MAX_PAUSE_SECONDS,
+                             normalize_gain=cfg.NORMALIZE_GAIN)
     
     st.success("✅ Selesai merekam. Memproses...")
 
     # 2. SPEECH TO TEXT
-    user_text = transcribe_audio(in_wav, model=cfg.STT_MODEL)
+    t0 = time.perf_counter()
+    user_text = transcribe_audio(in_path, model=cfg.STT_MODEL)
     user_text = (user_text or "").strip()
+    stt_ms = _ms_since(t0)
 
     if not user_text:
         st.warning("Suara tidak terdengar jelas. Coba lagi ya.")
         return
 
     # Tampilkan chat user
-    st.session_state.messages.append({"role": "user", "content": user_text})
-
-    # 3. CEK INTENT KHUSUS (Stop / Filler / Safety)
-    
-    # A) Stop Intent
-    if is_stop_intent(user_text):
-        reply = "Oke, kita berhenti dulu ya. Terima kasih sudah cerita. Jaga diri baik-baik."
-        st.session_state.messages.append({"role": "assistant", "content": reply})
-        speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-        st.audio(out_audio, autoplay=True)
-        return
-
-    # B) Filler (Gumaman)
-    if is_mostly_filler(user_text):
-        reply = "Aku denger kok. Pelan-pelan aja ceritanya."
-        st.session_state.messages.append({"role": "assistant", "content": reply})
-        speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-        st.audio(out_audio, autoplay=True)
-        return
+    log_turn("user", user_text, timings={"stt_ms": stt_ms})
 
-    # C) Safety Check
-    if cfg.ENABLE_SAFETY and safety_check(user_text):
-        reply = safety_reply()
-        st.session_state.messages.append({"role": "assistant", "content": reply})
-        speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
-        st.audio(out_audio, autoplay=True)
-        return
+    # Mood meter sidebar (hasil scan di-cache, gate di run_text_turn memakai scan yang sama)
+    st.session_state.mood_score = analyze_text(user_text).mood_score
 
-    # 4. RAG & LLM (Inti Proses)
+    # 3-4. Gate stop/filler/safety -> RAG -> LLM: jalur yang sama dengan CLI
+    # (deadline + hedging + degradasi, safety semantik dari vektor query retrieval)
     with st.spinner("🧠 Sedang berpikir..."):
-        # Retrieve context
-        examples = retriever.search(user_text, k=cfg.TOP_K)
-        
-        # Generate jawaban
-        messages_payload = build_messages(user_text, examples)
-        reply = chat_completion(messages_payload, model=cfg.CHAT_MODEL, temperature=0.4)
-    
-    # ... (setelah reply didapat) ...
+        turn = run_text_turn(user_text, cfg, retriever, safety=safety)
+
+    if turn.degraded:
+        st.caption(f"⏱️ Jawaban disederhanakan: {', '.join(turn.degraded)}")
 
     # Fitur untuk Lihat referensi yang dipakai
-    with st.expander("🔍 Debug: Lihat Referensi"):
-        st.json(examples) # Menampilkan raw data referensi yang ditemukan
+    if turn.kind == "chat":
+        with st.expander("🔍 Debug: Lihat Referensi"):
+            st.json(turn.examples) # Menampilkan raw data referensi yang ditemukan
 
     # 5. TEXT TO SPEECH & TAMPILKAN
-    # Simpan jawaban DAN data referensi (examples) ke memori
-    st.session_state.messages.append({
-        "role": "assistant", 
-        "content": reply, 
-        "debug_info": examples  # <--- Ini kuncinya!
-    })
-    
     # Generate suara
-    speak_text(reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE)
+    t0 = time.perf_counter()
+    speak_text(turn.reply, out_audio, model=cfg.TTS_MODEL, voice=cfg.TTS_VOICE, response_format=cfg.TTS_FORMAT)
+    turn.timings["tts_ms"] = _ms_since(t0)
+    if turn.degraded:
+        turn.timings["degraded"] = turn.degraded
+
+    # Simpan jawaban DAN data referensi (examples) ke memori + transcript store
+    log_turn("assistant", turn.reply, examples=turn.examples if turn.kind == "chat" else None,
+             timings=turn.timings)
     
     # Putar suara otomatis
-    st.audio(out_audio, format="audio/mp3", autoplay=True)
+    st.audio(out_audio, format=tts_mime(cfg.TTS_FORMAT), autoplay=True)
 
 
 # --- TAMPILAN CHAT HISTORY ---
@@ -245,7 +250,8 @@ st.divider()
 col1, col2 = st.columns([1, 4])
 with col1:
     if st.button("🎙️ Mulai Bicara", type="primary", use_container_width=True):
-        process_voice_input()
+        with api_context(PRIORITY_INTERACTIVE, session=st.session_state.transcript_id):
+            process_voice_input()
         st.rerun() # Refresh halaman untuk menampilkan chat baru
 
 with col2:
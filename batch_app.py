@@ -0,0 +1,82 @@
+# batch_app.py
+"""
+Proses arsip rekaman client secara offline: transkrip + draft balasan untuk direview.
+
+    python batch_app.py rekaman/                       # -> batch_results/rekaman.jsonl
+    python batch_app.py rekaman/ --workers 8 --out hasil.jsonl
+    python batch_app.py rekaman/ --no-resume           # proses ulang semua file
+
+Satu baris JSON per file WAV (lihat src/pipeline/batch.py):
+    {"key", "file", "status": "ok"|"degraded"|"error", "transcript", "kind", "reply",
+     "examples", "degraded", "safety", "timings", "processed_at", "error"?}
+
+Run yang terputus (Ctrl+C, crash) cukup dijalankan ulang dengan perintah yang
+sama: file yang sudah "ok" dilewati. File yang sempat gagal/terdegradasi punya
+baris "error"/"degraded" dan baris baru saat berhasil -> ambil baris terakhir
+per "file".
+"""
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from pathlib import Path
+
+load_dotenv(dotenv_path=Path(__file__).with_name(".env"), override=True)
+
+from config import Config, BASE_DIR
+
+from src.data.index_service import IndexService
+from src.llm.safety import build_semantic_safety
+from src.pipeline.batch import BatchRunner
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "batch_results")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch transkrip + draft balasan dari folder rekaman WAV.")
+    ap.add_argument("input_dir", help="folder rekaman (dicari rekursif, *.wav)")
+    ap.add_argument("--out", help="output JSONL (default: batch_results/<nama folder>.jsonl)")
+    ap.add_argument("--workers", type=int, default=4, help="file yang diproses bersamaan")
+    ap.add_argument("--limit", type=int, help="maksimum file baru yang diproses di run ini")
+    ap.add_argument("--no-resume", action="store_true", help="abaikan checkpoint, proses ulang semua file")
+    args = ap.parse_args(argv)
+
+    cfg = Config()
+    root = os.path.abspath(args.input_dir)
+    if not os.path.isdir(root):
+        print(f"⚠️ Folder tidak ada: {root}")
+        return 2
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, os.path.basename(root.rstrip(os.sep)) + ".jsonl")
+
+    # batch butuh RAG penuh: tunggu index (build di thread ini kalau belum ada)
+    force_rebuild = os.getenv("FORCE_REBUILD", "0") == "1"
+    retriever = IndexService(cfg, force_rebuild=force_rebuild, watch=False, background=False)
+    if not retriever.ready:
+        print(f"⚠️ Index tidak siap ({retriever.status()['error']}); batch dibatalkan supaya draft tidak dibuat tanpa RAG.")
+        retriever.close()
+        return 1
+    safety = build_semantic_safety(cfg, retriever, background=False)
+
+    runner = BatchRunner(cfg, retriever, workers=args.workers, safety=safety)
+    print(f"Batch: {root} -> {out} ({args.workers} worker)")
+    try:
+        result = asyncio.run(runner.run(root, out, resume=not args.no_resume, limit=args.limit))
+    except KeyboardInterrupt:
+        st = runner.stats
+        print(f"\nℹ️ Dihentikan setelah {st['processed']} file; jalankan ulang perintah yang sama untuk melanjutkan.")
+        return 130
+    finally:
+        retriever.close()
+
+    print(
+        f"✅ {result['processed']} file diproses ({result['errors']} gagal, {result['degraded']} degraded), "
+        f"{result['skipped']} dilewati (checkpoint), {result['files_per_s']:.2f} file/s; "
+        f"jenis: {result['kinds']}"
+    )
+    print(f"✅ Saved: {out}")
+    return 1 if result["errors"] or result["degraded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,7 @@ DEFAULT_HQC_DIR     = os.path.join(DEFAULT_DATASET_DIR, "High Quality Counseling
 
 DEFAULT_INDEX_DIR   = os.path.join(BASE_DIR, "indexes")
 DEFAULT_TMP_DIR     = os.path.join(BASE_DIR, "tmp")
+DEFAULT_TRANSCRIPT_DB = os.path.join(BASE_DIR, "transcripts", "sessions.db")
 
 
 def _abspath_from_base(path: str) -> str:
@@ -36,20 +37,66 @@ class Config:
     INDEX_DIR: str   = _abspath_from_base(os.getenv("INDEX_DIR", DEFAULT_INDEX_DIR))
     TMP_DIR: str     = _abspath_from_base(os.getenv("TMP_DIR", DEFAULT_TMP_DIR))
 
+    # Transcript sesi persisten (SQLite WAL), lihat src/data/transcript_store.py
+    TRANSCRIPT_DB: str = _abspath_from_base(os.getenv("TRANSCRIPT_DB", DEFAULT_TRANSCRIPT_DB))
+
     # -------------------------
     # Retrieval
     # -------------------------
     TOP_K: int = int(os.getenv("TOP_K", "3"))
 
+    # Index berversi: cek CURRENT tiap N detik untuk hot-reload (0 = mati)
+    INDEX_RELOAD_SECONDS: float = float(os.getenv("INDEX_RELOAD_SECONDS", "30"))
+    INDEX_KEEP_VERSIONS: int    = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+    # Build index di background; turn dilayani tanpa RAG (atau dengan index lama) sampai siap
+    INDEX_BUILD_BACKGROUND: bool = os.getenv("INDEX_BUILD_BACKGROUND", "1") == "1"
+
+    # Kurasi saat ingest (src/data/curation.py): buang pasangan yang client-nya cuma
+    # "yeah"/"okay" (< N token bermakna) dan gabungkan query near-duplicate. 0 = mati
+    CURATE_MIN_TOKENS: int       = int(os.getenv("CURATE_MIN_TOKENS", "1"))
+    CURATE_DUP_THRESHOLD: float  = float(os.getenv("CURATE_DUP_THRESHOLD", "0.97"))
+
+    # Backend search: faiss | numpy (numpy tanpa dependency faiss, hanya untuk INDEX_STORAGE=flat)
+    INDEX_BACKEND: str   = os.getenv("INDEX_BACKEND", "faiss")
+
+    # Sharding index: "" = satu index | "dataset" | "hash:N" (lihat src/data/sharding.py)
+    INDEX_SHARDS: str        = os.getenv("INDEX_SHARDS", "")
+    INDEX_SEARCH_THREADS: int = int(os.getenv("INDEX_SEARCH_THREADS", "0"))  # 0 = min(shard, cpu)
+
+    # Penyimpanan vektor: flat | f16 | int8 | pq | pca (lihat src/data/vector_store.py)
+    INDEX_STORAGE: str   = os.getenv("INDEX_STORAGE", "flat")
+    INDEX_PCA_DIM: int   = int(os.getenv("INDEX_PCA_DIM", "256"))
+    INDEX_PQ_M: int      = int(os.getenv("INDEX_PQ_M", "64"))
+    # shortlist pass pertama = k * RESCORE_FACTOR, lalu di-rescore exact
+    RESCORE_FACTOR: int  = int(os.getenv("RESCORE_FACTOR", "4"))
+
+    # MMR reranking: contoh lebih sedikit tapi beragam untuk prompt
+    MMR_ENABLED: bool          = os.getenv("MMR_ENABLED", "1") == "1"
+    MMR_LAMBDA: float          = float(os.getenv("MMR_LAMBDA", "0.7"))   # 1.0 = relevansi murni
+    MMR_CANDIDATE_FACTOR: int  = int(os.getenv("MMR_CANDIDATE_FACTOR", "5"))
+    MMR_MAX_PER_SESSION: int   = int(os.getenv("MMR_MAX_PER_SESSION", "1"))  # 0 = tanpa cap
+    MMR_DUP_THRESHOLD: float   = float(os.getenv("MMR_DUP_THRESHOLD", "0.95"))
+
+    # Speculative retrieval dari transkrip sementara (tiap user jeda bicara)
+    SPECULATIVE_RETRIEVAL: bool = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+    SPECULATIVE_MIN_OVERLAP: float = float(os.getenv("SPECULATIVE_MIN_OVERLAP", "0.7"))
+
     # -------------------------
     # Models
     # -------------------------
     EMBED_MODEL: str = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+    # 0 = dimensi native model; >0 = minta embedding lebih pendek (text-embedding-3-*)
+    EMBED_DIMENSIONS: int = int(os.getenv("EMBED_DIMENSIONS", "0"))
     CHAT_MODEL: str  = os.getenv("CHAT_MODEL", "gpt-4.1-mini")
     STT_MODEL: str   = os.getenv("STT_MODEL", "gpt-4o-mini-transcribe")
     TTS_MODEL: str   = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
     TTS_VOICE: str   = os.getenv("TTS_VOICE", "sage")
 
+    # Format audio di jaringan (lihat src/audio/formats.py)
+    STT_UPLOAD_FORMAT: str      = os.getenv("STT_UPLOAD_FORMAT", "flac")   # wav | flac | opus
+    STT_UPLOAD_SAMPLE_RATE: int = int(os.getenv("STT_UPLOAD_SAMPLE_RATE", "16000"))
+    TTS_FORMAT: str             = os.getenv("TTS_FORMAT", "pcm")           # mp3 | wav | pcm (streaming)
+
     # -------------------------
     # Audio
     # -------------------------
@@ -63,10 +110,49 @@ class Config:
     SILENCE_SECONDS: float  = float(os.getenv("SILENCE_SECONDS", "10.0"))
     RMS_THRESHOLD: float    = float(os.getenv("RMS_THRESHOLD", "0.006"))
 
+    # Conditioning sebelum STT: potong hening awal/akhir, pendekkan jeda panjang
+    TRIM_SILENCE: bool         = os.getenv("TRIM_SILENCE", "1") == "1"
+    MAX_PAUSE_SECONDS: float   = float(os.getenv("MAX_PAUSE_SECONDS", "0.7"))
+    NORMALIZE_GAIN: bool       = os.getenv("NORMALIZE_GAIN", "0") == "1"
+
+    # Full-duplex: TTS diputar di background, user bisa memotong (barge-in)
+    FULL_DUPLEX: bool         = os.getenv("FULL_DUPLEX", "0") == "1"
+    BARGE_IN_THRESHOLD: float = float(os.getenv("BARGE_IN_THRESHOLD", "0.02"))
+    ECHO_COUPLING: float      = float(os.getenv("ECHO_COUPLING", "0.6"))
+
+    # -------------------------
+    # Kuota API bersama (src/llm/scheduler.py): endpoint=rpm[/tpm], dipisah koma
+    # -------------------------
+    API_RATE_LIMITS: str = os.getenv("API_RATE_LIMITS", "chat=500/200000,embeddings=3000/1000000,stt=50,tts=50")
+    API_RESERVE: float   = float(os.getenv("API_RESERVE", "0.2"))   # porsi kuota khusus turn interaktif
+
+    # -------------------------
+    # Deadline per tahap + hedged request (src/llm/hedging.py); 0 = tanpa deadline
+    # -------------------------
+    RETRIEVAL_DEADLINE_MS: int    = int(os.getenv("RETRIEVAL_DEADLINE_MS", "1500"))  # lewat -> jawab tanpa RAG
+    CHAT_DEADLINE_MS: int         = int(os.getenv("CHAT_DEADLINE_MS", "8000"))       # lewat -> retry max_tokens pendek
+    CHAT_FALLBACK_MS: int         = int(os.getenv("CHAT_FALLBACK_MS", "4000"))       # lewat -> balasan acknowledgement
+    CHAT_FALLBACK_MAX_TOKENS: int = int(os.getenv("CHAT_FALLBACK_MAX_TOKENS", "120"))
+    TTS_DEADLINE_MS: int          = int(os.getenv("TTS_DEADLINE_MS", "5000"))        # lewat -> putar klip ack cache
+    TTS_BRIDGE_MS: int            = int(os.getenv("TTS_BRIDGE_MS", "8000"))          # sesudah klip ack: balasan masih ditunggu
+
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "90"))   # kirim duplikat setelah p90 latency
+    HEDGE_MIN_DELAY_MS: int = int(os.getenv("HEDGE_MIN_DELAY_MS", "800"))
+    HEDGE_MAX: int          = int(os.getenv("HEDGE_MAX", "1"))             # 0 = hedge mati (deadline tetap jalan)
+
+    # -------------------------
+    # Metrics (Prometheus text format di http://METRICS_HOST:METRICS_PORT/metrics)
+    # -------------------------
+    METRICS_PORT: int         = int(os.getenv("METRICS_PORT", "0"))        # 0 = mati
+    METRICS_HOST: str         = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_TRACEMALLOC: bool = os.getenv("METRICS_TRACEMALLOC", "0") == "1"  # alokasi ingest/retrieval
+
     # -------------------------
     # Safety (minimal)
     # -------------------------
     ENABLE_SAFETY: bool = os.getenv("ENABLE_SAFETY", "1") == "1"
+    # screening semantik (cosine query vs contoh kalimat krisis); 0 = hanya keyword
+    SAFETY_SEMANTIC_THRESHOLD: float = float(os.getenv("SAFETY_SEMANTIC_THRESHOLD", "0.6"))
 
 
 # Optional: instance siap pakai (kalau kamu biasa import cfg)
@@ -0,0 +1,113 @@
+# src/audio/conditioning.py
+"""
+Conditioning audio setelah rekaman selesai, sebelum di-upload ke STT.
+
+Rekaman VAD biasanya membawa beberapa detik hening (pre-roll, hangover,
+silence_seconds di akhir, jeda panjang di tengah). Hening itu tetap di-upload
+dan tetap diproses STT. Di sini:
+- hening di awal/akhir dipotong, sisakan guard band kecil
+- jeda di tengah yang lebih panjang dari max_pause dipendekkan jadi max_pause
+- (opsional) gain dinormalisasi ke target RMS bagian bicara
+
+Framing RMS sama dengan VAD recorder (chunk_rms per chunk_ms).
+"""
+import time
+
+from src.audio.record import chunk_rms
+
+
+def speech_mask(audio, sample_rate: int, threshold: float, chunk_ms: int = 30):
+    """Return (mask bool per frame, frame_size). Frame = chunk_ms seperti di VAD."""
+    import numpy as np
+
+    frame = max(1, int(sample_rate * (chunk_ms / 1000.0)))
+    n_frames = (len(audio) + frame - 1) // frame
+    mask = np.zeros(n_frames, dtype=bool)
+    for i in range(n_frames):
+        mask[i] = chunk_rms(audio[i * frame:(i + 1) * frame]) >= threshold
+    return mask, frame
+
+
+def condition_audio(
+    audio,
+    sample_rate: int,
+    threshold: float,
+    chunk_ms: int = 30,
+    guard_seconds: float = 0.2,        # hening yang disisakan di awal/akhir
+    max_pause_seconds: float = 0.7,    # jeda di tengah dipendekkan jadi segini
+    normalize_gain: bool = False,
+    target_rms: float = 0.05,
+    max_gain: float = 8.0,
+):
+    """
+    Return (audio_baru, stats). audio (n, 1) atau (n,) float32.
+    Kalau tidak ada frame bicara sama sekali, audio dikembalikan apa adanya.
+    """
+    import numpy as np
+
+    t0 = time.perf_counter()
+    n_in = len(audio)
+    stats = {
+        "seconds_in": round(n_in / float(sample_rate), 3),
+        "seconds_out": round(n_in / float(sample_rate), 3),
+        "seconds_removed": 0.0,
+        "lead_trail_removed": 0.0,
+        "pause_removed": 0.0,
+        "pauses_compacted": 0,
+        "gain": 1.0,
+        "condition_ms": 0.0,
+    }
+
+    mask, frame = speech_mask(audio, sample_rate, threshold, chunk_ms)
+    if not mask.any():
+        stats["condition_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+        return audio, stats
+
+    guard = int(guard_seconds * sample_rate)
+    max_pause = int(max_pause_seconds * sample_rate)
+
+    speech_idx = np.flatnonzero(mask)
+    start = max(0, int(speech_idx[0]) * frame - guard)
+    end = min(n_in, (int(speech_idx[-1]) + 1) * frame + guard)
+
+    # segmen yang disimpan: [start, end) dikurangi bagian tengah jeda panjang
+    keep = []
+    cursor = start
+    pause_removed = 0
+    gaps = np.flatnonzero(np.diff(speech_idx) > 1)
+    for g in gaps:
+        gap_start = (int(speech_idx[g]) + 1) * frame
+        gap_end = int(speech_idx[g + 1]) * frame
+        excess = (gap_end - gap_start) - max_pause
+        if excess <= 0:
+            continue
+        # sisakan setengah max_pause di tiap sisi supaya transisi tetap natural
+        cut_start = gap_start + max_pause // 2
+        keep.append((cursor, cut_start))
+        cursor = cut_start + excess
+        pause_removed += excess
+        stats["pauses_compacted"] += 1
+    keep.append((cursor, end))
+
+    out = np.concatenate([audio[a:b] for a, b in keep], axis=0)
+
+    if normalize_gain:
+        speech = np.concatenate(
+            [audio[i * frame:(i + 1) * frame] for i in speech_idx], axis=0
+        )
+        level = chunk_rms(speech)
+        if level > 0:
+            gain = min(max_gain, target_rms / level)
+            peak = float(np.max(np.abs(out))) if len(out) else 0.0
+            if peak * gain > 0.99:
+                gain = 0.99 / peak  # jangan sampai clipping
+            out = (out * gain).astype("float32")
+            stats["gain"] = round(float(gain), 3)
+
+    lead_trail = start + (n_in - end)
+    stats["seconds_out"] = round(len(out) / float(sample_rate), 3)
+    stats["seconds_removed"] = round((n_in - len(out)) / float(sample_rate), 3)
+    stats["lead_trail_removed"] = round(lead_trail / float(sample_rate), 3)
+    stats["pause_removed"] = round(pause_removed / float(sample_rate), 3)
+    stats["condition_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return out, stats
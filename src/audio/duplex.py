@@ -0,0 +1,272 @@
+# src/audio/duplex.py
+"""
+Full-duplex audio: TTS diputar di output stream background sementara input
+stream (mic) tetap jalan, jadi rekaman turn berikutnya bisa mulai saat
+playback belum selesai, dan user bisa memotong (barge-in).
+
+- Input callback: simpan chunk mic ke buffer (dibaca record_wav(source=engine))
+  dan deteksi barge-in.
+- Output callback: tulis audio TTS per blok dari antrian (bisa diisi sambil
+  TTS masih streaming); berhenti di blok berikutnya begitu barge-in terdeteksi.
+- Echo gating: selama playback (dan sedikit setelahnya) threshold bicara
+  dinaikkan sebanding level output, supaya suara asisten sendiri tidak
+  dianggap user bicara.
+"""
+import threading
+import time
+from collections import deque
+
+from src.audio.record import chunk_rms
+
+
+class DuplexAudioEngine:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        chunk_ms: int = 30,
+
+        # echo gating
+        echo_coupling: float = 0.6,      # perkiraan rasio level echo di mic vs level output
+        echo_margin: float = 0.004,      # margin tambahan di atas echo
+        echo_tail_ms: int = 250,         # gating masih aktif sebentar setelah output berhenti
+
+        # barge-in
+        barge_in_threshold: float = 0.02,
+        barge_in_ms: int = 150,          # bicara harus bertahan sekian ms (anti klik/batuk)
+
+        buffer_seconds: float = 10.0,    # buffer input maksimum kalau belum dibaca
+    ):
+        self.sample_rate = sample_rate
+        self.chunk_size = int(sample_rate * (chunk_ms / 1000.0))
+
+        self.echo_coupling = echo_coupling
+        self.echo_margin = echo_margin
+        self.echo_tail_s = echo_tail_ms / 1000.0
+
+        self.barge_in_threshold = barge_in_threshold
+        self.barge_in_chunks = max(1, int(barge_in_ms / chunk_ms))
+
+        self._sd = None
+        self._in_stream = None
+        self._out_stream = None
+
+        # input buffer
+        self._in_chunks = deque(maxlen=max(1, int(buffer_seconds * 1000 / chunk_ms)))
+        self._in_cond = threading.Condition()
+        self._pending = None
+
+        # output state (antrian blok, supaya bisa diisi sambil streaming)
+        self._out_lock = threading.Lock()
+        self._out_queue = deque()
+        self._out_cur = None
+        self._out_pos = 0
+        self._out_ended = True
+        self._stop_requested = False
+        self._play_done = threading.Event()
+        self._play_done.set()
+        self._play_level = 0.0
+        self._play_level_ts = 0.0
+
+        # barge-in
+        self._speech_run = 0
+        self.barge_in = threading.Event()
+        self.barge_in_count = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        import sounddevice as sd  # lazy: PortAudio baru di-load saat engine dipakai
+
+        self._sd = sd
+        self._in_stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.chunk_size,
+            callback=self._on_input,
+        )
+        self._in_stream.start()
+        return self
+
+    def close(self):
+        self.stop_playback()
+        self.wait_playback(timeout=1.0)
+        self._close_out_stream()
+        if self._in_stream is not None:
+            self._in_stream.stop()
+            self._in_stream.close()
+            self._in_stream = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- input side ----------
+    def _on_input(self, indata, frames, time_info, status):
+        chunk = indata.copy()
+        with self._in_cond:
+            self._in_chunks.append(chunk)
+            self._in_cond.notify_all()
+
+        if not self.is_playing():
+            self._speech_run = 0
+            return
+
+        # barge-in: bicara user harus lebih keras dari echo yang diharapkan
+        rms = chunk_rms(chunk)
+        if rms >= max(self.barge_in_threshold, self.gate_threshold()):
+            self._speech_run += 1
+        else:
+            self._speech_run = 0
+
+        if self._speech_run >= self.barge_in_chunks:
+            self._speech_run = 0
+            self.barge_in_count += 1
+            self.barge_in.set()
+            self.stop_playback()
+
+    def read(self, n: int):
+        """Blocking read tepat n sample mono (n, 1) dari mic."""
+        import numpy as np
+
+        parts = []
+        have = 0
+        if self._pending is not None:
+            parts.append(self._pending)
+            have = len(self._pending)
+            self._pending = None
+
+        while have < n:
+            with self._in_cond:
+                while not self._in_chunks:
+                    self._in_cond.wait()
+                chunk = self._in_chunks.popleft()
+            parts.append(chunk)
+            have += len(chunk)
+
+        data = np.concatenate(parts, axis=0)
+        if len(data) > n:
+            self._pending = data[n:]
+        return data[:n]
+
+    def flush_input(self):
+        """Buang audio mic lama (mis. sebelum mulai rekaman baru)."""
+        with self._in_cond:
+            self._in_chunks.clear()
+        self._pending = None
+
+    def gate_threshold(self) -> float:
+        """Threshold minimum agar suara mic dianggap user (0 = tidak ada echo)."""
+        if time.monotonic() - self._play_level_ts > self.echo_tail_s:
+            return 0.0
+        return self.echo_coupling * self._play_level + self.echo_margin
+
+    # ---------- output side ----------
+    def _on_output(self, outdata, frames, time_info, status):
+        filled = 0
+        with self._out_lock:
+            if self._stop_requested:
+                outdata.fill(0)
+                raise self._sd.CallbackStop
+
+            while filled < frames:
+                if self._out_cur is None or self._out_pos >= len(self._out_cur):
+                    if not self._out_queue:
+                        break
+                    self._out_cur = self._out_queue.popleft()
+                    self._out_pos = 0
+                take = min(frames - filled, len(self._out_cur) - self._out_pos)
+                outdata[filled:filled + take] = self._out_cur[self._out_pos:self._out_pos + take]
+                self._out_pos += take
+                filled += take
+
+            ended = self._out_ended
+
+        outdata[filled:] = 0
+        if filled:
+            self._play_level = chunk_rms(outdata[:filled])
+            self._play_level_ts = time.monotonic()
+
+        # buffer habis: kalau stream sudah ditutup -> selesai; kalau belum -> underrun (diam sebentar)
+        if filled < frames and ended:
+            raise self._sd.CallbackStop
+
+    def start_stream(self, sample_rate: int, channels: int = 1):
+        """Buka playback streaming; isi dengan feed(), tutup dengan end_stream()."""
+        if self._sd is None:
+            self.start()
+
+        self.stop_playback()
+        self.wait_playback(timeout=1.0)
+        # timeout (device macet / callback tidak jalan): stream lama tetap ditutup paksa
+        self._close_out_stream()
+
+        with self._out_lock:
+            self._out_queue.clear()
+            self._out_cur = None
+            self._out_pos = 0
+            self._out_ended = False
+            self._stop_requested = False
+
+        self.barge_in.clear()
+        # event per stream: finished_callback stream lama yang telat tidak menandai stream baru selesai
+        done = threading.Event()
+        self._play_done = done
+        self._out_stream = self._sd.OutputStream(
+            samplerate=sample_rate,
+            channels=channels,
+            dtype="float32",
+            callback=self._on_output,
+            finished_callback=done.set,
+        )
+        self._out_stream.start()
+
+    def feed(self, samples):
+        """Tambah audio float32 (n,) / (n, ch) ke antrian playback."""
+        import numpy as np
+
+        data = np.asarray(samples, dtype="float32")
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        with self._out_lock:
+            self._out_queue.append(data)
+
+    def end_stream(self):
+        with self._out_lock:
+            self._out_ended = True
+
+    def play(self, data, sample_rate: int):
+        """Putar audio di background (non-blocking). Playback sebelumnya dihentikan."""
+        import numpy as np
+
+        data = np.asarray(data, dtype="float32")
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        self.start_stream(sample_rate, channels=channels)
+        self.feed(data)
+        self.end_stream()
+
+    def stop_playback(self):
+        """Hentikan playback di blok output berikutnya (aman dipanggil dari callback)."""
+        with self._out_lock:
+            self._stop_requested = True
+
+    def is_playing(self) -> bool:
+        return not self._play_done.is_set()
+
+    def wait_playback(self, timeout: float | None = None) -> bool:
+        done = self._play_done.wait(timeout)
+        if done:
+            self._close_out_stream()
+        return done
+
+    def _close_out_stream(self):
+        """Abort + close output stream (kalau ada), tanpa menunggu buffer habis."""
+        stream, self._out_stream = self._out_stream, None
+        if stream is None:
+            return
+        try:
+            stream.abort()
+        finally:
+            stream.close()
+        self._play_done.set()
@@ -0,0 +1,94 @@
+# src/audio/formats.py
+"""
+Format audio di jalur jaringan (upload STT & download TTS).
+
+Upload STT (STT_UPLOAD_FORMAT):
+- "wav"  : PCM 16-bit (perilaku lama)
+- "flac" : lossless, biasanya ~40-60% lebih kecil dari WAV untuk suara
+- "opus" : Ogg/Opus, paling kecil (lossy, tetap jelas untuk STT)
+
+Download TTS (TTS_FORMAT):
+- "mp3"  : perlu decode penuh sebelum diputar (perilaku lama)
+- "wav"  : PCM dalam container WAV, tanpa decode mahal
+- "pcm"  : raw 16-bit LE mono 24 kHz, bisa diputar sambil streaming
+"""
+import os
+import time
+
+# format -> (libsndfile format, subtype, ekstensi)
+UPLOAD_FORMATS = {
+    "wav": ("WAV", "PCM_16", ".wav"),
+    "flac": ("FLAC", "PCM_16", ".flac"),
+    "opus": ("OGG", "OPUS", ".ogg"),
+}
+
+# Opus hanya mendukung sample rate tertentu
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+TTS_FORMATS = {
+    "mp3": ".mp3",
+    "wav": ".wav",
+    "pcm": ".wav",  # raw PCM disimpan ulang dalam container WAV supaya bisa diputar browser
+}
+TTS_PCM_SAMPLE_RATE = 24000
+
+
+def tts_extension(fmt: str) -> str:
+    return TTS_FORMATS.get(fmt, ".mp3")
+
+
+def tts_mime(fmt: str) -> str:
+    return "audio/mp3" if tts_extension(fmt) == ".mp3" else "audio/wav"
+
+
+def _resample_linear(audio, src_rate: int, dst_rate: int):
+    """Resample sederhana (interpolasi linear) — cukup untuk suara ke 16 kHz. Durasi tetap."""
+    import numpy as np
+
+    if src_rate == dst_rate or len(audio) == 0:
+        return audio
+    n_out = int(round(len(audio) * dst_rate / src_rate))
+    x_old = np.linspace(0.0, 1.0, num=len(audio), endpoint=False)
+    x_new = np.linspace(0.0, 1.0, num=n_out, endpoint=False)
+    out = np.interp(x_new, x_old, audio[:, 0] if audio.ndim == 2 else audio)
+    return out.astype("float32").reshape(-1, 1)
+
+
+def write_upload(path: str, audio, sample_rate: int, fmt: str = "wav",
+                 target_rate: int | None = None) -> tuple[str, dict]:
+    """
+    Tulis audio rekaman dalam format upload STT.
+    Ekstensi `path` diganti sesuai format. Return (path_final, stats).
+    """
+    import soundfile as sf
+
+    if fmt not in UPLOAD_FORMATS:
+        raise ValueError(f"STT_UPLOAD_FORMAT tidak dikenal: {fmt} (pilih {', '.join(UPLOAD_FORMATS)})")
+    major, subtype, ext = UPLOAD_FORMATS[fmt]
+
+    # upsample tidak menambah informasi, hanya byte: target dibatasi ke rate rekaman
+    rate = min(int(target_rate or sample_rate), int(sample_rate))
+    if fmt == "opus" and rate not in OPUS_RATES:
+        rate = max((r for r in OPUS_RATES if r <= rate), default=OPUS_RATES[0])
+
+    out_path = os.path.splitext(path)[0] + ext
+
+    t0 = time.perf_counter()
+    # rate != sample_rate wajib di-resample, kalau tidak durasi (dan pitch) audio berubah
+    data = _resample_linear(audio, sample_rate, rate) if rate != sample_rate else audio
+    sf.write(out_path, data, rate, format=major, subtype=subtype)
+    encode_ms = (time.perf_counter() - t0) * 1000.0
+
+    stats = {
+        "format": fmt,
+        "sample_rate": rate,
+        "seconds": round(len(data) / float(rate), 3),
+        "bytes": os.path.getsize(out_path),
+        "raw_pcm16_bytes": int(len(data) * 2),
+        "encode_ms": round(encode_ms, 2),
+    }
+    print(
+        f"📦 Upload audio: {stats['bytes'] / 1024:.1f} KB {fmt} @ {rate} Hz "
+        f"({stats['seconds']:.1f}s, encode {stats['encode_ms']:.0f} ms)"
+    )
+    return out_path, stats
@@ -1,9 +1,15 @@
 # src/audio/record.py
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
 from collections import deque
 
+from src.audio.formats import write_upload
+
+
+def chunk_rms(chunk) -> float:
+    """RMS satu chunk audio float32 (dipakai VAD & echo gating)."""
+    import numpy as np
+
+    return float(np.sqrt(np.mean(chunk ** 2))) if len(chunk) else 0.0
+
 
 def record_wav_vad(
     path: str,
@@ -23,6 +29,23 @@ def record_wav_vad(
     pre_roll_seconds: float = 0.35,        # simpan audio sebelum speech start
     hangover_seconds: float = 0.35,        # setelah RMS turun, kasih "hangover" dulu sebelum dihitung hening beneran
     chunk_ms: int = 30,                    # chunk lebih kecil -> lebih responsif (30ms)
+
+    # Speculative mode (opsional)
+    on_pause=None,                         # callback(audio_so_far, sample_rate) tiap user jeda bicara
+    min_pause_interval_seconds: float = 1.0,
+
+    # Full-duplex (opsional)
+    source=None,                           # sumber chunk lain (mis. DuplexAudioEngine), default mic langsung
+
+    # Format upload STT
+    upload_format: str = "wav",            # wav | flac | opus (lihat src/audio/formats.py)
+    upload_sample_rate: int | None = None, # None = sama dengan sample_rate rekaman
+
+    # Conditioning sebelum upload (lihat src/audio/conditioning.py)
+    trim_silence: bool = False,            # potong hening awal/akhir + pendekkan jeda panjang
+    guard_seconds: float = 0.2,
+    max_pause_seconds: float = 0.7,
+    normalize_gain: bool = False,
 ):
     """
     Record until:
@@ -35,11 +58,89 @@ def record_wav_vad(
     - adaptive threshold (noise floor)
     - hangover (pause pendek tidak bikin cepat stop)
     - pre-roll (awal kata tidak kepotong)
+    - on_pause: dipanggil sekali per jeda (setelah hangover habis) dengan audio sejauh ini,
+      supaya transkrip sementara bisa memicu retrieval spekulatif. Callback harus cepat
+      (lempar kerja berat ke thread lain) karena dipanggil di loop rekaman.
+    - source: objek dengan read(n) -> chunk (n, 1) dan gate_threshold() -> float.
+      gate_threshold() > 0 saat speaker sedang bunyi (echo gating): threshold VAD dinaikkan
+      dan chunk tsb tidak dipakai untuk kalibrasi noise floor.
+      Kalau source punya flush_input(), buffer mic lama (audio selama STT/LLM/TTS
+      turn sebelumnya) dibuang dulu supaya rekaman mulai dari sekarang.
+    - trim_silence: setelah rekaman selesai, hening di luar guard band dan jeda yang lebih
+      panjang dari max_pause_seconds dibuang (threshold = threshold VAD), supaya upload
+      dan proses STT lebih singkat.
+
+    Return path file yang ditulis (ekstensi mengikuti upload_format).
     """
 
+    # lazy: PortAudio/libsndfile baru di-load saat benar-benar merekam
+    import sounddevice as sd
+
     print("🎙️ Recording... (bicara sekarang, akan berhenti otomatis saat hening)")
 
     chunk_size = int(sample_rate * (chunk_ms / 1000.0))
+
+    opts = dict(
+        sample_rate=sample_rate, max_seconds=max_seconds,
+        silence_seconds=silence_seconds, min_record_seconds=min_record_seconds,
+        rms_threshold=rms_threshold, use_adaptive_threshold=use_adaptive_threshold,
+        noise_calibration_seconds=noise_calibration_seconds,
+        pre_roll_seconds=pre_roll_seconds, hangover_seconds=hangover_seconds, chunk_ms=chunk_ms,
+        on_pause=on_pause, min_pause_interval_seconds=min_pause_interval_seconds,
+    )
+
+    if source is None:
+        with sd.InputStream(samplerate=sample_rate, channels=1, dtype="float32") as stream:
+            audio, threshold = _vad_capture(lambda: stream.read(chunk_size)[0], **opts)
+    else:
+        flush = getattr(source, "flush_input", None)
+        if flush is not None:
+            flush()
+        audio, threshold = _vad_capture(
+            lambda: source.read(chunk_size), gate_threshold=source.gate_threshold, **opts
+        )
+
+    # ---------- (3) Conditioning ----------
+    if trim_silence or normalize_gain:
+        from src.audio.conditioning import condition_audio
+
+        audio, cstats = condition_audio(
+            audio, sample_rate, threshold, chunk_ms=chunk_ms,
+            guard_seconds=guard_seconds if trim_silence else float(max_seconds),
+            max_pause_seconds=max_pause_seconds if trim_silence else float(max_seconds),
+            normalize_gain=normalize_gain,
+        )
+        print(
+            f"✂️ Conditioning: {cstats['seconds_in']:.1f}s -> {cstats['seconds_out']:.1f}s "
+            f"(-{cstats['seconds_removed']:.1f}s hening, {cstats['pauses_compacted']} jeda dipendekkan, "
+            f"gain x{cstats['gain']:.2f}, {cstats['condition_ms']:.0f} ms)"
+        )
+
+    # ---------- (4) Save ----------
+    path, _ = write_upload(path, audio, sample_rate, fmt=upload_format, target_rate=upload_sample_rate)
+    print(f"✅ Saved: {path}")
+    return path
+
+
+def _vad_capture(
+    read_chunk,
+    sample_rate: int,
+    max_seconds: int,
+    silence_seconds: float,
+    min_record_seconds: float,
+    rms_threshold: float,
+    use_adaptive_threshold: bool,
+    noise_calibration_seconds: float,
+    pre_roll_seconds: float,
+    hangover_seconds: float,
+    chunk_ms: int,
+    on_pause=None,
+    min_pause_interval_seconds: float = 1.0,
+    gate_threshold=None,
+):
+    """Loop VAD (kalibrasi + deteksi bicara/hening). Return (audio (n, 1) float32, threshold bicara)."""
+    import numpy as np
+
     max_chunks = int((max_seconds * 1000) / chunk_ms)
 
     silence_chunks_needed = int((silence_seconds * 1000) / chunk_ms)
@@ -54,79 +155,97 @@ def record_wav_vad(
     silent_chunks = 0
     hangover_left = 0
 
+    pause_fired = False
+    last_pause_chunk = -10**9
+    min_pause_gap_chunks = int((min_pause_interval_seconds * 1000) / chunk_ms)
+
     # ---------- (1) Noise calibration (buat adaptive threshold) ----------
     noise_rms_values = []
     calib_chunks = int((noise_calibration_seconds * 1000) / chunk_ms)
 
-    with sd.InputStream(samplerate=sample_rate, channels=1, dtype="float32") as stream:
-        for _ in range(calib_chunks):
-            chunk, _ = stream.read(chunk_size)
-            rms = float(np.sqrt(np.mean(chunk ** 2)))
-            noise_rms_values.append(rms)
-            pre_roll.append(chunk)
+    for _ in range(calib_chunks):
+        chunk = read_chunk()
+        pre_roll.append(chunk)
+        # chunk saat speaker bunyi isinya echo, bukan noise ruangan
+        if gate_threshold is not None and gate_threshold() > 0:
+            continue
+        noise_rms_values.append(chunk_rms(chunk))
 
-        noise_floor = float(np.median(noise_rms_values)) if noise_rms_values else 0.0
+    noise_floor = float(np.median(noise_rms_values)) if noise_rms_values else 0.0
 
-        # adaptive: threshold = noise_floor * factor + margin
-        # factor 2.5–4 cocok; margin kecil biar gumaman masih kedeteksi
-        if use_adaptive_threshold:
-            adaptive_threshold = max(rms_threshold, noise_floor * 3.0 + 0.0015)
-        else:
-            adaptive_threshold = rms_threshold
-
-        # ---------- (2) Main recording loop ----------
-        for i in range(max_chunks):
-            chunk, _ = stream.read(chunk_size)
-            pre_roll.append(chunk)
-
-            rms = float(np.sqrt(np.mean(chunk ** 2)))
-
-            # detect speech start
-            if not started:
-                if rms >= adaptive_threshold:
-                    started = True
-                    # include pre-roll so we don't cut initial phonemes
-                    frames.extend(list(pre_roll))
-                    pre_roll.clear()
-                    # reset counters
-                    silent_chunks = 0
-                    hangover_left = hangover_chunks
-                continue
-
-            # after started: store
-            frames.append(chunk)
-
-            # hangover logic: ketika rms turun, jangan langsung hitung hening
-            if rms >= adaptive_threshold:
+    # adaptive: threshold = noise_floor * factor + margin
+    # factor 2.5–4 cocok; margin kecil biar gumaman masih kedeteksi
+    if use_adaptive_threshold:
+        adaptive_threshold = max(rms_threshold, noise_floor * 3.0 + 0.0015)
+    else:
+        adaptive_threshold = rms_threshold
+
+    # ---------- (2) Main recording loop ----------
+    for i in range(max_chunks):
+        chunk = read_chunk()
+        pre_roll.append(chunk)
+
+        rms = chunk_rms(chunk)
+
+        # echo gating: selama playback, suara asisten sendiri tidak boleh dianggap bicara
+        threshold = adaptive_threshold
+        if gate_threshold is not None:
+            threshold = max(threshold, gate_threshold())
+
+        # detect speech start
+        if not started:
+            if rms >= threshold:
+                started = True
+                # include pre-roll so we don't cut initial phonemes
+                frames.extend(list(pre_roll))
+                pre_roll.clear()
+                # reset counters
                 silent_chunks = 0
                 hangover_left = hangover_chunks
-            else:
-                # kalau hangover masih ada, kurangi dulu; belum hitung silence
-                if hangover_left > 0:
-                    hangover_left -= 1
-                else:
-                    silent_chunks += 1
+            continue
 
-            # stop if enough silence and min duration met
-            if i >= min_chunks_needed and silent_chunks >= silence_chunks_needed:
-                break
+        # after started: store
+        frames.append(chunk)
 
-    # ---------- (3) Save ----------
-    if frames:
-        audio = np.concatenate(frames, axis=0)
-    else:
-        # kalau user gak bicara sama sekali, simpan pre-roll biar file tetap valid
-        if len(pre_roll) > 0:
-            audio = np.concatenate(list(pre_roll), axis=0)
+        # hangover logic: ketika rms turun, jangan langsung hitung hening
+        if rms >= threshold:
+            silent_chunks = 0
+            hangover_left = hangover_chunks
+            pause_fired = False
         else:
-            audio = np.zeros((int(sample_rate * 0.5), 1), dtype=np.float32)
+            # kalau hangover masih ada, kurangi dulu; belum hitung silence
+            if hangover_left > 0:
+                hangover_left -= 1
+            else:
+                silent_chunks += 1
 
-    sf.write(path, audio, sample_rate)
-    print(f"✅ Saved: {path}")
+                # awal jeda beneran -> kirim audio sejauh ini (sekali per jeda)
+                if (on_pause is not None and not pause_fired
+                        and i - last_pause_chunk >= min_pause_gap_chunks):
+                    pause_fired = True
+                    last_pause_chunk = i
+                    try:
+                        on_pause(np.concatenate(frames, axis=0), sample_rate)
+                    except Exception as e:
+                        print(f"⚠️ on_pause callback error: {e}")
+
+        # stop if enough silence and min duration met
+        if i >= min_chunks_needed and silent_chunks >= silence_chunks_needed:
+            break
+
+    if frames:
+        return np.concatenate(frames, axis=0), adaptive_threshold
+    # kalau user gak bicara sama sekali, simpan pre-roll biar file tetap valid
+    if len(pre_roll) > 0:
+        return np.concatenate(list(pre_roll), axis=0), adaptive_threshold
+    return np.zeros((int(sample_rate * 0.5), 1), dtype=np.float32), adaptive_threshold
 
 
 # Wrapper kompatibel app.py
-def record_wav(path: str, seconds: int = 10, sample_rate: int = 16000):
+def record_wav(path: str, seconds: int = 10, sample_rate: int = 16000, on_pause=None, source=None,
+               upload_format: str = "wav", upload_sample_rate: int | None = None,
+               trim_silence: bool = False, max_pause_seconds: float = 0.7,
+               normalize_gain: bool = False):
     """
     seconds di app.py kita anggap sebagai MAX seconds.
     Settings default dibuat lebih 'tahan' untuk gumaman + pause.
@@ -146,4 +265,15 @@ def record_wav(path: str, seconds: int = 10, sample_rate: int = 16000):
         pre_roll_seconds=0.35,
         hangover_seconds=0.35,
         chunk_ms=30,
+
+        on_pause=on_pause,
+        source=source,
+
+        upload_format=upload_format,
+        upload_sample_rate=upload_sample_rate,
+
+        trim_silence=trim_silence,
+        guard_seconds=0.2,
+        max_pause_seconds=max_pause_seconds,
+        normalize_gain=normalize_gain,
     )
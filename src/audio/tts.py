@@ -1,12 +1,281 @@
-import sounddevice as sd
-import soundfile as sf
-from src.llm.client import text_to_speech
+# src/audio/tts.py
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, wait
 
-def speak_text(text: str, out_path: str, model: str, voice: str):
-    # Generate audio
-    text_to_speech(text, out_path, model=model, voice=voice)
+from src.audio.formats import TTS_PCM_SAMPLE_RATE
+from src.llm.client import atext_to_speech, text_to_speech, stream_speech
+from src.llm.hedging import DeadlineExceeded, call_hedged
+
+# klip pendek yang diputar kalau TTS tidak menghasilkan audio dalam deadline
+ACK_CLIP_TEXT = "Sebentar ya, aku masih di sini."
+
+
+def speak_text(text: str, out_path: str, model: str, voice: str, engine=None,
+               response_format: str = "mp3", deadline_s: float | None = None,
+               fallback_clip: str | None = None, bridge_s: float | None = None):
+    """
+    engine: DuplexAudioEngine (opsional). Kalau ada, audio diputar di background
+    dan fungsi langsung return, jadi rekaman turn berikutnya bisa langsung jalan
+    (user bisa memotong / barge-in).
+
+    response_format: "mp3" | "wav" | "pcm". "pcm" diputar sambil streaming
+    (tanpa decode) dan disimpan ke out_path sebagai WAV.
+
+    deadline_s: batas waktu sampai audio pertama (request di-hedge). Kalau lewat,
+    fallback_clip (lihat prepare_ack_clip) diputar sebagai jembatan dan balasan
+    tetap ditunggu sampai bridge_s detik lagi, lalu diputar setelah klip. Baru
+    kalau budget kedua juga lewat, balasan tidak disuarakan.
+
+    Return stats transfer: bytes, waktu sampai audio pertama, waktu decode.
+    """
+    t0 = time.perf_counter()
+    if response_format == "pcm":
+        # stream yang kalah ditutup (koneksi download ikut diputus)
+        def fetch(deadline):
+            return call_hedged("tts", lambda: _open_pcm_stream(text, model, voice),
+                               deadline_s=deadline, discard=lambda res: res[0].close())
+
+        def play(opened):
+            return _play_pcm_stream(opened, out_path, engine, t0)
+    else:
+        def fetch(deadline):
+            return _fetch_file(text, out_path, model, voice, response_format, deadline)
+
+        def play(part):
+            return _play_tts_file(part, out_path, engine, response_format, t0)
+
+    try:
+        result, bridged = _fetch_bridged(fetch, deadline_s, bridge_s, fallback_clip, engine)
+    except DeadlineExceeded:
+        print("⏱️ TTS tidak siap dalam budget (deadline + jembatan), balasan tidak disuarakan.")
+        return {"format": response_format, "bytes": 0, "degraded": "tts_ack_clip"}
+
+    stats = play(result)
+    if bridged:
+        stats["degraded"] = "tts_ack_bridge"
+    return stats
+
+
+def _fetch_bridged(fetch, deadline_s: float | None, bridge_s: float | None, clip: str | None, engine):
+    """
+    fetch(deadline) -> hasil request TTS (sampai audio pertama). Return (hasil, bridged).
+    Lewat deadline_s: klip ack diputar selagi request (dengan hedge-nya) tetap jalan
+    sampai deadline_s + bridge_s; DeadlineExceeded kalau itu juga lewat.
+    """
+    if not deadline_s:
+        return fetch(None), False
+    if not bridge_s:
+        try:
+            return fetch(deadline_s), False
+        except DeadlineExceeded:
+            print(f"⏱️ TTS lewat deadline {deadline_s:.1f}s, pakai klip acknowledgement.")
+            _play_file(clip, engine)
+            raise
+
+    # request jalan di thread sendiri supaya klip bisa diputar sambil menunggu
+    fut = Future()
+    ctx = contextvars.copy_context()
+
+    def _run():
+        try:
+            fut.set_result(ctx.run(fetch, deadline_s + bridge_s))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=_run, name="cbt-tts-fetch", daemon=True).start()
+    done, _ = wait([fut], timeout=deadline_s)
+    if done:
+        return fut.result(), False
+
+    print(f"⏱️ TTS lewat deadline {deadline_s:.1f}s, putar klip acknowledgement sambil menunggu balasan.")
+    _play_file(clip, engine)
+    result = fut.result()  # dibatasi deadline fetch (deadline_s + bridge_s)
+    if engine is not None:
+        engine.wait_playback()  # klip selesai dulu, baru balasan (play() memotong playback)
+    return result, True
+
+
+def _play_file(path: str | None, engine=None):
+    if not path or not os.path.exists(path):
+        return
+    import sounddevice as sd
+    import soundfile as sf
+
+    data, samplerate = sf.read(path, dtype="float32")
+    if engine is not None:
+        engine.play(data, samplerate)
+        return
+    sd.play(data, samplerate)
+    sd.wait()
+
+
+def _fetch_file(text: str, out_path: str, model: str, voice: str, response_format: str,
+                deadline_s: float | None) -> str:
+    """Generate audio (tiap request hedge menulis ke file sendiri). Return path file pemenang."""
+    attempt = [0]
+    lock = threading.Lock()
+
+    def _generate():
+        with lock:
+            attempt[0] += 1
+            path = f"{out_path}.part{attempt[0]}"
+        text_to_speech(text, path, model=model, voice=voice, response_format=response_format)
+        return path
+
+    return call_hedged("tts", _generate, deadline_s=deadline_s, discard=_remove_quietly)
+
+
+def _play_tts_file(part: str, out_path: str, engine, response_format: str, t0: float) -> dict:
+    # lazy: PortAudio/libsndfile baru di-load saat benar-benar memutar audio
+    import sounddevice as sd
+    import soundfile as sf
+
+    os.replace(part, out_path)
+    download_ms = (time.perf_counter() - t0) * 1000.0
 
     # Play audio
+    t1 = time.perf_counter()
     data, samplerate = sf.read(out_path, dtype='float32')
+    decode_ms = (time.perf_counter() - t1) * 1000.0
+
+    stats = _log_tts_stats(response_format, out_path, download_ms, download_ms + decode_ms, decode_ms)
+
+    if engine is not None:
+        engine.play(data, samplerate)
+        return stats
+
     sd.play(data, samplerate)
     sd.wait()
+    return stats
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _open_pcm_stream(text: str, model: str, voice: str):
+    """Buka stream TTS dan tunggu chunk pertama (yang di-hedge adalah time-to-first-byte)."""
+    gen = stream_speech(text, model=model, voice=voice, response_format="pcm")
+    try:
+        first = next(gen)
+    except StopIteration:
+        first = b""
+    return gen, first
+
+
+def _play_pcm_stream(opened, out_path: str, engine, t0: float) -> dict:
+    """Raw PCM 16-bit LE mono 24 kHz: langsung diputar per chunk selagi di-download."""
+    import numpy as np
+    import sounddevice as sd
+    import soundfile as sf
+
+    rate = TTS_PCM_SAMPLE_RATE
+    first_audio_ms = None
+    leftover = b""
+    gen, first = opened
+
+    def _chunks():
+        if first:
+            yield first
+        yield from gen
+
+    out_stream = None
+    if engine is not None:
+        engine.start_stream(rate, channels=1)
+    else:
+        out_stream = sd.RawOutputStream(samplerate=rate, channels=1, dtype="int16")
+        out_stream.start()
+
+    # simpan juga ke file WAV (untuk GUI / arsip), tanpa decode
+    with sf.SoundFile(out_path, "w", samplerate=rate, channels=1, subtype="PCM_16", format="WAV") as wav:
+        try:
+            for chunk in _chunks():
+                buf = leftover + chunk
+                usable = len(buf) - (len(buf) % 2)  # sample int16 = 2 byte
+                leftover = buf[usable:]
+                if not usable:
+                    continue
+
+                pcm = np.frombuffer(buf[:usable], dtype="<i2")
+                if first_audio_ms is None:
+                    first_audio_ms = (time.perf_counter() - t0) * 1000.0
+
+                wav.buffer_write(pcm, dtype="int16")
+                if engine is not None:
+                    if engine.barge_in.is_set():
+                        break  # user memotong: tidak perlu lanjut download
+                    engine.feed(pcm.astype("float32") / 32768.0)
+                else:
+                    out_stream.write(pcm.tobytes())
+        finally:
+            gen.close()
+            if engine is not None:
+                engine.end_stream()
+            else:
+                out_stream.stop()
+                out_stream.close()
+
+    total_ms = (time.perf_counter() - t0) * 1000.0
+    return _log_tts_stats("pcm", out_path, total_ms, first_audio_ms or total_ms, 0.0)
+
+
+def prepare_ack_clip(tmp_dir: str, model: str, voice: str, background: bool = True) -> str:
+    """
+    Pastikan klip ACK_CLIP_TEXT ada di cache (TMP_DIR/ack_<voice>.wav). Return path-nya;
+    kalau background=True, generate jalan di thread supaya startup tidak tertahan.
+    """
+    path = os.path.join(tmp_dir, f"ack_{voice}.wav")
+    if os.path.exists(path):
+        return path
+
+    def _generate():
+        try:
+            text_to_speech(ACK_CLIP_TEXT, path + ".part", model=model, voice=voice, response_format="wav")
+            os.replace(path + ".part", path)
+        except Exception as e:
+            print(f"⚠️ Gagal membuat klip acknowledgement: {e}")
+
+    if background:
+        threading.Thread(target=_generate, name="ack-clip", daemon=True).start()
+    else:
+        _generate()
+    return path
+
+
+async def aprepare_ack_clip(tmp_dir: str, model: str, voice: str) -> str | None:
+    """
+    prepare_ack_clip untuk coroutine, mis. sebagai prefetch di arun_text_turn:
+    generate (kalau belum ada di cache) bersamaan dengan retrieval + chat.
+    Return path klip, None kalau gagal.
+    """
+    path = os.path.join(tmp_dir, f"ack_{voice}.wav")
+    if os.path.exists(path):
+        return path
+    try:
+        await atext_to_speech(ACK_CLIP_TEXT, path + ".part", model=model, voice=voice, response_format="wav")
+        os.replace(path + ".part", path)
+    except Exception as e:
+        print(f"⚠️ Gagal membuat klip acknowledgement: {e}")
+        return None
+    return path
+
+
+def _log_tts_stats(fmt: str, out_path: str, download_ms: float, first_audio_ms: float, decode_ms: float) -> dict:
+    stats = {
+        "format": fmt,
+        "bytes": os.path.getsize(out_path) if os.path.exists(out_path) else 0,
+        "download_ms": round(download_ms, 1),
+        "first_audio_ms": round(first_audio_ms, 1),
+        "decode_ms": round(decode_ms, 1),
+    }
+    print(
+        f"📥 TTS: {stats['bytes'] / 1024:.1f} KB {fmt}, audio pertama {stats['first_audio_ms']:.0f} ms, "
+        f"decode {stats['decode_ms']:.0f} ms"
+    )
+    return stats
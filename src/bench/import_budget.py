@@ -0,0 +1,140 @@
+# src/bench/import_budget.py
+"""
+Cek waktu import (cold start) CLI & GUI terhadap budget.
+
+Pakai:
+    python -m src.bench.import_budget
+    python -m src.bench.import_budget --budget-ms 150 --top 15
+
+Cara kerja: jalankan `python -X importtime -c "import ..."` di subprocess
+(biar cache modul bersih), parse stderr, lalu:
+- total cumulative time modul top-level harus <= budget
+- modul berat (faiss/pandas/numpy/sounddevice/soundfile/openai) tidak boleh ikut ter-import
+Exit code 1 kalau budget dilanggar.
+"""
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+
+from config import BASE_DIR
+
+# Modul yang HARUS lazy (hanya boleh di-load di jalur yang memakainya)
+HEAVY_MODULES = ["faiss", "pandas", "numpy", "sounddevice", "soundfile", "openai"]
+
+# app_gui.py tidak bisa di-import langsung (menjalankan halaman Streamlit)
+GUI_SCRIPT = os.path.join(BASE_DIR, "app_gui.py")
+GUI_EXCLUDE = {"streamlit"}  # streamlit sendiri di luar kendali kita
+
+
+def _is_local_module(name: str) -> bool:
+    path = os.path.join(BASE_DIR, *name.split("."))
+    return os.path.isfile(path + ".py") or os.path.isdir(path)
+
+
+def script_imports(path: str, exclude=frozenset()) -> list[str]:
+    """Modul yang di-import di top-level script (urutan sesuai file), dibaca lewat AST."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            # `from src.monitoring import metrics` -> submodule ikut diukur
+            names = [
+                f"{node.module}.{a.name}" if _is_local_module(f"{node.module}.{a.name}") else node.module
+                for a in node.names
+            ]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] not in exclude and name not in modules:
+                modules.append(name)
+    return modules
+
+
+# Target startup:
+# - cli: app.py (tanpa menjalankan main())
+# - gui: semua import top-level app_gui.py, selalu sama dengan isi file
+TARGETS = {
+    "cli": lambda: ["app"],
+    "gui": lambda: script_imports(GUI_SCRIPT, exclude=GUI_EXCLUDE),
+}
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "200"))
+
+_LINE = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def profile_imports(modules: list[str]) -> list[dict]:
+    """
+    Jalankan -X importtime untuk `modules` dan kembalikan list
+    {"module", "self_us", "cumulative_us", "depth"} sesuai urutan stderr.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import gagal untuk {modules}:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        rows.append({
+            "module": m.group(4),
+            "self_us": int(m.group(1)),
+            "cumulative_us": int(m.group(2)),
+            # importtime meng-indent 2 spasi per level nesting
+            "depth": (len(m.group(3)) - 1) // 2,
+        })
+    return rows
+
+
+def check_target(name: str, modules: list[str], budget_ms: float, top: int = 10) -> bool:
+    rows = profile_imports(modules)
+
+    total_ms = sum(r["cumulative_us"] for r in rows if r["depth"] == 0) / 1000.0
+    imported = {r["module"] for r in rows}
+    leaked = [h for h in HEAVY_MODULES if h in imported]
+
+    print(f"[{name}] import {', '.join(modules)}")
+    print(f"  total: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    for r in sorted(rows, key=lambda r: r["cumulative_us"], reverse=True)[:top]:
+        print(f"  {r['cumulative_us'] / 1000.0:8.1f} ms  {r['module']}")
+
+    ok = True
+    if total_ms > budget_ms:
+        print(f"  ❌ melebihi budget ({total_ms:.1f} > {budget_ms:.0f} ms)")
+        ok = False
+    if leaked:
+        print(f"  ❌ modul berat ikut ter-import saat startup: {', '.join(leaked)}")
+        ok = False
+    if ok:
+        print("  ✅ OK")
+    return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-time budget check untuk CLI & GUI.")
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ap.add_argument("--target", choices=sorted(TARGETS), action="append")
+    ap.add_argument("--top", type=int, default=10, help="tampilkan N modul paling lambat")
+    args = ap.parse_args(argv)
+
+    ok = True
+    for name in args.target or sorted(TARGETS):
+        ok = check_target(name, TARGETS[name](), args.budget_ms, top=args.top) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
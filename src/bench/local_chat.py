@@ -0,0 +1,75 @@
+# src/bench/local_chat.py
+"""
+Stand-in lokal untuk chat_completion (load test tanpa API key / biaya).
+
+Latency disimulasikan: waktu ke token pertama (lognormal di sekitar
+ttft_ms) + panjang jawaban / tokens_per_s. max_concurrency membatasi
+request yang dilayani bersamaan (seperti kuota provider), jadi antrian
+di sisi provider ikut terlihat saat beban naik.
+Signature sama dengan chat_completion di src/llm/client.py.
+"""
+import math
+import random
+import threading
+import time
+
+
+class LocalChat:
+    def __init__(self, ttft_ms: float = 350.0, sigma: float = 0.35, tokens_per_s: float = 60.0,
+                 reply_tokens: int = 60, max_concurrency: int = 8, error_rate: float = 0.0,
+                 seed: int = 13):
+        self.ttft_ms = ttft_ms
+        self.sigma = sigma
+        self.tokens_per_s = tokens_per_s
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.model_name = "local-chat"
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._max_concurrency = max(1, int(max_concurrency))
+        self._slots = threading.BoundedSemaphore(self._max_concurrency)
+        self._aslots = None  # asyncio.Semaphore, dibuat di event loop pemakai
+
+        self.calls = 0
+        self.errors = 0
+
+    def _sample(self, max_tokens: int | None = None) -> tuple[float, bool]:
+        with self._rng_lock:
+            ttft = self.ttft_ms * math.exp(self._rng.gauss(0.0, self.sigma) - self.sigma ** 2 / 2)
+            failed = self._rng.random() < self.error_rate
+            self.calls += 1
+            self.errors += int(failed)
+        tokens = min(self.reply_tokens, max_tokens or self.reply_tokens)
+        return ttft / 1000.0 + tokens / self.tokens_per_s, failed
+
+    def __call__(self, messages, model: str | None = None, temperature: float = 0.4,
+                 max_tokens: int | None = None) -> str:
+        delay, failed = self._sample(max_tokens)
+        with self._slots:
+            time.sleep(delay)
+        if failed:
+            raise RuntimeError("local-chat: simulated provider error")
+        return self._reply(messages)
+
+    @staticmethod
+    def _reply(messages) -> str:
+        user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"Aku dengar kamu bilang: {user[:80]}. Boleh cerita lebih lanjut?"
+
+    # alias supaya bisa dipakai di tempat chat_completion
+    chat_completion = __call__
+
+    async def acall(self, messages, model: str | None = None, temperature: float = 0.4,
+                    max_tokens: int | None = None) -> str:
+        """Versi async (pengganti achat_completion); max_concurrency lewat asyncio.Semaphore."""
+        import asyncio
+
+        if self._aslots is None:
+            self._aslots = asyncio.Semaphore(self._max_concurrency)
+        delay, failed = self._sample(max_tokens)
+        async with self._aslots:
+            await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("local-chat: simulated provider error")
+        return self._reply(messages)
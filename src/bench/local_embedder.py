@@ -0,0 +1,46 @@
+# src/bench/local_embedder.py
+"""
+Embedder lokal deterministik (hashing trick) untuk benchmark & load test.
+
+Tidak butuh API key/jaringan dan hasilnya identik di setiap run, jadi angka
+recall/latency antar-run bisa dibandingkan. Signature-nya sama dengan
+embed_texts / embed_text di src/llm/client.py, jadi bisa dipasang sebagai embed_fn.
+"""
+import re
+import zlib
+
+from src.llm.client import normalize_rows
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 256, char_ngram: int = 3):
+        self.dim = int(dim)
+        self.char_ngram = int(char_ngram)
+        self.model_name = f"local-hash-{self.dim}"
+
+    def _features(self, text: str):
+        tokens = _TOKEN.findall((text or "").lower())
+        feats = list(tokens)
+        feats += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        n = self.char_ngram
+        for tok in tokens:
+            padded = f"#{tok}#"
+            feats += [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+        return feats
+
+    def embed_texts(self, texts: list[str], model: str | None = None, dimensions: int | None = None):
+        import numpy as np
+
+        dim = int(dimensions) if dimensions else self.dim
+        vecs = np.zeros((len(texts), dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode("utf-8"))
+                # bit teratas jadi tanda (+/-) supaya tabrakan hash saling meniadakan
+                vecs[row, h % dim] += 1.0 if (h >> 31) == 0 else -1.0
+        return normalize_rows(vecs)
+
+    def embed_text(self, text: str, model: str | None = None, dimensions: int | None = None):
+        return self.embed_texts([text], model=model, dimensions=dimensions)
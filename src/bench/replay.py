@@ -0,0 +1,335 @@
+# src/bench/replay.py
+"""
+Load generator: replay ucapan client asli (HOPE CSV + transkrip HQC) lewat
+bagian teks dari turn pipeline (src/pipeline/turn.run_text_turn: gate
+stop/filler/safety -> CBTRetriever.search -> build_messages -> chat).
+
+Pakai:
+    python -m src.bench.replay --sessions 8 --rate 10 --turns 400
+    python -m src.bench.replay --sessions 16 --rate 0 --duration 30     # closed loop
+    python -m src.bench.replay --hope-dir dataset/HOPE --hqc-dir "dataset/High Quality Counseling"
+
+- --sessions N : jumlah sesi virtual yang dilayani bersamaan (worker)
+- --rate R     : open loop, turn datang Poisson R/detik ke antrian bersama;
+                 0 = closed loop, tiap sesi kirim turn berikutnya setelah balasan
+                 (+ --think-ms)
+- embedding pakai HashingEmbedder, chat pakai LocalChat (stand-in provider),
+  jadi tidak butuh API key dan angka antar-run bisa dibandingkan
+- --async      : sesi dilayani sebagai task asyncio di satu event loop
+                 (arun_text_turn + LocalChat.acall) alih-alih satu thread per sesi
+
+Laporan: throughput, queueing delay (datang -> mulai diproses), latency
+layanan & end-to-end (p50/p95/p99), latency per tahap, jumlah per jenis turn.
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config, BASE_DIR
+from src.bench.local_chat import LocalChat
+from src.bench.local_embedder import HashingEmbedder
+from src.data.dataset_ingest import _collect_all_docs, build_index
+from src.data.retriever import CBTRetriever
+from src.llm.hedging import get_hedger
+from src.pipeline.turn import arun_text_turn, run_text_turn
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "bench_results")
+
+
+def session_scripts(docs: list[dict], min_tokens: int = 1) -> list[list[str]]:
+    """Ucapan client per sesi, urut seperti di dataset."""
+    sessions = {}
+    for d in docs:
+        text = (d.get("query") or "").strip()
+        if len(text.split()) >= min_tokens:
+            sessions.setdefault((d.get("dataset"), d.get("session_id")), []).append(text)
+    return [s for s in sessions.values() if s]
+
+
+def _percentiles(values: list[float]) -> dict:
+    import numpy as np
+
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    arr = np.asarray(values, dtype="float64")
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p95": round(float(np.percentile(arr, 95)), 2),
+        "p99": round(float(np.percentile(arr, 99)), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+class ReplayRunner:
+    def __init__(self, cfg, retriever, chat_fn, scripts: list[list[str]], sessions: int = 8,
+                 rate: float = 0.0, think_ms: float = 0.0, seed: int = 13, achat_fn=None):
+        """achat_fn: kalau diisi, turn jalan lewat arun_text_turn di event loop (mode --async)."""
+        self.cfg = cfg
+        self.retriever = retriever
+        self.chat_fn = chat_fn
+        self.achat_fn = achat_fn
+        self.sessions = max(1, int(sessions))
+        self.rate = float(rate)
+        self.think_s = think_ms / 1000.0
+        self._rng = random.Random(seed)
+
+        # semua ucapan, diputar bergiliran antar sesi dataset
+        self._utterances = itertools.cycle(
+            [u for group in itertools.zip_longest(*scripts) for u in group if u is not None]
+        )
+        self._utt_lock = threading.Lock()
+
+        self.records = []
+        self._rec_lock = threading.Lock()
+
+    def _next_utterance(self) -> str:
+        with self._utt_lock:
+            return next(self._utterances)
+
+    def _serve(self, text: str, arrived: float):
+        started = time.perf_counter()
+        rec = {"arrived": arrived, "started": started, "kind": "error", "timings": {}}
+        try:
+            turn = run_text_turn(text, self.cfg, self.retriever, chat_fn=self.chat_fn)
+            rec["kind"] = turn.kind
+            rec["timings"] = turn.timings
+            rec["degraded"] = turn.degraded
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+        rec["finished"] = time.perf_counter()
+        with self._rec_lock:
+            self.records.append(rec)
+
+    async def _aserve(self, text: str, arrived: float):
+        started = time.perf_counter()
+        rec = {"arrived": arrived, "started": started, "kind": "error", "timings": {}}
+        try:
+            turn = await arun_text_turn(text, self.cfg, self.retriever, achat_fn=self.achat_fn)
+            rec["kind"] = turn.kind
+            rec["timings"] = turn.timings
+            rec["degraded"] = turn.degraded
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+        rec["finished"] = time.perf_counter()
+        self.records.append(rec)
+
+    # ---------- open loop ----------
+    def _run_open(self, turns: int, deadline: float):
+        q = queue.Queue()
+
+        def worker():
+            while True:
+                item = q.get()
+                if item is None:
+                    return
+                self._serve(*item)
+
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(self.sessions)]
+        for w in workers:
+            w.start()
+
+        next_at = time.perf_counter()
+        for _ in range(turns):
+            next_at += self._rng.expovariate(self.rate)
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if time.perf_counter() >= deadline:
+                break
+            q.put((self._next_utterance(), time.perf_counter()))
+
+        for _ in workers:
+            q.put(None)
+        for w in workers:
+            w.join()
+
+    # ---------- closed loop ----------
+    def _run_closed(self, turns: int, deadline: float):
+        budget = itertools.count()
+
+        def virtual_session():
+            while next(budget) < turns and time.perf_counter() < deadline:
+                self._serve(self._next_utterance(), time.perf_counter())
+                if self.think_s:
+                    time.sleep(self.think_s)
+
+        threads = [threading.Thread(target=virtual_session, daemon=True) for _ in range(self.sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    # ---------- asyncio (--async) ----------
+    async def _arun_open(self, turns: int, deadline: float):
+        import asyncio
+
+        workers = asyncio.Semaphore(self.sessions)
+
+        async def serve(text: str, arrived: float):
+            async with workers:
+                await self._aserve(text, arrived)
+
+        async with asyncio.TaskGroup() as tg:
+            next_at = time.perf_counter()
+            for _ in range(turns):
+                next_at += self._rng.expovariate(self.rate)
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if time.perf_counter() >= deadline:
+                    break
+                tg.create_task(serve(self._next_utterance(), time.perf_counter()))
+
+    async def _arun_closed(self, turns: int, deadline: float):
+        import asyncio
+
+        budget = itertools.count()
+
+        async def virtual_session():
+            while next(budget) < turns and time.perf_counter() < deadline:
+                await self._aserve(self._next_utterance(), time.perf_counter())
+                if self.think_s:
+                    await asyncio.sleep(self.think_s)
+
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(self.sessions):
+                tg.create_task(virtual_session())
+
+    def run(self, turns: int = 200, duration: float | None = None) -> dict:
+        t0 = time.perf_counter()
+        deadline = t0 + duration if duration else float("inf")
+        if self.achat_fn is not None:
+            import asyncio
+
+            run = self._arun_open if self.rate > 0 else self._arun_closed
+            asyncio.run(run(turns, deadline))
+        elif self.rate > 0:
+            self._run_open(turns, deadline)
+        else:
+            self._run_closed(turns, deadline)
+        return self.report(time.perf_counter() - t0)
+
+    def report(self, wall_s: float) -> dict:
+        recs = self.records
+        done = [r for r in recs if r["kind"] != "error"]
+        kinds = {}
+        degraded = {}
+        for r in recs:
+            kinds[r["kind"]] = kinds.get(r["kind"], 0) + 1
+            for path in r.get("degraded", ()):
+                degraded[path] = degraded.get(path, 0) + 1
+
+        stage = {}
+        for r in done:
+            for name, ms in r["timings"].items():
+                stage.setdefault(name, []).append(ms)
+
+        errors = [r["error"] for r in recs if "error" in r]
+        return {
+            "turns": len(recs),
+            "wall_seconds": round(wall_s, 3),
+            "throughput_tps": round(len(done) / wall_s, 3) if wall_s else 0.0,
+            "error_rate": round(len(errors) / len(recs), 4) if recs else 0.0,
+            "kinds": kinds,
+            "degraded": degraded,
+            "hedging": get_hedger().summary(),
+            "queue_ms": _percentiles([(r["started"] - r["arrived"]) * 1000.0 for r in recs]),
+            "service_ms": _percentiles([(r["finished"] - r["started"]) * 1000.0 for r in done]),
+            "end_to_end_ms": _percentiles([(r["finished"] - r["arrived"]) * 1000.0 for r in done]),
+            "stage_ms": {name: _percentiles(v) for name, v in sorted(stage.items())},
+            "sample_errors": errors[:5],
+        }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay ucapan dataset lewat turn pipeline teks (load test).")
+    ap.add_argument("--sessions", type=int, default=8, help="sesi virtual yang dilayani bersamaan")
+    ap.add_argument("--rate", type=float, default=0.0, help="turn/detik (Poisson); 0 = closed loop")
+    ap.add_argument("--turns", type=int, default=200)
+    ap.add_argument("--duration", type=float, help="batas waktu run (detik)")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="jeda antar turn di closed loop")
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--embed-dim", type=int, default=256)
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="layani sesi sebagai task asyncio (arun_text_turn)")
+
+    # stand-in provider
+    ap.add_argument("--chat-ttft-ms", type=float, default=350.0)
+    ap.add_argument("--chat-sigma", type=float, default=0.35, help="sebaran lognormal TTFT (ekor latency)")
+    ap.add_argument("--chat-tokens-per-s", type=float, default=60.0)
+    ap.add_argument("--chat-concurrency", type=int, default=8, help="request paralel maksimum di provider")
+    ap.add_argument("--chat-error-rate", type=float, default=0.0)
+
+    ap.add_argument("--hope-dir")
+    ap.add_argument("--hqc-dir")
+    ap.add_argument("--out", help="path JSON output (default: bench_results/replay-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    cfg = Config()
+    if args.hope_dir:
+        cfg = dataclasses.replace(cfg, HOPE_DIR=os.path.abspath(args.hope_dir))
+    if args.hqc_dir:
+        cfg = dataclasses.replace(cfg, HQC_DIR=os.path.abspath(args.hqc_dir))
+
+    embedder = HashingEmbedder(dim=args.embed_dim)
+    chat = LocalChat(
+        ttft_ms=args.chat_ttft_ms,
+        sigma=args.chat_sigma,
+        tokens_per_s=args.chat_tokens_per_s,
+        max_concurrency=args.chat_concurrency,
+        error_rate=args.chat_error_rate,
+        seed=args.seed,
+    )
+
+    docs = _collect_all_docs(cfg)
+    scripts = session_scripts(docs)
+    print(f"Replay: {sum(len(s) for s in scripts)} ucapan dari {len(scripts)} sesi dataset")
+
+    with tempfile.TemporaryDirectory(prefix="cbt-replay-") as tmp:
+        cfg = dataclasses.replace(cfg, INDEX_DIR=tmp, INDEX_RELOAD_SECONDS=0, EMBED_MODEL=embedder.model_name)
+        build_index(cfg, docs=docs, embed_fn=embedder.embed_texts)
+        retriever = CBTRetriever(cfg, watch=False, embed_fn=embedder.embed_text)
+        try:
+            runner = ReplayRunner(cfg, retriever, chat, scripts, sessions=args.sessions,
+                                  rate=args.rate, think_ms=args.think_ms, seed=args.seed,
+                                  achat_fn=chat.acall if args.use_async else None)
+            result = runner.run(turns=args.turns, duration=args.duration)
+        finally:
+            retriever.close()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "open" if args.rate > 0 else "closed",
+        "pipeline": "async" if args.use_async else "threads",
+        "sessions": args.sessions,
+        "rate": args.rate,
+        "embedder": embedder.model_name,
+        "chat": {"ttft_ms": args.chat_ttft_ms, "tokens_per_s": args.chat_tokens_per_s,
+                 "concurrency": args.chat_concurrency, "error_rate": args.chat_error_rate},
+        **result,
+    }
+    print(
+        f"[{report['mode']}/{report['pipeline']}] {result['turns']} turn, {result['throughput_tps']:.2f} turn/s, "
+        f"queue p99 {result['queue_ms']['p99']:.0f} ms, "
+        f"e2e p50/p99 {result['end_to_end_ms']['p50']:.0f}/{result['end_to_end_ms']['p99']:.0f} ms, "
+        f"error {result['error_rate']:.1%}"
+    )
+
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, f"replay-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Saved benchmark: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
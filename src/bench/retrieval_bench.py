@@ -0,0 +1,263 @@
+# src/bench/retrieval_bench.py
+"""
+Benchmark kualitas & latency CBTRetriever.search dari dataset HOPE/HQC.
+
+Pakai:
+    python -m src.bench.retrieval_bench
+    python -m src.bench.retrieval_bench --config flat --config int8 --config "pq8:INDEX_STORAGE=pq,INDEX_PQ_M=8"
+
+Split held-out (deterministik, seed tetap):
+- sebagian pasangan C->T per sesi dikeluarkan dari index dan dijadikan query
+- "same_session": relevan = doc lain dari sesi yang sama
+- "next_turn"   : relevan = pasangan tepat sebelum/sesudahnya di sesi yang sama
+
+Metrik per (config, split):
+- recall@k   : query yang punya minimal 1 doc relevan di top-k
+- mrr        : 1/rank doc relevan pertama (0 kalau tidak ada di top-k)
+- dedup_rate : porsi hasil yang teks client-nya unik dalam satu daftar top-k
+               (1.0 = tidak ada contoh kembar yang membuang token prompt)
+- latency_ms : p50/p99 waktu search (embed lokal + search + post-processing)
+
+Hasil ditulis sebagai JSON supaya bisa dibandingkan antar-run.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from config import Config, BASE_DIR
+from src.bench.local_embedder import HashingEmbedder
+from src.data.dataset_ingest import _collect_all_docs, build_index
+from src.data.retriever import CBTRetriever
+from src.data.vector_store import STORAGE_MODES
+from src.llm.lexicon import normalize_text
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "bench_results")
+
+
+def parse_config_spec(spec: str) -> tuple[str, dict]:
+    """
+    "int8"                              -> ("int8", {"INDEX_STORAGE": "int8"})
+    "pq8:INDEX_STORAGE=pq,INDEX_PQ_M=8" -> ("pq8", {...})
+    """
+    label, _, rest = spec.partition(":")
+    overrides = {}
+    for part in filter(None, (p.strip() for p in rest.split(","))):
+        key, _, value = part.partition("=")
+        overrides[key.strip()] = value.strip()
+    if label in STORAGE_MODES and "INDEX_STORAGE" not in overrides:
+        overrides["INDEX_STORAGE"] = label
+    return label, overrides
+
+
+def apply_overrides(cfg, overrides: dict):
+    """Salin Config dengan override string -> tipe field aslinya."""
+    fields = {f.name: f for f in dataclasses.fields(cfg)}
+    typed = {}
+    for key, value in overrides.items():
+        if key not in fields:
+            raise ValueError(f"Field Config tidak dikenal: {key}")
+        current = getattr(cfg, key)
+        if isinstance(current, bool):
+            typed[key] = str(value).lower() in ("1", "true", "yes")
+        elif isinstance(current, (int, float)):
+            typed[key] = type(current)(value)
+        else:
+            typed[key] = value
+    return dataclasses.replace(cfg, **typed)
+
+
+def _doc_key(d: dict) -> tuple:
+    return (d.get("dataset"), d.get("session_id"), d.get("query"), d.get("response"))
+
+
+def make_splits(docs: list[dict], holdout: float = 0.1, min_tokens: int = 3, seed: int = 13):
+    """
+    Return (indexed_docs, queries) dengan queries:
+        [{"query", "session": (dataset, session_id), "neighbors": {doc_key, ...}}]
+    """
+    rng = random.Random(seed)
+
+    sessions = {}
+    for i, d in enumerate(docs):
+        sessions.setdefault((d.get("dataset"), d.get("session_id")), []).append(i)
+
+    held = set()
+    for ids in sessions.values():
+        candidates = [i for i in ids if len(docs[i]["query"].split()) >= min_tokens]
+        n_hold = int(round(len(candidates) * holdout))
+        # sisakan doc lain di sesi tsb supaya same_session tetap punya target
+        n_hold = min(n_hold, max(0, len(ids) - 1))
+        held.update(rng.sample(candidates, n_hold) if n_hold else [])
+
+    indexed = [d for i, d in enumerate(docs) if i not in held]
+
+    queries = []
+    for key, ids in sessions.items():
+        for pos, i in enumerate(ids):
+            if i not in held:
+                continue
+            neighbors = set()
+            for j in (pos - 1, pos + 1):
+                if 0 <= j < len(ids) and ids[j] not in held:
+                    neighbors.add(_doc_key(docs[ids[j]]))
+            queries.append({"query": docs[i]["query"], "session": key, "neighbors": neighbors})
+
+    return indexed, queries
+
+
+def _percentile(values: list[float], q: float) -> float:
+    import numpy as np
+
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def evaluate(retriever, queries: list[dict], k: int) -> dict:
+    """Jalankan semua query sekali, hitung metrik untuk kedua split."""
+    latencies = []
+    stats = {
+        "same_session": {"n": 0, "hits": 0, "rr": 0.0},
+        "next_turn": {"n": 0, "hits": 0, "rr": 0.0},
+    }
+    returned = 0
+    unique = 0
+
+    for q in queries:
+        t0 = time.perf_counter()
+        results = retriever.search(q["query"], k=k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        returned += len(results)
+        unique += len({normalize_text(r.get("query") or "") for r in results})
+
+        relevance = {
+            "same_session": [(r.get("dataset"), r.get("session_id")) == q["session"] for r in results],
+            "next_turn": [_doc_key(r) in q["neighbors"] for r in results],
+        }
+        for split, flags in relevance.items():
+            if split == "next_turn" and not q["neighbors"]:
+                continue
+            st = stats[split]
+            st["n"] += 1
+            if any(flags):
+                st["hits"] += 1
+                st["rr"] += 1.0 / (flags.index(True) + 1)
+
+    latency = {
+        "p50": round(_percentile(latencies, 50), 3),
+        "p99": round(_percentile(latencies, 99), 3),
+        "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+    }
+    dedup_rate = round(unique / returned, 4) if returned else 1.0
+
+    out = {}
+    for split, st in stats.items():
+        n = st["n"]
+        out[split] = {
+            "queries": n,
+            f"recall@{k}": round(st["hits"] / n, 4) if n else 0.0,
+            "mrr": round(st["rr"] / n, 4) if n else 0.0,
+            "dedup_rate": dedup_rate,
+            "latency_ms": latency,
+        }
+    return out
+
+
+def run_benchmark(base_cfg, config_specs: list[str], k: int = 5, holdout: float = 0.1,
+                  min_tokens: int = 3, seed: int = 13, embed_dim: int = 256) -> dict:
+    embedder = HashingEmbedder(dim=embed_dim)
+    docs = _collect_all_docs(base_cfg)
+    indexed, queries = make_splits(docs, holdout=holdout, min_tokens=min_tokens, seed=seed)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embedder": embedder.model_name,
+        "k": k,
+        "seed": seed,
+        "holdout": holdout,
+        "docs_total": len(docs),
+        "docs_indexed": len(indexed),
+        "queries": len(queries),
+        "results": [],
+    }
+
+    for spec in config_specs:
+        label, overrides = parse_config_spec(spec)
+        with tempfile.TemporaryDirectory(prefix="cbt-bench-") as tmp:
+            cfg = apply_overrides(base_cfg, overrides)
+            cfg = dataclasses.replace(
+                cfg, INDEX_DIR=tmp, INDEX_RELOAD_SECONDS=0, EMBED_MODEL=embedder.model_name
+            )
+
+            t0 = time.perf_counter()
+            build_index(cfg, docs=indexed, embed_fn=embedder.embed_texts)
+            build_s = time.perf_counter() - t0
+
+            retriever = CBTRetriever(cfg, watch=False, embed_fn=embedder.embed_text)
+            metrics = evaluate(retriever, queries, k=k)
+            storage = (retriever.manifest or {}).get("storage")
+            curation = (retriever.manifest or {}).get("curation")
+            retriever.close()
+
+        for split, m in metrics.items():
+            report["results"].append({
+                "config": label,
+                "overrides": overrides,
+                "split": split,
+                "build_seconds": round(build_s, 3),
+                "storage": storage,
+                "curation": curation,
+                **m,
+            })
+        print(f"[{label}] " + "  ".join(
+            f"{split}: recall@{k}={m[f'recall@{k}']:.3f} mrr={m['mrr']:.3f}"
+            for split, m in metrics.items()
+        ) + f"  p50={metrics['same_session']['latency_ms']['p50']:.2f}ms"
+            f" p99={metrics['same_session']['latency_ms']['p99']:.2f}ms")
+
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark retrieval CBTRetriever (HOPE/HQC held-out).")
+    ap.add_argument("--config", action="append", help="label[:KEY=VAL,...] (default: flat)")
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--holdout", type=float, default=0.1)
+    ap.add_argument("--min-tokens", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--embed-dim", type=int, default=256)
+    ap.add_argument("--hope-dir")
+    ap.add_argument("--hqc-dir")
+    ap.add_argument("--out", help="path JSON output (default: bench_results/retrieval-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    cfg = Config()
+    if args.hope_dir:
+        cfg = dataclasses.replace(cfg, HOPE_DIR=os.path.abspath(args.hope_dir))
+    if args.hqc_dir:
+        cfg = dataclasses.replace(cfg, HQC_DIR=os.path.abspath(args.hqc_dir))
+
+    report = run_benchmark(
+        cfg,
+        args.config or ["flat"],
+        k=args.k,
+        holdout=args.holdout,
+        min_tokens=args.min_tokens,
+        seed=args.seed,
+        embed_dim=args.embed_dim,
+    )
+
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, f"retrieval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Saved benchmark: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# src/bench/shard_scaling.py
+"""
+Benchmark index ber-shard (src/data/sharding.py): scaling 1..N thread.
+
+Pakai:
+    python -m src.bench.shard_scaling
+    python -m src.bench.shard_scaling --n 200000 --dim 768 --shards 8 --threads 1,2,4,8
+
+Vektor acak ternormalisasi dibagi rata ke --shards shard. Diukur:
+- baseline   : satu index flat (tanpa shard), sama seperti sebelum INDEX_SHARDS
+- per thread : p50/p99 search satu query + batch ms/query ShardedIndex
+- rebuild    : build semua shard vs build satu shard saja (index + tulis file)
+- agreement  : id top-k ShardedIndex vs index tunggal (tie dilaporkan terpisah)
+
+Catatan: speed-up paralel dibatasi jumlah core (cpu_count dicatat di hasil).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from config import BASE_DIR
+from src.bench.vector_backend import compare_results, random_vectors, _percentiles
+from src.data.search_backend import BACKENDS, build_flat_index, write_index
+from src.data.sharding import ShardedIndex
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "bench_results")
+
+
+def _split(vectors, shards: int):
+    import numpy as np
+
+    bounds = np.linspace(0, len(vectors), shards + 1).astype(int)
+    return [(f"s{j:02d}", vectors[a:b], np.arange(a, b)) for j, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+def bench_search(index, queries, k: int, repeat: int) -> tuple[dict, tuple]:
+    single = []
+    for _ in range(repeat):
+        for row in queries:
+            t0 = time.perf_counter()
+            index.search(row[None, :], k)
+            single.append((time.perf_counter() - t0) * 1000.0)
+
+    batch = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = index.search(queries, k)
+        batch = min(batch, time.perf_counter() - t0)
+
+    return {
+        "query_ms": _percentiles(single),
+        "batch_ms_per_query": round(batch * 1000.0 / len(queries), 5),
+    }, result
+
+
+def bench_rebuild(parts, backend: str, tmp: str) -> dict:
+    def _build(name, vecs):
+        write_index(build_flat_index(vecs, backend), os.path.join(tmp, f"shard-{name}.index"), backend)
+
+    t0 = time.perf_counter()
+    for name, vecs, _ in parts:
+        _build(name, vecs)
+    full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _build(*parts[0][:2])
+    one = time.perf_counter() - t0
+    return {
+        "full_ms": round(full * 1000.0, 2),
+        "one_shard_ms": round(one * 1000.0, 2),
+        "ratio": round(one / full, 4) if full else 0.0,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark scaling index ber-shard (1..N thread).")
+    ap.add_argument("--n", type=int, default=100000, help="jumlah vektor acak")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--shards", type=int, default=8)
+    ap.add_argument("--threads", help="daftar thread, mis. 1,2,4 (default: 1..cpu_count)")
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--backend", choices=BACKENDS, default="faiss")
+    ap.add_argument("--out", help="path JSON output (default: bench_results/shard-scaling-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    import numpy as np
+
+    cpus = os.cpu_count() or 1
+    threads = [int(t) for t in args.threads.split(",")] if args.threads else list(range(1, cpus + 1))
+
+    vectors = random_vectors(args.n, args.dim, args.seed)
+    rng = np.random.default_rng(args.seed)
+    qids = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[qids])
+    parts = _split(vectors, args.shards)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "vectors": int(len(vectors)),
+        "dim": args.dim,
+        "shards": args.shards,
+        "k": args.k,
+        "queries": int(len(queries)),
+        "backend": args.backend,
+        "cpu_count": cpus,
+        "results": [],
+    }
+
+    res, single_out = bench_search(build_flat_index(vectors, args.backend), queries, args.k, args.repeat)
+    report["baseline"] = res
+    print(f"[single index] query p50/p99 {res['query_ms']['p50']:.3f}/{res['query_ms']['p99']:.3f} ms, "
+          f"batch {res['batch_ms_per_query']:.4f} ms/query")
+
+    shards = [(name, build_flat_index(vecs, args.backend), ids) for name, vecs, ids in parts]
+    for t in threads:
+        index = ShardedIndex(shards, threads=t)
+        res, out = bench_search(index, queries, args.k, args.repeat)
+        index.close()
+        res["threads"] = t
+        report["results"].append(res)
+        print(f"[{args.shards} shard, {t} thread] query p50/p99 "
+              f"{res['query_ms']['p50']:.3f}/{res['query_ms']['p99']:.3f} ms, "
+              f"batch {res['batch_ms_per_query']:.4f} ms/query")
+
+    report["agreement"] = compare_results(single_out, out)
+    a = report["agreement"]
+    print(f"Hasil vs index tunggal: {a['identical_ids']}/{a['queries']} identik, "
+          f"{a['tie_order_only']} beda urutan tie, {a['mismatched']} beda")
+
+    with tempfile.TemporaryDirectory(prefix="cbt-shards-") as tmp:
+        report["rebuild"] = bench_rebuild(parts, args.backend, tmp)
+    r = report["rebuild"]
+    print(f"Rebuild: semua shard {r['full_ms']:.1f} ms, satu shard {r['one_shard_ms']:.1f} ms")
+
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, f"shard-scaling-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Saved benchmark: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
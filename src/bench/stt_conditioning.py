@@ -0,0 +1,180 @@
+# src/bench/stt_conditioning.py
+"""
+Ukur efek conditioning audio (trim hening + pendekkan jeda) ke upload & latency STT.
+
+Pakai:
+    python -m src.bench.stt_conditioning tmp/rekaman1.wav tmp/rekaman2.wav
+    python -m src.bench.stt_conditioning tmp/*.wav --repeat 3 --format flac
+    python -m src.bench.stt_conditioning tmp/*.wav --no-stt     # hanya durasi & ukuran file
+    python -m src.bench.stt_conditioning --no-stt                # hanya cek round-trip format upload
+
+Per file, versi asli dan versi conditioned ditulis dengan format upload yang sama,
+lalu ditranskrip bergantian (repeat kali) supaya fluktuasi jaringan terbagi rata.
+Threshold bicara diperkirakan seperti VAD recorder: noise floor * 3 + margin,
+dengan noise floor = persentil-10 RMS frame.
+
+Sebelum itu selalu ada cek round-trip: sinyal sintetis di rate rekaman umum
+(ROUNDTRIP_RATES) ditulis lewat write_upload untuk semua format upload, lalu
+durasi file yang terbaca harus sama dengan durasi rekaman (toleransi 1 sampel).
+Exit code 1 kalau ada yang meleset.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from config import Config, BASE_DIR
+from src.audio.conditioning import condition_audio, speech_mask
+from src.audio.formats import write_upload
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "bench_results")
+
+# rate mic / device yang umum dipakai user
+ROUNDTRIP_RATES = (16000, 24000, 44100, 48000)
+
+
+def estimate_threshold(audio, sample_rate: int, chunk_ms: int = 30, floor: float = 0.006) -> float:
+    import numpy as np
+
+    from src.audio.record import chunk_rms
+
+    frame = max(1, int(sample_rate * (chunk_ms / 1000.0)))
+    levels = [chunk_rms(audio[i:i + frame]) for i in range(0, len(audio), frame)]
+    noise_floor = float(np.percentile(levels, 10)) if levels else 0.0
+    return max(floor, noise_floor * 3.0 + 0.0015)
+
+
+def check_roundtrip(tmp_dir: str, target_rate: int, seconds: float = 2.37) -> list[dict]:
+    """Durasi tertulis == durasi rekaman untuk semua format upload x ROUNDTRIP_RATES."""
+    import numpy as np
+    import soundfile as sf
+
+    from src.audio.formats import UPLOAD_FORMATS
+
+    rows = []
+    for sr in ROUNDTRIP_RATES:
+        t = np.arange(int(sr * seconds)) / float(sr)
+        audio = (0.1 * np.sin(2 * np.pi * 220.0 * t)).astype("float32").reshape(-1, 1)
+        for fmt in UPLOAD_FORMATS:
+            path, up = write_upload(os.path.join(tmp_dir, f"roundtrip_{sr}"), audio, sr, fmt=fmt, target_rate=target_rate)
+            info = sf.info(path)
+            drift = info.duration - len(audio) / float(sr)
+            rows.append({
+                "capture_rate": sr,
+                "format": fmt,
+                "written_rate": info.samplerate,
+                "seconds": round(info.duration, 4),
+                "drift_ms": round(drift * 1000.0, 3),
+                "ok": abs(drift) <= 1.0 / info.samplerate,
+            })
+    return rows
+
+
+def bench_file(path: str, cfg: Config, tmp_dir: str, fmt: str, repeat: int, run_stt: bool) -> dict:
+    import soundfile as sf
+
+    audio, sr = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio[:, :1]
+    threshold = estimate_threshold(audio, sr)
+    conditioned, cstats = condition_audio(
+        audio, sr, threshold, max_pause_seconds=cfg.MAX_PAUSE_SECONDS, normalize_gain=cfg.NORMALIZE_GAIN
+    )
+
+    base = os.path.join(tmp_dir, os.path.splitext(os.path.basename(path))[0])
+    orig_path, orig_up = write_upload(base + "_orig", audio, sr, fmt=fmt, target_rate=cfg.STT_UPLOAD_SAMPLE_RATE)
+    cond_path, cond_up = write_upload(base + "_cond", conditioned, sr, fmt=fmt, target_rate=cfg.STT_UPLOAD_SAMPLE_RATE)
+
+    row = {
+        "file": path,
+        "threshold": round(threshold, 5),
+        "speech_frames": int(speech_mask(audio, sr, threshold)[0].sum()),
+        "conditioning": cstats,
+        "bytes_orig": orig_up["bytes"],
+        "bytes_cond": cond_up["bytes"],
+    }
+    if not run_stt:
+        return row
+
+    from src.llm.client import transcribe_audio
+
+    lat = {"orig": [], "cond": []}
+    text = {}
+    for _ in range(repeat):
+        for label, p in (("orig", orig_path), ("cond", cond_path)):
+            t0 = time.perf_counter()
+            text[label] = transcribe_audio(p, model=cfg.STT_MODEL)
+            lat[label].append((time.perf_counter() - t0) * 1000.0)
+
+    row["stt_ms_orig"] = round(statistics.median(lat["orig"]), 1)
+    row["stt_ms_cond"] = round(statistics.median(lat["cond"]), 1)
+    row["stt_ms_saved"] = round(row["stt_ms_orig"] - row["stt_ms_cond"], 1)
+    row["text_orig"] = text["orig"]
+    row["text_cond"] = text["cond"]
+    row["text_same"] = text["orig"].strip().lower() == text["cond"].strip().lower()
+    return row
+
+
+def summarize(rows: list[dict]) -> dict:
+    total_in = sum(r["conditioning"]["seconds_in"] for r in rows)
+    total_removed = sum(r["conditioning"]["seconds_removed"] for r in rows)
+    out = {
+        "files": len(rows),
+        "seconds_in": round(total_in, 2),
+        "seconds_removed": round(total_removed, 2),
+        "removed_ratio": round(total_removed / total_in, 3) if total_in else 0.0,
+        "bytes_saved_ratio": round(
+            1.0 - sum(r["bytes_cond"] for r in rows) / max(1, sum(r["bytes_orig"] for r in rows)), 3
+        ),
+    }
+    timed = [r for r in rows if "stt_ms_saved" in r]
+    if timed:
+        out["stt_ms_saved_median"] = round(statistics.median(r["stt_ms_saved"] for r in timed), 1)
+        out["text_same_rate"] = round(sum(r["text_same"] for r in timed) / len(timed), 3)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark conditioning audio sebelum STT.")
+    ap.add_argument("files", nargs="*", help="rekaman (wav/flac/ogg); kosong = hanya cek round-trip")
+    ap.add_argument("--format", default=None, help="format upload (default: STT_UPLOAD_FORMAT)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-stt", action="store_true", help="jangan panggil STT (hanya durasi & ukuran)")
+    ap.add_argument("--out", help="path JSON output (default: bench_results/stt-conditioning-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    cfg = Config()
+    fmt = args.format or cfg.STT_UPLOAD_FORMAT
+
+    with tempfile.TemporaryDirectory(prefix="cbt-stt-bench-") as tmp_dir:
+        roundtrip = check_roundtrip(tmp_dir, cfg.STT_UPLOAD_SAMPLE_RATE)
+        rows = [bench_file(p, cfg, tmp_dir, fmt, args.repeat, not args.no_stt) for p in args.files]
+
+    bad = [r for r in roundtrip if not r["ok"]]
+    for r in bad:
+        print(f"❌ Round-trip {r['format']} @ {r['capture_rate']} Hz: meleset {r['drift_ms']} ms")
+    if not bad:
+        print(f"✅ Round-trip durasi OK ({len(roundtrip)} kombinasi format x rate)")
+
+    report = {
+        "format": fmt,
+        "max_pause_seconds": cfg.MAX_PAUSE_SECONDS,
+        "roundtrip": roundtrip,
+        "summary": summarize(rows) if rows else {},
+        "files": rows,
+    }
+    if rows:
+        print(json.dumps(report["summary"], indent=2))
+
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, f"stt-conditioning-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Saved benchmark: {out}")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# src/bench/vector_backend.py
+"""
+Benchmark backend vector search: faiss vs numpy (src/data/search_backend.py).
+
+Pakai:
+    python -m src.bench.vector_backend
+    python -m src.bench.vector_backend --n 50000 --dim 1536 --queries 500
+
+Vektor diambil dari dataset HOPE/HQC (HashingEmbedder, tanpa API) atau acak
+(--n > 0). Per backend diukur:
+- cold_load_ms : subprocess baru -> import backend + read_index (startup node)
+- load_ms      : read_index saja (modul sudah ter-import)
+- query_ms     : p50/p99 search satu query, dan batch_ms_per_query untuk semua query sekaligus
+- file_bytes   : ukuran file index
+
+Hasil kedua backend juga dibandingkan: id top-k harus sama persis, kecuali
+urutan di antara skor yang sama (tie) -> dilaporkan terpisah.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import Config, BASE_DIR
+from src.data.search_backend import BACKENDS, build_flat_index, read_index, write_index
+
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "bench_results")
+
+_COLD_LOAD = """
+import json, sys, time
+t0 = time.perf_counter()
+from src.data.search_backend import read_index
+index = read_index(sys.argv[1], backend=sys.argv[2])
+index.search(index.reconstruct(0)[None, :], 1)
+print(json.dumps({"ms": (time.perf_counter() - t0) * 1000.0}))
+"""
+
+
+def dataset_vectors(cfg, dim: int):
+    from src.bench.local_embedder import HashingEmbedder
+    from src.data.dataset_ingest import _collect_all_docs
+
+    docs = _collect_all_docs(cfg)
+    return HashingEmbedder(dim=dim).embed_texts([d["query"] for d in docs])
+
+
+def random_vectors(n: int, dim: int, seed: int):
+    import numpy as np
+
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def _percentiles(values: list[float]) -> dict:
+    import numpy as np
+
+    return {
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+def cold_load_ms(path: str, backend: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _COLD_LOAD, path, backend],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        best = min(best, json.loads(proc.stdout.strip().splitlines()[-1])["ms"])
+    return round(best, 2)
+
+
+def bench_backend(backend: str, vectors, queries, k: int, repeat: int, tmp: str) -> tuple[dict, tuple]:
+    path = os.path.join(tmp, f"{backend}.index")
+    write_index(build_flat_index(vectors, backend), path, backend)
+
+    # load in-process (import sudah terjadi di warm-up pertama)
+    read_index(path, backend)
+    t0 = time.perf_counter()
+    index = read_index(path, backend)
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    single = []
+    for _ in range(repeat):
+        for row in queries:
+            t0 = time.perf_counter()
+            index.search(row[None, :], k)
+            single.append((time.perf_counter() - t0) * 1000.0)
+
+    batch = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = index.search(queries, k)
+        batch = min(batch, time.perf_counter() - t0)
+
+    return {
+        "backend": backend,
+        "file_bytes": os.path.getsize(path),
+        "cold_load_ms": cold_load_ms(path, backend, repeat),
+        "load_ms": round(load_ms, 3),
+        "query_ms": _percentiles(single),
+        "batch_ms_per_query": round(batch * 1000.0 / len(queries), 5),
+    }, result
+
+
+def compare_results(a, b, tol: float = 1e-5) -> dict:
+    """Bandingkan (scores, ids) dua backend per query."""
+    import numpy as np
+
+    (sa, ia), (sb, ib) = a, b
+    identical = int(np.count_nonzero((ia == ib).all(axis=1)))
+    # urutan skor sama tapi id beda -> hanya pilihan di antara skor yang sama
+    # (vektor duplikat, termasuk tie di posisi ke-k) -> tetap dianggap cocok
+    tie_only = 0
+    for row in np.flatnonzero(~(ia == ib).all(axis=1)):
+        if np.allclose(sa[row], sb[row], atol=tol):
+            tie_only += 1
+    return {
+        "queries": int(len(ia)),
+        "identical_ids": identical,
+        "tie_order_only": tie_only,
+        "mismatched": int(len(ia) - identical - tie_only),
+        "max_score_diff": float(np.abs(sa - sb).max()) if sa.size else 0.0,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark backend vector search (faiss vs numpy).")
+    ap.add_argument("--n", type=int, default=0, help="jumlah vektor acak; 0 = vektor dataset HOPE/HQC")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--backend", action="append", choices=BACKENDS, help="default: semua")
+    ap.add_argument("--hope-dir")
+    ap.add_argument("--hqc-dir")
+    ap.add_argument("--out", help="path JSON output (default: bench_results/vector-backend-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    import dataclasses
+    import numpy as np
+
+    cfg = Config()
+    if args.hope_dir:
+        cfg = dataclasses.replace(cfg, HOPE_DIR=os.path.abspath(args.hope_dir))
+    if args.hqc_dir:
+        cfg = dataclasses.replace(cfg, HQC_DIR=os.path.abspath(args.hqc_dir))
+
+    if args.n > 0:
+        vectors = random_vectors(args.n, args.dim, args.seed)
+    else:
+        vectors = dataset_vectors(cfg, args.dim)
+    rng = np.random.default_rng(args.seed)
+    qids = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[qids])
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "vectors": int(len(vectors)),
+        "dim": int(vectors.shape[1]),
+        "k": args.k,
+        "queries": int(len(queries)),
+        "source": "random" if args.n > 0 else "dataset",
+        "results": [],
+    }
+
+    outputs = {}
+    with tempfile.TemporaryDirectory(prefix="cbt-backend-") as tmp:
+        for backend in args.backend or list(BACKENDS):
+            res, outputs[backend] = bench_backend(backend, vectors, queries, args.k, args.repeat, tmp)
+            report["results"].append(res)
+            print(
+                f"[{backend}] cold load {res['cold_load_ms']:.1f} ms, load {res['load_ms']:.2f} ms, "
+                f"query p50/p99 {res['query_ms']['p50']:.3f}/{res['query_ms']['p99']:.3f} ms, "
+                f"batch {res['batch_ms_per_query']:.4f} ms/query"
+            )
+
+    if len(outputs) == 2:
+        report["agreement"] = compare_results(outputs["faiss"], outputs["numpy"])
+        a = report["agreement"]
+        print(
+            f"Hasil: {a['identical_ids']}/{a['queries']} identik, {a['tie_order_only']} beda urutan tie, "
+            f"{a['mismatched']} beda; selisih skor maks {a['max_score_diff']:.2e}"
+        )
+
+    out = args.out or os.path.join(DEFAULT_OUT_DIR, f"vector-backend-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Saved benchmark: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# src/data/curation.py
+"""
+Kurasi pasangan C->T saat ingest, sebelum masuk index:
+
+1. Buang pasangan low-information: sisi client yang isinya cuma
+   acknowledgement ("yeah.", "No.", "Okay", "mm-hmm") -> kurang dari
+   min_tokens token bermakna setelah kata filler dibuang. Default 1: satu
+   kata isi sudah cukup, jadi pernyataan afek pendek ("I'm sad.",
+   "I'm scared.") tetap masuk index. Dilakukan sebelum
+   embedding, jadi sekalian hemat panggilan API.
+2. Gabungkan near-duplicate: query dengan cosine >= threshold ke
+   representatif yang sudah ada di-collapse jadi satu doc (yang pertama
+   muncul), metadata sumbernya digabung ke "merged_sources".
+
+Similarity dihitung per blok sebagai matmul numpy (blok x representatif),
+jadi tidak ada matriks n x n penuh.
+"""
+from src.llm.lexicon import normalize_text
+from src.llm.prompt import FILLER_WORDS
+
+# dataset (HOPE/HQC) berbahasa Inggris; digabung dengan filler Indonesia dari prompt.py.
+# Hanya backchannel murni: jawaban pendek ("no", "fine", "good", "you") tetap informasi.
+# "mm-hmm" / "uh-huh" dinormalisasi jadi "mm hmm" / "uh huh".
+INGEST_FILLER_WORDS = FILLER_WORDS | {
+    "yeah", "yep", "yup", "okay", "mm", "hmm", "mhm", "hm", "uh", "huh", "um", "umm", "ah",
+}
+
+
+def content_tokens(text: str, filler_words=INGEST_FILLER_WORDS) -> list[str]:
+    """Token bermakna: bukan filler dan lebih dari satu huruf ("don t" -> ["don"])."""
+    return [t for t in normalize_text(text).split() if len(t) > 1 and t not in filler_words]
+
+
+def filter_low_information(docs: list[dict], min_tokens: int = 1) -> tuple[list[dict], int]:
+    """Return (docs yang dipertahankan, jumlah yang dibuang). min_tokens <= 0 = mati."""
+    if min_tokens <= 0:
+        return docs, 0
+    kept = [d for d in docs if len(content_tokens(d["query"])) >= min_tokens]
+    return kept, len(docs) - len(kept)
+
+
+def near_duplicate_groups(vectors, threshold: float = 0.97, block: int = 1024):
+    """
+    vectors: (n, dim) ternormalisasi. Greedy leader clustering berurutan:
+    vektor yang similarity-nya >= threshold ke representatif sebelumnya ikut grup itu.
+    Return (rep_ids, assign) — assign[i] = index representatif untuk baris i.
+    """
+    import numpy as np
+
+    vecs = np.asarray(vectors, dtype="float32")
+    n = vecs.shape[0]
+    assign = np.arange(n)
+    reps = []
+
+    for start in range(0, n, block):
+        blk = vecs[start:start + block]
+        free = np.ones(len(blk), dtype=bool)
+
+        # 1) cocokkan ke representatif dari blok-blok sebelumnya
+        if reps:
+            sims = blk @ vecs[reps].T                       # (b, r)
+            best = sims.argmax(axis=1)
+            hit = sims[np.arange(len(blk)), best] >= threshold
+            assign[start:start + len(blk)][hit] = np.asarray(reps)[best[hit]]
+            free &= ~hit
+
+        # 2) sisanya: greedy di dalam blok (satu matmul b x b)
+        local = blk @ blk.T
+        for i in np.flatnonzero(free):
+            if not free[i]:
+                continue
+            free[i] = False
+            reps.append(start + int(i))
+            dup = free & (local[i] >= threshold)
+            assign[start:start + len(blk)][dup] = start + int(i)
+            free &= ~dup
+
+    return reps, assign
+
+
+def collapse_near_duplicates(docs: list[dict], vectors, threshold: float = 0.97):
+    """
+    Return (docs, vectors, jumlah yang di-collapse). threshold <= 0 = mati.
+    Doc representatif mendapat "merged_sources" (dataset/session/file semua anggota grup).
+    """
+    if threshold <= 0 or len(docs) < 2:
+        return docs, vectors, 0
+
+    reps, assign = near_duplicate_groups(vectors, threshold)
+    if len(reps) == len(docs):
+        return docs, vectors, 0
+
+    members = {}
+    for i, r in enumerate(assign.tolist()):
+        members.setdefault(r, []).append(i)
+
+    out = []
+    for r in reps:
+        doc = dict(docs[r])
+        group = members[r]
+        if len(group) > 1:
+            doc["merged_sources"] = [
+                {k: docs[i][k] for k in ("dataset", "session_id", "source_file")} for i in group
+            ]
+        out.append(doc)
+    return out, vectors[reps], len(docs) - len(reps)
+
+
+def measure_search_speedup(before, after, k: int = 10, queries: int = 200, repeat: int = 3,
+                           seed: int = 13, backend: str = "faiss") -> dict:
+    """
+    Latency brute-force search (flat index backend) di vektor sebelum vs sesudah kurasi,
+    dengan query sampel dari vektor sebelum kurasi. Return ms per query + speed-up.
+    """
+    import time
+    import numpy as np
+
+    from src.data.search_backend import build_flat_index
+
+    before = np.ascontiguousarray(before, dtype="float32")
+    after = np.ascontiguousarray(after, dtype="float32")
+    rng = np.random.default_rng(seed)
+    q = before[rng.choice(len(before), size=min(queries, len(before)), replace=False)]
+
+    def _ms_per_query(vecs):
+        index = build_flat_index(vecs, backend)
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for row in q:
+                index.search(row[None, :], k)
+            best = min(best, time.perf_counter() - t0)
+        return best * 1000.0 / len(q)
+
+    ms_before = _ms_per_query(before)
+    ms_after = _ms_per_query(after)
+    return {
+        "ms_per_query_before": round(ms_before, 4),
+        "ms_per_query_after": round(ms_after, 4),
+        "speedup": round(ms_before / ms_after, 3) if ms_after else 0.0,
+    }
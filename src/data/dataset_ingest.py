@@ -3,14 +3,25 @@ import os
 import glob
 import json
 import re
-import numpy as np
-import pandas as pd
-import faiss
+import sys
+import time
 
 from src.llm.client import embed_texts
-
-DOCS_NAME = "cbt_docs.jsonl"
-INDEX_NAME = "cbt.index"
+from src.data.curation import collapse_near_duplicates, filter_low_information, measure_search_speedup
+from src.llm.scheduler import PRIORITY_BULK, api_context
+from src.data.index_store import (
+    DOCS_NAME,
+    INDEX_NAME,
+    new_version_dir,
+    write_manifest,
+    publish_version,
+    prune_versions,
+    resolve_current,
+)
+from src.data.search_backend import build_flat_index, backend_of, write_index
+from src.data.sharding import group_by_shard, link_or_copy, parse_scheme, shard_files, write_shard
+from src.data.vector_store import build_compact_index, evaluate_storage, save_full_vectors
+from src.monitoring.metrics import trace_section
 
 
 def _clean(s: str) -> str:
@@ -61,6 +72,8 @@ def _load_hope_csv_pairs(hope_dir: str):
     Type: P (patient) / T (therapist)
     Kita map: P -> C (Client), T -> T (Therapist)
     """
+    import pandas as pd  # lazy: cuma dibutuhkan saat (re)build index
+
     docs = []
     csv_files = sorted(glob.glob(os.path.join(hope_dir, "*.csv")))
     if not csv_files:
@@ -174,53 +187,347 @@ def _collect_all_docs(cfg):
     return docs
 
 
-def build_index(cfg):
-    os.makedirs(cfg.INDEX_DIR, exist_ok=True)
+def _embed_docs(cfg, docs: list[dict], embed_fn, progress=None, done: int = 0, total: int | None = None):
+    """Embed field "query" per batch. done/total: offset progres kalau dipanggil per shard."""
+    import numpy as np
+
+    embed_dims = getattr(cfg, "EMBED_DIMENSIONS", 0) or None
+    queries = [d["query"] for d in docs]
+    total = total or len(queries)
+
+    all_vecs = []
+    BATCH = 128
+    # prioritas BULK: turn live tetap didahulukan kalau kuota API menipis
+    with api_context(PRIORITY_BULK, session="ingest"):
+        for start in range(0, len(queries), BATCH):
+            batch = queries[start:start + BATCH]
+            vecs = embed_fn(batch, model=cfg.EMBED_MODEL, dimensions=embed_dims)  # normalized for cosine
+            all_vecs.append(vecs)
+            embedded = done + min(start + BATCH, len(queries))
+            print(f"Embedded {embedded}/{total}")
+            if progress is not None:
+                progress(embedded, total)
+
+    return np.vstack(all_vecs).astype("float32")
+
+
+def _write_docs(path: str, docs: list[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for d in docs:
+            f.write(json.dumps(d, ensure_ascii=False) + "\n")
+
+
+def _read_docs(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
 
-    docs_path = os.path.join(cfg.INDEX_DIR, DOCS_NAME)
-    index_path = os.path.join(cfg.INDEX_DIR, INDEX_NAME)
 
-    docs = _collect_all_docs(cfg)
+def _count_datasets(docs: list[dict]) -> dict:
+    datasets = {}
+    for d in docs:
+        datasets[d["dataset"]] = datasets.get(d["dataset"], 0) + 1
+    return datasets
+
+
+def build_index(cfg, docs: list[dict] | None = None, embed_fn=None, progress=None,
+                shards: list[str] | None = None):
+    """
+    Build index ke folder versi baru + manifest, lalu publish (atomic swap CURRENT).
+    Return nama versi yang dipublish.
+
+    docs: pakai list doc ini (mis. split benchmark) alih-alih membaca dataset.
+    embed_fn: pengganti embed_texts (mis. embedder lokal deterministik untuk benchmark).
+    progress: callback(embedded, total) tiap batch embedding selesai.
+    shards: (INDEX_SHARDS aktif) rebuild hanya shard ini; shard lain diambil dari versi aktif.
+    """
+    with trace_section("ingest"):
+        return _build_index(cfg, docs, embed_fn, progress, shards)
+
+
+def _build_index(cfg, docs: list[dict] | None, embed_fn, progress=None, shards=None):
+    storage = getattr(cfg, "INDEX_STORAGE", "flat")
+    backend = getattr(cfg, "INDEX_BACKEND", "faiss")
+    if backend != "faiss" and storage != "flat":
+        raise ValueError(f"INDEX_BACKEND={backend} hanya mendukung INDEX_STORAGE=flat (dapat {storage})")
+    embed_dims = getattr(cfg, "EMBED_DIMENSIONS", 0) or None
+
+    embed_fn = embed_fn or embed_texts
+
+    os.makedirs(cfg.INDEX_DIR, exist_ok=True)
+
+    if docs is None:
+        docs = _collect_all_docs(cfg)
     if len(docs) == 0:
         raise RuntimeError("Tidak ada pasangan C->T yang terbentuk dari dataset.")
 
-    # ✅ Embedding dari client query saja
-    queries = [d["query"] for d in docs]
+    # kurasi tahap 1 (sebelum embedding): buang pasangan low-information
+    docs_in = len(docs)
+    docs, low_info = filter_low_information(docs, min_tokens=cfg.CURATE_MIN_TOKENS)
+    if len(docs) == 0:
+        raise RuntimeError("Semua pasangan C->T terbuang oleh CURATE_MIN_TOKENS.")
 
-    all_vecs = []
-    BATCH = 128
-    for start in range(0, len(queries), BATCH):
-        batch = queries[start:start + BATCH]
-        vecs = embed_texts(batch, model=cfg.EMBED_MODEL)  # normalized for cosine
-        all_vecs.append(vecs)
-        print(f"Embedded {min(start+BATCH, len(queries))}/{len(queries)}")
+    scheme = parse_scheme(getattr(cfg, "INDEX_SHARDS", ""))
+    if scheme is not None:
+        return _build_sharded(cfg, docs, embed_fn, progress, scheme, only=shards,
+                              docs_in=docs_in, low_info=low_info)
+    if shards:
+        raise ValueError("Rebuild per shard butuh INDEX_SHARDS (mis. 'dataset' atau 'hash:8').")
 
-    vectors = np.vstack(all_vecs).astype("float32")
+    # ✅ Embedding dari client query saja
+    vectors = _embed_docs(cfg, docs, embed_fn, progress)
     dim = vectors.shape[1]
 
-    # cosine similarity (normalize + inner product)
-    index = faiss.IndexFlatIP(dim)
-    index.add(vectors)
+    # kurasi tahap 2: gabungkan query near-duplicate jadi satu representatif
+    embedded = vectors
+    docs, vectors, collapsed = collapse_near_duplicates(docs, vectors, threshold=cfg.CURATE_DUP_THRESHOLD)
+    curation_report = {
+        "docs_in": docs_in,
+        "low_info_dropped": low_info,
+        "duplicates_collapsed": collapsed,
+        "docs_out": len(docs),
+        "shrink_ratio": round(1.0 - len(docs) / docs_in, 4),
+    }
+    if collapsed:
+        # hanya vektor yang benar-benar di-embed (pasangan low-info tidak pernah di-embed),
+        # jadi speed-up ini milik tahap near-duplicate saja
+        curation_report.update(measure_search_speedup(embedded, vectors, k=max(cfg.TOP_K, 10),
+                                                      backend=backend))
+
+    # cosine similarity (normalize + inner product), flat atau terkompresi
+    if backend == "faiss":
+        index = build_compact_index(vectors, storage, pca_dim=cfg.INDEX_PCA_DIM, pq_m=cfg.INDEX_PQ_M)
+    else:
+        index = build_flat_index(vectors, backend)
+    storage_report = {"mode": storage}
+    # parameter kompresi ikut dicatat supaya perubahan config memicu rebuild
+    if storage == "pca":
+        storage_report["pca_dim"] = cfg.INDEX_PCA_DIM
+    elif storage == "pq":
+        storage_report["pq_m"] = cfg.INDEX_PQ_M
+    if storage != "flat":
+        storage_report.update(evaluate_storage(
+            index, vectors, k=max(cfg.TOP_K, 10), rescore_factor=cfg.RESCORE_FACTOR
+        ))
+
+    version, version_dir = new_version_dir(cfg.INDEX_DIR)
+    docs_path = os.path.join(version_dir, DOCS_NAME)
+    index_path = os.path.join(version_dir, INDEX_NAME)
 
     # save docs
-    with open(docs_path, "w", encoding="utf-8") as f:
-        for d in docs:
-            f.write(json.dumps(d, ensure_ascii=False) + "\n")
+    _write_docs(docs_path, docs)
 
     # save index
-    faiss.write_index(index, index_path)
+    write_index(index, index_path, backend)
+
+    # vektor float32 penuh untuk exact rescoring (dibuka via mmap oleh retriever)
+    if storage != "flat":
+        save_full_vectors(version_dir, vectors)
+
+    # manifest ditulis terakhir (berisi checksum file di atas), baru publish
+    write_manifest(version_dir, {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embed_model": cfg.EMBED_MODEL,
+        "embed_dimensions": embed_dims,
+        "dim": int(dim),
+        "doc_count": len(docs),
+        "datasets": _count_datasets(docs),
+        "backend": backend,
+        "index_type": type(index).__name__,
+        "storage": storage_report,
+        "curation": curation_report,
+    })
+    publish_version(cfg.INDEX_DIR, version)
+    prune_versions(cfg.INDEX_DIR, keep=cfg.INDEX_KEEP_VERSIONS)
 
     print(f"✅ Saved docs:  {docs_path}")
     print(f"✅ Saved index: {index_path}")
     print(f"✅ Total pairs: {len(docs)}")
+    if curation_report["docs_out"] < docs_in:
+        print(
+            f"✅ Kurasi: {docs_in} -> {len(docs)} pasangan (-{curation_report['shrink_ratio'] * 100:.0f}%; "
+            f"low-info {low_info}, near-duplicate {collapsed})"
+            + (f", search {curation_report['speedup']:.2f}x lebih cepat setelah near-duplicate"
+               if "speedup" in curation_report else "")
+        )
+    print(f"✅ Published index version: {version}")
+    if storage != "flat":
+        print(
+            f"✅ Storage {storage}: {storage_report['bytes_compact'] / 1e6:.2f} MB "
+            f"vs flat {storage_report['bytes_flat'] / 1e6:.2f} MB "
+            f"(hemat {storage_report['memory_saved_ratio'] * 100:.0f}%), "
+            f"recall@{storage_report['recall_k']} pass-1 {storage_report['recall_first_pass']:.3f}, "
+            f"setelah rescoring {storage_report['recall_rescored']:.3f}"
+        )
+    return version
+
+
+def _build_sharded(cfg, docs: list[dict], embed_fn, progress, scheme, only=None,
+                   docs_in: int = 0, low_info: int = 0):
+    """
+    Build index per shard (lihat src/data/sharding.py). Kurasi near-duplicate dilakukan
+    per shard supaya shard tetap bisa di-rebuild sendiri-sendiri.
+    """
+    import numpy as np
+
+    storage = getattr(cfg, "INDEX_STORAGE", "flat")
+    backend = getattr(cfg, "INDEX_BACKEND", "faiss")
+    if storage != "flat":
+        raise ValueError(f"INDEX_SHARDS hanya mendukung INDEX_STORAGE=flat (dapat {storage})")
+    embed_dims = getattr(cfg, "EMBED_DIMENSIONS", 0) or None
+
+    groups = group_by_shard(docs, scheme)
+    previous = {}
+    prev_dir = None
+    if only:
+        current = resolve_current(cfg.INDEX_DIR)
+        manifest = (current or {}).get("manifest") or {}
+        prev_shards = manifest.get("shards") or {}
+        if prev_shards.get("scheme") != cfg.INDEX_SHARDS or backend_of(manifest) != backend \
+                or manifest.get("embed_model") != cfg.EMBED_MODEL:
+            raise ValueError("Rebuild per shard butuh index aktif dengan INDEX_SHARDS/backend/model yang sama.")
+        prev_dir = current["dir"]
+        prev_docs = _read_docs(current["docs_path"])
+        for item in prev_shards["items"]:
+            ids = np.load(os.path.join(prev_dir, shard_files(item["name"])[1]))
+            previous[item["name"]] = (item, [prev_docs[i] for i in ids])
+        unknown = set(only) - set(groups) - set(previous)
+        if unknown:
+            raise ValueError(f"Shard tidak dikenal: {sorted(unknown)} (ada: {sorted(set(groups) | set(previous))})")
+
+    rebuild = [n for n in sorted(groups) if not only or n in only]
+    total = sum(len(groups[n]) for n in rebuild)
+    version, version_dir = new_version_dir(cfg.INDEX_DIR)
+
+    all_docs, items = [], []
+    dim = None
+    collapsed = 0
+    embedded = 0
+    for name in sorted(set(groups) | set(previous)):
+        index_name, _ = shard_files(name)
+        if name in rebuild:
+            shard_docs = groups[name]
+            vecs = _embed_docs(cfg, shard_docs, embed_fn, progress, done=embedded, total=total)
+            embedded += len(shard_docs)
+            shard_docs, vecs, n_dup = collapse_near_duplicates(shard_docs, vecs, threshold=cfg.CURATE_DUP_THRESHOLD)
+            collapsed += n_dup
+            write_index(build_flat_index(vecs, backend), os.path.join(version_dir, index_name), backend)
+            item = {"name": name, "count": len(shard_docs), "dim": int(vecs.shape[1]),
+                    "built_in": version, "duplicates_collapsed": n_dup}
+        elif name in previous:
+            # shard tidak berubah: file index dipakai ulang, tanpa embedding
+            item, shard_docs = previous[name]
+            link_or_copy(os.path.join(prev_dir, index_name), os.path.join(version_dir, index_name))
+            item = dict(item)
+        else:
+            continue  # shard lama yang datasetnya sudah tidak ada
+
+        if dim is not None and item["dim"] != dim:
+            raise ValueError(f"Dimensi shard {name} ({item['dim']}) beda dengan shard lain ({dim})")
+        dim = item["dim"]
+        write_shard(version_dir, name, np.arange(len(all_docs), len(all_docs) + len(shard_docs)))
+        all_docs.extend(shard_docs)
+        items.append(item)
+
+    _write_docs(os.path.join(version_dir, DOCS_NAME), all_docs)
+    write_manifest(version_dir, {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embed_model": cfg.EMBED_MODEL,
+        "embed_dimensions": embed_dims,
+        "dim": int(dim),
+        "doc_count": len(all_docs),
+        "datasets": _count_datasets(all_docs),
+        "backend": backend,
+        "index_type": "ShardedIndex",
+        "storage": {"mode": storage},
+        "shards": {"scheme": cfg.INDEX_SHARDS, "items": items},
+        "curation": {
+            "docs_in": docs_in,
+            "low_info_dropped": low_info,
+            "duplicates_collapsed": collapsed,
+            "docs_out": len(all_docs),
+        },
+    })
+    publish_version(cfg.INDEX_DIR, version)
+    prune_versions(cfg.INDEX_DIR, keep=cfg.INDEX_KEEP_VERSIONS)
+
+    reused = [i["name"] for i in items if i["built_in"] != version]
+    print(f"✅ Shards ({cfg.INDEX_SHARDS}): " + ", ".join(f"{i['name']}={i['count']}" for i in items))
+    if reused:
+        print(f"✅ Shard dipakai ulang tanpa rebuild: {', '.join(reused)}")
+    print(f"✅ Total pairs: {len(all_docs)}")
+    print(f"✅ Published index version: {version}")
+    return version
+
+
+def rebuild_reason(cfg, force_rebuild: bool = False) -> str | None:
+    """Alasan index perlu dibangun (ulang), atau None kalau index aktif bisa dipakai apa adanya."""
+    if force_rebuild:
+        return "FORCE_REBUILD=1"
+
+    current = resolve_current(cfg.INDEX_DIR)
+    if current is None:
+        return "index belum ada"
+
+    manifest = current["manifest"]
+    if manifest is None:
+        print("⚠️ Index lama tanpa manifest dipakai. Set FORCE_REBUILD=1 untuk membuat index berversi.")
+        return None
+    if manifest.get("embed_model") != cfg.EMBED_MODEL:
+        return f"EMBED_MODEL berubah ({manifest.get('embed_model')} -> {cfg.EMBED_MODEL})"
+    dims = getattr(cfg, "EMBED_DIMENSIONS", 0) or None
+    if (manifest.get("embed_dimensions") or None) != dims:
+        return f"EMBED_DIMENSIONS berubah ({manifest.get('embed_dimensions') or '-'} -> {dims or '-'})"
+    if backend_of(manifest) != cfg.INDEX_BACKEND:
+        return f"INDEX_BACKEND berubah ({backend_of(manifest)} -> {cfg.INDEX_BACKEND})"
+    scheme = (manifest.get("shards") or {}).get("scheme", "")
+    if scheme != cfg.INDEX_SHARDS:
+        return f"INDEX_SHARDS berubah ({scheme or '-'} -> {cfg.INDEX_SHARDS or '-'})"
+    storage = manifest.get("storage") or {}
+    mode = getattr(cfg, "INDEX_STORAGE", "flat")
+    if storage.get("mode", "flat") != mode:
+        return f"INDEX_STORAGE berubah ({storage.get('mode', 'flat')} -> {mode})"
+    # manifest lama belum mencatat parameter kompresi -> tidak dianggap berubah
+    for key, field in (("pca_dim", "INDEX_PCA_DIM"), ("pq_m", "INDEX_PQ_M")):
+        if key in storage and storage[key] != getattr(cfg, field):
+            return f"{field} berubah ({storage[key]} -> {getattr(cfg, field)})"
+    return None
 
 
 def ensure_index(cfg, force_rebuild: bool = False):
-    docs_path = os.path.join(cfg.INDEX_DIR, DOCS_NAME)
-    index_path = os.path.join(cfg.INDEX_DIR, INDEX_NAME)
-
-    if (not force_rebuild) and os.path.exists(docs_path) and os.path.exists(index_path):
+    reason = rebuild_reason(cfg, force_rebuild)
+    if reason is None:
         return
 
-    print("ℹ️ Building index dari dataset HOPE + HQC...")
+    print(f"ℹ️ Building index dari dataset HOPE + HQC ({reason})...")
     build_index(cfg)
+
+
+def main(argv=None):
+    """
+    python -m src.data.dataset_ingest                    # build kalau perlu
+    python -m src.data.dataset_ingest --force            # build ulang semua
+    python -m src.data.dataset_ingest --shard hqc        # rebuild satu shard (INDEX_SHARDS aktif)
+    """
+    import argparse
+
+    from config import Config
+
+    ap = argparse.ArgumentParser(description="Build index C->T dari dataset.")
+    ap.add_argument("--force", action="store_true", help="build ulang walaupun index aktif masih cocok")
+    ap.add_argument("--shard", action="append", help="rebuild shard ini saja (boleh berulang)")
+    args = ap.parse_args(argv)
+
+    cfg = Config()
+    if args.shard:
+        build_index(cfg, shards=args.shard)
+    elif args.force:
+        build_index(cfg)
+    else:
+        ensure_index(cfg)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
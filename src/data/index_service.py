@@ -0,0 +1,157 @@
+# src/data/index_service.py
+"""
+Index dibangun di background supaya app langsung bisa melayani turn.
+
+    index = IndexService(cfg, force_rebuild=...)   # tidak menunggu embedding
+    index.search(...)                              # IndexNotReady kalau belum ada index
+
+- Index aktif yang masih bisa dibaca langsung dipakai selama rebuild
+  (FORCE_REBUILD, EMBED_MODEL/INDEX_BACKEND berubah); embed_query mengikuti
+  model di manifest index itu, jadi vektornya tetap cocok.
+- Node baru tanpa index: search() raise IndexNotReady -> turn dijawab tanpa
+  contoh RAG (lihat src/pipeline/turn.py) sampai build selesai.
+- Setelah build publish versi baru, index diverifikasi (checksum manifest)
+  lewat CBTRetriever, baru dipakai untuk turn berikutnya.
+
+Dipakai di tempat CBTRetriever: atribut lain (docs, manifest, version, ...)
+diteruskan ke retriever aktif.
+"""
+import threading
+import time
+
+from src.data.dataset_ingest import build_index, rebuild_reason
+from src.data.index_store import resolve_current
+from src.data.retriever import CBTRetriever
+
+
+class IndexNotReady(RuntimeError):
+    pass
+
+
+class IndexService:
+    def __init__(self, cfg, force_rebuild: bool = False, watch: bool = True, embed_fn=None,
+                 build_fn=None, background: bool = True):
+        """
+        embed_fn: diteruskan ke CBTRetriever (embed query)
+        build_fn: pengganti build_index(cfg, progress=...) (mis. embedder lokal untuk benchmark)
+        background=False: build di thread pemanggil (perilaku lama ensure_index)
+        """
+        self.cfg = cfg
+        self._watch = watch
+        self._embed_fn = embed_fn
+        self._build_fn = build_fn or (lambda cfg, progress: build_index(cfg, progress=progress))
+        self._lock = threading.Lock()
+        self._retriever = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._status = {
+            "state": "ready", "reason": None, "embedded": 0, "total": 0,
+            "version": None, "error": None, "build_seconds": None,
+        }
+
+        reason = rebuild_reason(cfg, force_rebuild)
+        if reason is None or resolve_current(cfg.INDEX_DIR) is not None:
+            # selama rebuild index lama tetap dilayani walaupun EMBED_MODEL-nya beda
+            self._retriever = self._open_current(check_model=reason is None)
+        if reason is None and self._retriever is not None:
+            self._status["version"] = self._retriever.version
+            self._ready.set()
+            return
+
+        reason = reason or "index aktif tidak bisa dibaca"
+        self._status.update(state="building", reason=reason)
+        serving = f"pakai index lama {self._retriever.version}" if self._retriever else "tanpa RAG"
+        print(f"ℹ️ Building index di background ({reason}); sementara {serving}.")
+        if background:
+            self._thread = threading.Thread(target=self._build, name="cbt-index-build", daemon=True)
+            self._thread.start()
+        else:
+            self._build()
+
+    # ---------- build ----------
+    def _open_current(self, check_model: bool = True):
+        try:
+            return CBTRetriever(self.cfg, watch=self._watch, embed_fn=self._embed_fn, check_model=check_model)
+        except Exception as e:
+            print(f"⚠️ Index aktif tidak bisa dipakai: {e}")
+            return None
+
+    def _progress(self, embedded: int, total: int):
+        with self._lock:
+            self._status.update(embedded=int(embedded), total=int(total))
+
+    def _build(self):
+        t0 = time.perf_counter()
+        try:
+            version = self._build_fn(self.cfg, progress=self._progress)
+            self._activate(version)
+        except Exception as e:
+            with self._lock:
+                self._status.update(state="failed", error=f"{type(e).__name__}: {e}")
+            print(f"⚠️ Build index gagal: {e}")
+            return
+        with self._lock:
+            self._status.update(state="ready", version=version,
+                                build_seconds=round(time.perf_counter() - t0, 1))
+        self._ready.set()
+        print(f"✅ Index {version} siap, RAG aktif.")
+
+    def _activate(self, version: str):
+        """Load + verifikasi versi baru, lalu swap (retriever lama ikut hot-reload)."""
+        if self._retriever is None:
+            self._retriever = CBTRetriever(self.cfg, watch=self._watch, embed_fn=self._embed_fn)
+        else:
+            self._retriever.reload_if_changed()
+        if self._retriever.version != version:
+            raise RuntimeError(f"versi {version} dipublish tapi yang aktif {self._retriever.version}")
+
+    # ---------- status ----------
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def available(self) -> bool:
+        """Ada index yang bisa di-search (versi baru atau index lama selama rebuild)."""
+        return self._retriever is not None
+
+    @property
+    def retriever(self) -> CBTRetriever | None:
+        return self._retriever
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            st = dict(self._status)
+        st["serving"] = self._retriever.version if self._retriever is not None else None
+        st["progress"] = round(st["embedded"] / st["total"], 3) if st["total"] else float(self.ready)
+        return st
+
+    # ---------- interface CBTRetriever ----------
+    def _active(self) -> CBTRetriever:
+        retriever = self._retriever
+        if retriever is None:
+            st = self.status()
+            raise IndexNotReady(f"index sedang dibangun ({st['embedded']}/{st['total']} embedded)")
+        return retriever
+
+    def search(self, query: str, k: int = 5, dataset_filter: str | None = None, qvec=None):
+        return self._active().search(query, k=k, dataset_filter=dataset_filter, qvec=qvec)
+
+    def embed_query(self, query: str):
+        return self._active().embed_query(query)
+
+    async def aembed_query(self, query: str):
+        return await self._active().aembed_query(query)
+
+    def close(self):
+        if self._retriever is not None:
+            self._retriever.close()
+
+    def __getattr__(self, name):
+        # hanya dipanggil kalau atribut tidak ada di IndexService (docs, manifest, version, ...)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._active(), name)
@@ -0,0 +1,164 @@
+# src/data/index_store.py
+"""
+Layout index berversi di INDEX_DIR:
+
+    INDEX_DIR/
+      CURRENT                      <- pointer: nama versi aktif (diganti atomik)
+      versions/
+        20250101-120000-ab12cd/
+          cbt.index
+          cbt_docs.jsonl
+          manifest.json            <- model, dim, jumlah docs, checksum file
+
+Build selalu menulis ke folder versi baru, lalu `publish_version()` mengganti
+CURRENT lewat os.replace (atomik), jadi pembaca tidak pernah melihat index setengah jadi.
+Layout lama (cbt.index + cbt_docs.jsonl langsung di INDEX_DIR) tetap bisa dibaca.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+DOCS_NAME = "cbt_docs.jsonl"
+INDEX_NAME = "cbt.index"
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+
+MANIFEST_FORMAT = 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def new_version_dir(index_dir: str) -> tuple[str, str]:
+    """Buat folder versi baru (belum dipublish). Return (version, path)."""
+    version = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    path = os.path.join(index_dir, VERSIONS_DIR, version)
+    os.makedirs(path, exist_ok=False)
+    return version, path
+
+
+def write_manifest(version_dir: str, manifest: dict) -> dict:
+    """
+    Lengkapi manifest dengan checksum semua file di folder versi, lalu tulis.
+    Dipanggil PALING AKHIR setelah semua file index selesai ditulis.
+    """
+    files = {}
+    for name in sorted(os.listdir(version_dir)):
+        path = os.path.join(version_dir, name)
+        if name == MANIFEST_NAME or not os.path.isfile(path):
+            continue
+        files[name] = {"sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+
+    manifest = dict(manifest)
+    manifest["format"] = MANIFEST_FORMAT
+    manifest["files"] = files
+
+    tmp = os.path.join(version_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(version_dir, MANIFEST_NAME))
+    return manifest
+
+
+def read_manifest(version_dir: str) -> dict:
+    with open(os.path.join(version_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify_version(version_dir: str, manifest: dict, embed_model: str | None = None,
+                   check_checksums: bool = True):
+    """
+    Raise ValueError kalau versi tidak konsisten:
+    - embed model beda dengan yang diharapkan
+    - file hilang / checksum tidak cocok
+    """
+    if embed_model and manifest.get("embed_model") != embed_model:
+        raise ValueError(
+            f"Index versi {manifest.get('version')} dibuat dengan model "
+            f"{manifest.get('embed_model')}, tapi EMBED_MODEL={embed_model}."
+        )
+
+    for name, meta in (manifest.get("files") or {}).items():
+        path = os.path.join(version_dir, name)
+        if not os.path.exists(path):
+            raise ValueError(f"File index hilang: {path}")
+        if check_checksums and file_sha256(path) != meta.get("sha256"):
+            raise ValueError(f"Checksum tidak cocok: {path}")
+
+
+def publish_version(index_dir: str, version: str):
+    """Atomic pointer swap: CURRENT.tmp -> CURRENT."""
+    tmp = os.path.join(index_dir, CURRENT_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(index_dir, CURRENT_NAME))
+
+
+def current_version(index_dir: str) -> str | None:
+    try:
+        with open(os.path.join(index_dir, CURRENT_NAME), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def resolve_current(index_dir: str) -> dict | None:
+    """
+    Return info versi aktif:
+        {"version", "dir", "docs_path", "index_path", "manifest"}
+    manifest=None untuk layout lama (tanpa versi). None kalau belum ada index.
+    """
+    version = current_version(index_dir)
+    if version:
+        vdir = os.path.join(index_dir, VERSIONS_DIR, version)
+        if os.path.exists(os.path.join(vdir, MANIFEST_NAME)):
+            return {
+                "version": version,
+                "dir": vdir,
+                "docs_path": os.path.join(vdir, DOCS_NAME),
+                "index_path": os.path.join(vdir, INDEX_NAME),
+                "manifest": read_manifest(vdir),
+            }
+
+    # fallback: layout lama
+    docs_path = os.path.join(index_dir, DOCS_NAME)
+    index_path = os.path.join(index_dir, INDEX_NAME)
+    if os.path.exists(docs_path) and os.path.exists(index_path):
+        return {
+            "version": None,
+            "dir": index_dir,
+            "docs_path": docs_path,
+            "index_path": index_path,
+            "manifest": None,
+        }
+
+    return None
+
+
+def prune_versions(index_dir: str, keep: int = 3):
+    """Hapus versi lama, sisakan `keep` terbaru + versi aktif."""
+    root = os.path.join(index_dir, VERSIONS_DIR)
+    if keep <= 0 or not os.path.isdir(root):
+        return
+
+    active = current_version(index_dir)
+    versions = sorted(v for v in os.listdir(root) if os.path.isdir(os.path.join(root, v)))
+    for v in versions[:-keep]:
+        if v == active:
+            continue
+        shutil.rmtree(os.path.join(root, v), ignore_errors=True)
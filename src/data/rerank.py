@@ -0,0 +1,60 @@
+# src/data/rerank.py
+"""
+Reranking kandidat retrieval dengan Maximal Marginal Relevance (MMR).
+
+Semua similarity antar-kandidat dihitung sekali sebagai satu matriks numpy;
+loop greedy cuma meng-update vektor "similarity maksimum ke yang sudah dipilih".
+"""
+
+
+def mmr_select(qvec, cand_vecs, k: int, lam: float = 0.7, groups=None,
+               max_per_group: int = 0, dup_threshold: float = 1.0) -> list[int]:
+    """
+    qvec: (1, dim) atau (dim,); cand_vecs: (n, dim), keduanya ternormalisasi.
+    groups: label per kandidat (mis. session) untuk cap per grup (0 = tanpa cap).
+    dup_threshold: kandidat dengan similarity >= ini ke yang sudah dipilih dibuang
+                   (near-duplicate), jadi hasil bisa kurang dari k.
+    Return index kandidat terpilih (urut pilihan).
+    """
+    import numpy as np
+
+    cand = np.asarray(cand_vecs, dtype="float32")
+    n = cand.shape[0]
+    if n == 0 or k <= 0:
+        return []
+
+    q = np.asarray(qvec, dtype="float32").reshape(-1)
+    rel = cand @ q                 # (n,)
+    sim = cand @ cand.T            # (n, n) satu kali matmul
+
+    max_sim = np.full(n, -np.inf, dtype="float32")
+    available = np.ones(n, dtype=bool)
+    group_counts = {}
+    selected = []
+
+    while len(selected) < k and available.any():
+        if selected:
+            score = lam * rel - (1.0 - lam) * max_sim
+        else:
+            score = rel.copy()
+        score[~available] = -np.inf
+
+        j = int(np.argmax(score))
+        if not np.isfinite(score[j]):
+            break
+
+        available[j] = False
+        selected.append(j)
+        max_sim = np.maximum(max_sim, sim[j])
+
+        # buang near-duplicate dari yang baru dipilih
+        if dup_threshold < 1.0:
+            available &= sim[j] < dup_threshold
+
+        if groups is not None and max_per_group > 0:
+            g = groups[j]
+            group_counts[g] = group_counts.get(g, 0) + 1
+            if group_counts[g] >= max_per_group:
+                available &= np.array([x != g for x in groups], dtype=bool)
+
+    return selected
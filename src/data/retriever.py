@@ -1,40 +1,187 @@
 # src/data/retriever.py
 import os
 import json
-import faiss
+import threading
 
-from src.llm.client import embed_text
+from src.llm.client import aembed_text, embed_text
+from src.data.index_store import resolve_current, verify_version
+from src.data.search_backend import backend_of, read_index
+from src.data.sharding import read_sharded_index
+from src.data.vector_store import load_full_vectors, rescore
+from src.data.rerank import mmr_select
+from src.monitoring.metrics import RETRIEVAL_LATENCY, trace_section
 
-DOCS_NAME = "cbt_docs.jsonl"
-INDEX_NAME = "cbt.index"
+
+class _LoadedIndex:
+    """Satu snapshot index (faiss/numpy index + docs + manifest) yang tidak pernah dimutasi."""
+
+    def __init__(self, info: dict, index, docs: list[dict], full_vectors=None):
+        self.version = info["version"]
+        self.docs_path = info["docs_path"]
+        self.index_path = info["index_path"]
+        self.manifest = info["manifest"]
+        self.index = index
+        self.docs = docs
+
+        # vektor float32 penuh (mmap) untuk exact rescoring; None = index sudah exact
+        self.full_vectors = full_vectors
+        self.storage = ((self.manifest or {}).get("storage") or {}).get("mode", "flat")
+
+    def vectors_for(self, ids: list[int]):
+        """Vektor float32 exact untuk doc id tertentu (dipakai reranking)."""
+        import numpy as np
+
+        ids = np.asarray(ids, dtype="int64")
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors[ids], dtype="float32")
+        return np.vstack([self.index.reconstruct(int(i)) for i in ids]).astype("float32")
 
 
 class CBTRetriever:
-    def __init__(self, cfg):
+    def __init__(self, cfg, watch: bool = True, embed_fn=None, check_model: bool = True):
         self.cfg = cfg
-        self.docs_path = os.path.join(cfg.INDEX_DIR, DOCS_NAME)
-        self.index_path = os.path.join(cfg.INDEX_DIR, INDEX_NAME)
+        # embed_fn: pengganti embed_text (mis. embedder lokal untuk benchmark)
+        self.embed_fn = embed_fn or embed_text
+        # check_model=False: index aktif boleh dibuat dengan model lain (dipakai IndexService
+        # selama rebuild; embed_query mengikuti model di manifest). Checksum tetap dicek.
 
-        if not os.path.exists(self.docs_path) or not os.path.exists(self.index_path):
+        info = resolve_current(cfg.INDEX_DIR)
+        if info is None:
             raise FileNotFoundError(
                 "Index belum dibuat. Jalankan ensure_index() atau build_index() dulu."
             )
 
-        self.index = faiss.read_index(self.index_path)
+        # snapshot aktif; search() cukup baca referensi ini sekali,
+        # jadi hot-reload tidak mengganggu search yang sedang berjalan
+        self._state = self._load(info, check_model=check_model)
+        self._rejected_versions = set()
+
+        self._stop = threading.Event()
+        self._watcher = None
+        interval = float(getattr(cfg, "INDEX_RELOAD_SECONDS", 0) or 0)
+        if watch and interval > 0:
+            self._watcher = threading.Thread(
+                target=self._watch_loop, args=(interval,), name="cbt-index-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    # ---------- snapshot access (kompatibel dengan atribut lama) ----------
+    @property
+    def index(self):
+        return self._state.index
+
+    @property
+    def docs(self) -> list[dict]:
+        return self._state.docs
+
+    @property
+    def docs_path(self) -> str:
+        return self._state.docs_path
 
-        self.docs = []
-        with open(self.docs_path, "r", encoding="utf-8") as f:
+    @property
+    def index_path(self) -> str:
+        return self._state.index_path
+
+    @property
+    def version(self) -> str | None:
+        return self._state.version
+
+    @property
+    def manifest(self) -> dict | None:
+        return self._state.manifest
+
+    @property
+    def storage(self) -> str:
+        return self._state.storage
+
+    @property
+    def full_vectors(self):
+        return self._state.full_vectors
+
+    # ---------- load & hot-reload ----------
+    def _load(self, info: dict, verify: bool = True, check_model: bool = True) -> _LoadedIndex:
+        manifest = info["manifest"]
+        if manifest is not None and verify:
+            verify_version(info["dir"], manifest, embed_model=self.cfg.EMBED_MODEL if check_model else None)
+
+        if manifest is not None and manifest.get("shards"):
+            index = read_sharded_index(info["dir"], manifest, backend=backend_of(manifest),
+                                       threads=int(getattr(self.cfg, "INDEX_SEARCH_THREADS", 0) or 0))
+        else:
+            index = read_index(info["index_path"], backend=backend_of(manifest))
+
+        docs = []
+        with open(info["docs_path"], "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
-                self.docs.append(json.loads(line))
+                docs.append(json.loads(line))
 
-        if len(self.docs) == 0:
+        if len(docs) == 0:
             raise RuntimeError(
-                f"Docs kosong ({self.docs_path}). Pastikan ingest berhasil membangun docs."
+                f"Docs kosong ({info['docs_path']}). Pastikan ingest berhasil membangun docs."
+            )
+
+        if manifest is not None:
+            if int(index.ntotal) != int(manifest.get("doc_count", -1)) or len(docs) != int(index.ntotal):
+                raise ValueError(
+                    f"Index versi {info['version']} tidak konsisten: "
+                    f"ntotal={index.ntotal}, docs={len(docs)}, manifest={manifest.get('doc_count')}"
+                )
+            if int(index.d) != int(manifest.get("dim", -1)):
+                raise ValueError(
+                    f"Dimensi index versi {info['version']} ({index.d}) != manifest ({manifest.get('dim')})"
+                )
+
+        full_vectors = None
+        storage = ((manifest or {}).get("storage") or {})
+        if storage.get("mode", "flat") != "flat":
+            full_vectors = load_full_vectors(info["dir"])
+            if full_vectors is None or full_vectors.shape[0] != len(docs):
+                raise ValueError(f"vectors.npy untuk rescoring tidak ada / tidak cocok di {info['dir']}")
+            print(
+                f"ℹ️ Index storage {storage['mode']}: {storage.get('bytes_compact', 0) / 1e6:.2f} MB "
+                f"(hemat {storage.get('memory_saved_ratio', 0) * 100:.0f}% vs flat), "
+                f"recall@{storage.get('recall_k')} setelah rescoring {storage.get('recall_rescored')}"
             )
 
+        return _LoadedIndex(info, index, docs, full_vectors=full_vectors)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Cek pointer CURRENT; kalau ada versi baru yang valid, load lalu swap.
+        Return True kalau terjadi swap.
+        """
+        info = resolve_current(self.cfg.INDEX_DIR)
+        if info is None or info["version"] == self._state.version:
+            return False
+        if info["version"] in self._rejected_versions:
+            return False
+
+        try:
+            new_state = self._load(info, verify=True)
+        except Exception as e:
+            # jangan coba ulang versi yang sama tiap polling
+            self._rejected_versions.add(info["version"])
+            print(f"⚠️ Index versi {info['version']} ditolak: {e}")
+            return False
+
+        old_version = self._state.version
+        self._state = new_state
+        print(f"🔄 Index reloaded: {old_version} -> {new_state.version} ({len(new_state.docs)} docs)")
+        return True
+
+    def _watch_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"⚠️ Index watcher error: {e}")
+
+    def close(self):
+        self._stop.set()
+
     def _ensure_text(self, d: dict) -> str:
         """
         Pastikan selalu ada field 'text' untuk prompt.
@@ -51,31 +198,78 @@ class CBTRetriever:
 
         return ""
 
-    def search(self, query: str, k: int = 5, dataset_filter: str | None = None):
+    def embed_query(self, query: str, state: _LoadedIndex | None = None):
+        """
+        Embed query dengan model/dimensi yang tercatat di manifest index aktif
+        supaya vektor selalu cocok. Return (1, dim) ternormalisasi.
+        """
+        model, dimensions = self._embed_args(state or self._state)
+        return self.embed_fn(query, model=model, dimensions=dimensions)
+
+    async def aembed_query(self, query: str, state: _LoadedIndex | None = None):
+        """embed_query() untuk coroutine: client async kalau embed_fn default, selain itu di thread."""
+        if self.embed_fn is not embed_text:
+            import asyncio
+
+            return await asyncio.to_thread(self.embed_query, query, state)
+        model, dimensions = self._embed_args(state or self._state)
+        return await aembed_text(query, model=model, dimensions=dimensions)
+
+    def embed_args(self) -> tuple[str, int | None]:
+        """(model, dimensions) yang dipakai embed_query untuk index aktif."""
+        return self._embed_args(self._state)
+
+    def _embed_args(self, state: _LoadedIndex) -> tuple[str, int | None]:
+        manifest = state.manifest or {}
+        return manifest.get("embed_model") or self.cfg.EMBED_MODEL, manifest.get("embed_dimensions")
+
+    def search(self, query: str, k: int = 5, dataset_filter: str | None = None, qvec=None):
         """
         dataset_filter: "HOPE" / "HQC" / None (gabungan)
+        qvec: vektor query yang sudah dihitung (dari embed_query), supaya tidak embed dua kali.
         Return list[dict] yang sudah siap untuk build_messages().
         """
+        with RETRIEVAL_LATENCY.time(), trace_section("retrieval"):
+            return self._search(query, k, dataset_filter, qvec)
+
+    def _search(self, query: str, k: int, dataset_filter: str | None, qvec):
         query = (query or "").strip()
         if not query:
             return []
 
-        # embed query
-        qvec = embed_text(query, model=self.cfg.EMBED_MODEL)  # (1, dim), normalized
+        # snapshot dibaca sekali: hot-reload di tengah search tidak berpengaruh
+        state = self._state
+
+        # vektor dari luar bisa basi kalau index baru saja di-reload dengan dimensi lain
+        if qvec is None or int(qvec.shape[-1]) != int(state.index.d):
+            qvec = self.embed_query(query, state=state)  # (1, dim), normalized
 
         # adaptif: jangan minta probe_k melebihi total vector di index
-        ntotal = int(getattr(self.index, "ntotal", 0))
+        ntotal = int(getattr(state.index, "ntotal", 0))
         if ntotal <= 0:
             return []
 
         # kalau pakai filter, tarik kandidat lebih banyak dulu
         # tapi jangan melebihi ntotal
         base_probe = max(k * 5, 25) if dataset_filter else k
+
+        # MMR: tarik kandidat lebih lebar, nanti diringkas jadi k contoh yang beragam
+        use_mmr = bool(getattr(self.cfg, "MMR_ENABLED", False))
+        if use_mmr:
+            base_probe = max(base_probe, k * max(1, int(self.cfg.MMR_CANDIDATE_FACTOR)))
         probe_k = min(base_probe, ntotal)
 
-        scores, idxs = self.index.search(qvec, probe_k)
+        if state.full_vectors is None:
+            scores, idxs = state.index.search(qvec, probe_k)
+        else:
+            # pass 1 di kode kompak (shortlist lebih lebar), lalu rescoring exact
+            shortlist = min(probe_k * max(1, int(self.cfg.RESCORE_FACTOR)), ntotal)
+            _, cand = state.index.search(qvec, shortlist)
+            s, i = rescore(qvec, cand[0], state.full_vectors)
+            scores, idxs = [s[:probe_k]], [i[:probe_k]]
 
         out = []
+        out_ids = []
         seen = set()  # untuk skip duplikat (session_id+query) atau text
         for score, idx in zip(scores[0], idxs[0]):
             # FAISS bisa mengembalikan -1
@@ -83,10 +277,10 @@ class CBTRetriever:
                 continue
 
             idx = int(idx)
-            if idx >= len(self.docs):
+            if idx >= len(state.docs):
                 continue
 
-            d = self.docs[idx]
+            d = state.docs[idx]
 
             if dataset_filter and d.get("dataset") != dataset_filter:
                 continue
@@ -111,8 +305,21 @@ class CBTRetriever:
                 "response": d.get("response"),
                 "text": text,
             })
+            out_ids.append(idx)
 
-            if len(out) >= k:
+            if not use_mmr and len(out) >= k:
                 break
 
-        return out
+        if use_mmr and len(out) > 1:
+            keep = mmr_select(
+                qvec,
+                state.vectors_for(out_ids),
+                k=k,
+                lam=float(self.cfg.MMR_LAMBDA),
+                groups=[(o["dataset"], o["session_id"]) for o in out],
+                max_per_group=int(self.cfg.MMR_MAX_PER_SESSION),
+                dup_threshold=float(self.cfg.MMR_DUP_THRESHOLD),
+            )
+            out = [out[j] for j in keep]
+
+        return out[:k]
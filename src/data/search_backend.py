@@ -0,0 +1,137 @@
+# src/data/search_backend.py
+"""
+Backend vector search yang bisa dipilih lewat INDEX_BACKEND:
+
+- "faiss": faiss.IndexFlatIP / index kompak (lihat vector_store.py)
+- "numpy": NumpyFlatIndex, tanpa dependency selain numpy. Untuk corpus kecil
+           per node, import faiss lebih mahal daripada search-nya sendiri.
+
+Interface yang dipakai retriever (subset dari faiss.Index):
+
+    index.ntotal, index.d
+    index.search(queries (nq, d), k) -> (scores (nq, k) float32, ids (nq, k) int64)
+    index.reconstruct(i) -> (d,) float32
+
+Format file ditentukan backend dan dicatat di manifest ("backend");
+manifest lama tanpa field itu dianggap faiss.
+"""
+BACKENDS = ("faiss", "numpy")
+
+
+class NumpyFlatIndex:
+    """
+    Pengganti IndexFlatIP: matriks float32 contiguous (n, d) yang sudah ternormalisasi.
+    search() = matmul per blok baris corpus + argpartition top-k, lalu merge antar blok,
+    jadi memori sementara dibatasi nq x block_rows.
+    """
+
+    def __init__(self, vectors, block_rows: int = 16384):
+        import numpy as np
+
+        self.xb = np.ascontiguousarray(vectors, dtype="float32")
+        if self.xb.ndim != 2:
+            raise ValueError(f"vectors harus 2D (n, d), dapat shape {self.xb.shape}")
+        self.block_rows = int(block_rows)
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.xb.shape[0])
+
+    @property
+    def d(self) -> int:
+        return int(self.xb.shape[1])
+
+    def reconstruct(self, i: int):
+        return self.xb[int(i)].copy()
+
+    def search(self, queries, k: int):
+        import numpy as np
+
+        q = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.d)
+        nq, n = q.shape[0], self.ntotal
+        kk = max(0, min(int(k), n))
+
+        # padding seperti faiss: id -1, skor paling rendah
+        scores = np.full((nq, int(k)), np.finfo("float32").min, dtype="float32")
+        ids = np.full((nq, int(k)), -1, dtype="int64")
+        if kk == 0 or nq == 0:
+            return scores, ids
+
+        best_s = best_i = None
+        for start in range(0, n, self.block_rows):
+            block = self.xb[start:start + self.block_rows]
+            s = q @ block.T                                        # (nq, b)
+            if s.shape[1] > kk:
+                i = np.argpartition(-s, kk - 1, axis=1)[:, :kk]
+                s = np.take_along_axis(s, i, axis=1)
+            else:
+                i = np.broadcast_to(np.arange(block.shape[0], dtype="int64"), s.shape)
+            i = i + start
+            if best_s is None:
+                best_s, best_i = s, i
+                continue
+            # merge top-k blok ini dengan top-k sejauh ini; kalau k > block_rows,
+            # kandidat baru dipangkas setelah lebarnya melewati kk
+            best_s = np.concatenate([best_s, s], axis=1)
+            best_i = np.concatenate([best_i, i], axis=1)
+            if best_s.shape[1] > kk:
+                part = np.argpartition(-best_s, kk - 1, axis=1)[:, :kk]
+                best_s = np.take_along_axis(best_s, part, axis=1)
+                best_i = np.take_along_axis(best_i, part, axis=1)
+
+        # urut skor menurun; skor sama -> id kecil dulu (deterministik)
+        order = np.lexsort((best_i, -best_s), axis=1)
+        scores[:, :kk] = np.take_along_axis(best_s, order, axis=1)
+        ids[:, :kk] = np.take_along_axis(best_i, order, axis=1)
+        return scores, ids
+
+
+def _check(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"INDEX_BACKEND tidak dikenal: {backend} (pilih {', '.join(BACKENDS)})")
+
+
+def backend_of(manifest: dict | None) -> str:
+    return (manifest or {}).get("backend") or "faiss"
+
+
+def build_flat_index(vectors, backend: str = "faiss"):
+    """Index exact inner product berisi semua vektor (n, d) float32 ternormalisasi."""
+    _check(backend)
+    if backend == "numpy":
+        return NumpyFlatIndex(vectors)
+
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def write_index(index, path: str, backend: str = "faiss"):
+    _check(backend)
+    if backend == "numpy":
+        import numpy as np
+
+        # .npy biasa (header + data mentah), nama file tetap cbt.index
+        with open(path, "wb") as f:
+            np.save(f, index.xb, allow_pickle=False)
+        return
+
+    import faiss
+
+    faiss.write_index(index, path)
+
+
+def read_index(path: str, backend: str = "faiss"):
+    _check(backend)
+    if backend == "numpy":
+        import numpy as np
+
+        return NumpyFlatIndex(np.load(path, allow_pickle=False))
+
+    import faiss  # lazy: baru dibutuhkan saat retriever benar-benar dibuat
+
+    return faiss.read_index(path)
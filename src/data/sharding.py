@@ -0,0 +1,167 @@
+# src/data/sharding.py
+"""
+Index yang dipecah jadi beberapa shard (INDEX_SHARDS):
+
+- "dataset" : satu shard per dataset (HOPE, HQC, corpus baru, ...)
+- "hash:N"  : N shard berdasarkan crc32(dataset/session_id); satu sesi selalu
+              di shard yang sama
+
+Tiap shard di-build dan disimpan sendiri di folder versi:
+
+    shard-<nama>.index      <- index flat (backend faiss/numpy)
+    shard-<nama>.ids.npy    <- id lokal -> id global (baris di cbt_docs.jsonl)
+
+cbt_docs.jsonl tetap satu file dengan id global, jadi retriever, MMR dan
+rescoring tidak perlu tahu soal shard. Rebuild sebagian (build_index(...,
+shards=[...])) hanya meng-embed shard yang diminta; file index shard lain
+di-hardlink dari versi aktif dan cuma ids.npy-nya yang ditulis ulang.
+
+ShardedIndex mengikuti interface index di search_backend.py; search dijalankan
+paralel di thread pool (faiss & matmul numpy melepas GIL) lalu top-k di-merge.
+"""
+import os
+import re
+import zlib
+
+from src.data.search_backend import read_index
+
+SHARD_PREFIX = "shard-"
+
+
+def parse_scheme(spec: str | None) -> tuple[str, int] | None:
+    """"" -> None (satu index), "dataset" -> ("dataset", 0), "hash:8" -> ("hash", 8)."""
+    spec = (spec or "").strip().lower()
+    if not spec or spec in ("0", "none", "off"):
+        return None
+    if spec == "dataset":
+        return "dataset", 0
+    kind, _, n = spec.partition(":")
+    if kind == "hash" and n.isdigit() and int(n) > 0:
+        return "hash", int(n)
+    raise ValueError(f"INDEX_SHARDS tidak dikenal: {spec} (pakai 'dataset' atau 'hash:N')")
+
+
+def shard_of(doc: dict, scheme: tuple[str, int]) -> str:
+    kind, n = scheme
+    if kind == "dataset":
+        return re.sub(r"[^a-z0-9_-]+", "_", str(doc.get("dataset") or "unknown").lower())
+    key = f"{doc.get('dataset')}/{doc.get('session_id')}".encode("utf-8")
+    return f"h{zlib.crc32(key) % n:03d}"
+
+
+def group_by_shard(docs: list[dict], scheme: tuple[str, int]) -> dict:
+    """{nama shard: [doc, ...]} dengan urutan doc asli dipertahankan."""
+    groups = {}
+    for d in docs:
+        groups.setdefault(shard_of(d, scheme), []).append(d)
+    return groups
+
+
+def shard_files(name: str) -> tuple[str, str]:
+    return f"{SHARD_PREFIX}{name}.index", f"{SHARD_PREFIX}{name}.ids.npy"
+
+
+def link_or_copy(src: str, dst: str):
+    """Hardlink file shard yang tidak berubah (fallback copy kalau beda filesystem)."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        import shutil
+
+        shutil.copy2(src, dst)
+
+
+class _Shard:
+    __slots__ = ("name", "index", "ids")
+
+    def __init__(self, name: str, index, ids):
+        self.name = name
+        self.index = index
+        self.ids = ids
+
+
+class ShardedIndex:
+    def __init__(self, shards: list, threads: int = 0):
+        """
+        shards : list (nama, index, ids_global) — ids_global[i] = id global baris i di shard
+        threads: worker search paralel; 0 = min(jumlah shard, cpu_count)
+        """
+        import numpy as np
+
+        self.shards = [_Shard(name, index, np.asarray(ids, dtype="int64")) for name, index, ids in shards]
+        if not self.shards:
+            raise ValueError("ShardedIndex butuh minimal satu shard")
+        dims = {int(s.index.d) for s in self.shards}
+        if len(dims) != 1:
+            raise ValueError(f"Dimensi shard tidak sama: {sorted(dims)}")
+        self.d = dims.pop()
+        self.ntotal = sum(int(s.index.ntotal) for s in self.shards)
+
+        # id global -> (shard, id lokal), untuk reconstruct()
+        self._owner = np.full(self.ntotal, -1, dtype="int32")
+        self._local = np.zeros(self.ntotal, dtype="int64")
+        for j, s in enumerate(self.shards):
+            self._owner[s.ids] = j
+            self._local[s.ids] = np.arange(len(s.ids), dtype="int64")
+
+        self.threads = int(threads) or min(len(self.shards), os.cpu_count() or 1)
+        self._pool = None
+        if self.threads > 1 and len(self.shards) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="cbt-shard")
+
+    def reconstruct(self, i: int):
+        s = self.shards[int(self._owner[int(i)])]
+        return s.index.reconstruct(int(self._local[int(i)]))
+
+    def _search_shard(self, shard: _Shard, q, k: int):
+        scores, local = shard.index.search(q, min(k, int(shard.index.ntotal)))
+        ids = shard.ids[local.clip(min=0)]
+        ids[local < 0] = -1
+        return scores, ids
+
+    def search(self, queries, k: int):
+        import numpy as np
+
+        q = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.d)
+        if self._pool is not None:
+            parts = list(self._pool.map(lambda s: self._search_shard(s, q, k), self.shards))
+        else:
+            parts = [self._search_shard(s, q, k) for s in self.shards]
+
+        scores = np.concatenate([p[0] for p in parts], axis=1)
+        ids = np.concatenate([p[1] for p in parts], axis=1)
+        scores = np.where(ids < 0, np.finfo("float32").min, scores)
+
+        # merge: skor menurun, skor sama -> id global kecil dulu (sama dengan satu index numpy)
+        order = np.lexsort((ids, -scores), axis=1)[:, :k]
+        out_s = np.full((q.shape[0], k), np.finfo("float32").min, dtype="float32")
+        out_i = np.full((q.shape[0], k), -1, dtype="int64")
+        kk = order.shape[1]
+        out_s[:, :kk] = np.take_along_axis(scores, order, axis=1)
+        out_i[:, :kk] = np.take_along_axis(ids, order, axis=1)
+        return out_s, out_i
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+
+def write_shard(version_dir: str, name: str, ids):
+    import numpy as np
+
+    _, ids_name = shard_files(name)
+    np.save(os.path.join(version_dir, ids_name), np.asarray(ids, dtype="int64"), allow_pickle=False)
+
+
+def read_sharded_index(version_dir: str, manifest: dict, backend: str = "faiss", threads: int = 0):
+    import numpy as np
+
+    shards = []
+    for item in manifest["shards"]["items"]:
+        index_name, ids_name = shard_files(item["name"])
+        index = read_index(os.path.join(version_dir, index_name), backend=backend)
+        ids = np.load(os.path.join(version_dir, ids_name), allow_pickle=False)
+        shards.append((item["name"], index, ids))
+    return ShardedIndex(shards, threads=threads)
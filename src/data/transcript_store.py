@@ -0,0 +1,321 @@
+# src/data/transcript_store.py
+"""
+Transcript sesi yang persisten (SQLite, mode WAL).
+
+    TRANSCRIPT_DB
+      sessions(session_id, created_at, source)
+      turns(session_id, seq, ts, role, content, examples_json, timings_json)
+
+- append() O(1) di hot path: baris hanya masuk antrian; thread writer
+  menulis per batch (satu transaksi per batch, executemany). flush()
+  membangunkan writer supaya batch yang sedang dikumpulkan langsung di-commit.
+- Metadata contoh hasil retrieval (tanpa teks penuh) & timing per tahap
+  (stt_ms, retrieval_ms, llm_ms, tts_ms, ...) disimpan bersama teksnya.
+- Export dibaca sebagai stream (iterasi cursor), tidak pernah disusun jadi
+  satu string besar: export_lines() untuk CLI, export_file() (file seekable,
+  pindah ke disk kalau besar) untuk st.download_button.
+
+CLI:
+    python -m src.data.transcript_store list
+    python -m src.data.transcript_store export latest --format txt
+    python -m src.data.transcript_store export <session_id> --format jsonl --out sesi.jsonl
+"""
+import argparse
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source     TEXT
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id    TEXT NOT NULL,
+    seq           INTEGER NOT NULL,
+    ts            REAL NOT NULL,
+    role          TEXT NOT NULL,
+    content       TEXT NOT NULL,
+    examples_json TEXT,
+    timings_json  TEXT,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+# metadata contoh retrieval yang disimpan (teks penuh sudah ada di index)
+EXAMPLE_FIELDS = ("score", "dataset", "session_id", "source_file")
+
+ROLE_LABELS = {"user": "PASIEN", "assistant": "TERAPIS (AI)"}
+TXT_HEADER = "RIWAYAT SESI KONSELING 13CBT\n============================\n\n"
+
+_STOP = object()
+
+
+def _is_marker(item) -> bool:
+    """_STOP atau marker flush (Event): writer berhenti mengumpulkan batch dan langsung commit."""
+    return item is _STOP or isinstance(item, threading.Event)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # cukup aman di WAL, fsync hanya saat checkpoint
+    return conn
+
+
+def compact_examples(examples) -> list[dict] | None:
+    if not examples:
+        return None
+    return [{k: e.get(k) for k in EXAMPLE_FIELDS if k in e} for e in examples]
+
+
+class TranscriptStore:
+    def __init__(self, db_path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        conn = _connect(db_path)
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._queue = queue.Queue()
+        self._seq = {}
+        self._seq_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="transcript-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- write side ----------
+    def new_session(self, source: str = "cli") -> str:
+        session_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        with self._seq_lock:
+            self._seq[session_id] = 0
+        self._queue.put(("session", (session_id, time.time(), source)))
+        return session_id
+
+    def _next_seq(self, session_id: str) -> int:
+        with self._seq_lock:
+            if session_id not in self._seq:
+                # sesi lama (mis. setelah restart): lanjutkan dari seq terakhir di DB
+                self.flush()
+                with contextlib.closing(self._reader()) as conn:
+                    row = conn.execute(
+                        "SELECT COALESCE(MAX(seq), 0) FROM turns WHERE session_id = ?", (session_id,)
+                    ).fetchone()
+                self._seq[session_id] = int(row[0])
+            self._seq[session_id] += 1
+            return self._seq[session_id]
+
+    def append(self, session_id: str, role: str, content: str, examples=None, timings: dict | None = None):
+        """Non-blocking: baris ditulis oleh thread writer pada batch berikutnya."""
+        row = (
+            session_id,
+            self._next_seq(session_id),
+            time.time(),
+            role,
+            content,
+            json.dumps(compact_examples(examples), ensure_ascii=False) if examples else None,
+            json.dumps(timings, ensure_ascii=False) if timings else None,
+        )
+        self._queue.put(("turn", row))
+
+    def _write_loop(self):
+        conn = _connect(self.db_path)
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                # kumpulkan yang sudah antri (atau tunggu sebentar) supaya satu transaksi per batch
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and not _is_marker(item):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                stop = any(b is _STOP for b in batch)
+                rows = [b for b in batch if not _is_marker(b)]
+                try:
+                    self._write_batch(conn, rows)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Transcript store gagal menulis {len(rows)} baris: {e}")
+                finally:
+                    for b in batch:
+                        if isinstance(b, threading.Event):
+                            b.set()
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write_batch(conn: sqlite3.Connection, rows):
+        sessions = [r for kind, r in rows if kind == "session"]
+        turns = [r for kind, r in rows if kind == "turn"]
+        with conn:
+            if sessions:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO sessions (session_id, created_at, source) VALUES (?, ?, ?)", sessions
+                )
+            if turns:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO turns "
+                    "(session_id, seq, ts, role, content, examples_json, timings_json) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    turns,
+                )
+
+    def flush(self):
+        """
+        Tunggu sampai semua append sebelumnya sudah tertulis. Marker flush memotong
+        penantian flush_interval writer, jadi batch yang sedang dikumpulkan langsung di-commit.
+        """
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def last_seq(self, session_id: str) -> int:
+        """Seq turn terakhir yang sudah di-append (termasuk yang masih di antrian)."""
+        with self._seq_lock:
+            return self._seq.get(session_id, 0)
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- read side ----------
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def latest_session(self) -> str | None:
+        with contextlib.closing(self._reader()) as conn:
+            row = conn.execute("SELECT session_id FROM sessions ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row["session_id"] if row else None
+
+    def list_sessions(self, limit: int = 20) -> list[dict]:
+        with contextlib.closing(self._reader()) as conn:
+            rows = conn.execute(
+                "SELECT s.session_id, s.created_at, s.source, COUNT(t.seq) AS turns "
+                "FROM sessions s LEFT JOIN turns t ON t.session_id = s.session_id "
+                "GROUP BY s.session_id ORDER BY s.created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def iter_turns(self, session_id: str):
+        """Generator baris turn (dict), dibaca bertahap dari cursor."""
+        conn = self._reader()
+        try:
+            cur = conn.execute(
+                "SELECT seq, ts, role, content, examples_json, timings_json "
+                "FROM turns WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            )
+            for r in cur:
+                yield {
+                    "seq": r["seq"],
+                    "ts": r["ts"],
+                    "role": r["role"],
+                    "content": r["content"],
+                    "examples": json.loads(r["examples_json"]) if r["examples_json"] else None,
+                    "timings": json.loads(r["timings_json"]) if r["timings_json"] else None,
+                }
+        finally:
+            conn.close()
+
+    def export_lines(self, session_id: str, fmt: str = "txt"):
+        """Generator string: "txt" (format chat log GUI) atau "jsonl" (satu turn per baris)."""
+        if fmt == "jsonl":
+            for turn in self.iter_turns(session_id):
+                yield json.dumps(turn, ensure_ascii=False) + "\n"
+            return
+        if fmt != "txt":
+            raise ValueError(f"Format export tidak dikenal: {fmt} (pilih txt / jsonl)")
+
+        yield TXT_HEADER
+        for turn in self.iter_turns(session_id):
+            role = ROLE_LABELS.get(turn["role"], turn["role"].upper())
+            yield f"[{role}]: {turn['content']}\n\n"
+
+    def export_file(self, session_id: str, fmt: str = "txt", max_memory: int = 1 << 20):
+        """
+        File bytes seekable (posisi 0) berisi export_lines(), untuk st.download_button
+        (Streamlit memanggil seek(0)). Di memori sampai max_memory byte, lalu pindah ke disk.
+        Tidak menunggu writer: panggil flush() dulu kalau append terakhir harus ikut.
+        """
+        f = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+        for line in self.export_lines(session_id, fmt):
+            f.write(line.encode("utf-8"))
+        f.seek(0)
+        return f
+
+
+def main(argv=None):
+    from config import Config
+
+    ap = argparse.ArgumentParser(description="Lihat / export transcript sesi.")
+    ap.add_argument("--db", help="path database (default: TRANSCRIPT_DB)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--limit", type=int, default=20)
+
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("session_id", help='id sesi, atau "latest"')
+    p_exp.add_argument("--format", choices=("txt", "jsonl"), default="txt")
+    p_exp.add_argument("--out", help="path file output (default: stdout)")
+    args = ap.parse_args(argv)
+
+    store = TranscriptStore(args.db or Config().TRANSCRIPT_DB)
+    try:
+        if args.cmd == "list":
+            for s in store.list_sessions(args.limit):
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["created_at"]))
+                print(f"{s['session_id']}  {created}  {s['source'] or '-':<4}  {s['turns']} turn")
+            return 0
+
+        session_id = store.latest_session() if args.session_id == "latest" else args.session_id
+        if not session_id:
+            print("Belum ada sesi tersimpan.", file=sys.stderr)
+            return 1
+
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            for line in store.export_lines(session_id, args.format):
+                out.write(line)
+        finally:
+            if args.out:
+                out.close()
+                print(f"✅ Saved transcript: {args.out}", file=sys.stderr)
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
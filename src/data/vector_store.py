@@ -0,0 +1,149 @@
+# src/data/vector_store.py
+"""
+Penyimpanan vektor terkompresi + exact rescoring.
+
+Mode INDEX_STORAGE:
+- "flat" : IndexFlatIP float32 (default, perilaku lama)
+- "f16"  : scalar quantizer float16   (2 byte/dim)
+- "int8" : scalar quantizer 8-bit     (1 byte/dim)
+- "pq"   : product quantization       (INDEX_PQ_M byte/vektor)
+- "pca"  : PCA ke INDEX_PCA_DIM + flat (4 byte/dim tereduksi)
+
+Untuk mode selain "flat", vektor float32 penuh disimpan di vectors.npy dan
+dibuka via mmap saat search: pass pertama di kode kompak, lalu shortlist
+di-rescore exact (dot product) dari mmap. Yang resident di RAM cuma kode kompak.
+"""
+import os
+
+VECTORS_NAME = "vectors.npy"
+STORAGE_MODES = ("flat", "f16", "int8", "pq", "pca")
+
+
+def _pq_params(dim: int, n: int, m_wanted: int) -> tuple[int, int]:
+    # m harus membagi dim; nbits dibatasi supaya k-means punya cukup titik training
+    m = max(1, min(m_wanted, dim))
+    while dim % m != 0:
+        m -= 1
+    nbits = 8
+    while nbits > 1 and n < (1 << nbits):
+        nbits -= 1
+    return m, nbits
+
+
+def build_compact_index(vectors, mode: str, pca_dim: int = 256, pq_m: int = 64):
+    """vectors: (n, dim) float32 ternormalisasi. Return faiss index berisi semua vektor."""
+    import faiss
+
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"INDEX_STORAGE tidak dikenal: {mode} (pilih {', '.join(STORAGE_MODES)})")
+
+    n, dim = vectors.shape
+    ip = faiss.METRIC_INNER_PRODUCT
+
+    if mode == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif mode == "f16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, ip)
+    elif mode == "int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, ip)
+    elif mode == "pq":
+        m, nbits = _pq_params(dim, n, pq_m)
+        index = faiss.IndexPQ(dim, m, nbits, ip)
+    else:  # pca
+        out_dim = max(1, min(pca_dim, dim, n))
+        pca = faiss.PCAMatrix(dim, out_dim)
+        index = faiss.IndexPreTransform(pca, faiss.IndexFlatIP(out_dim))
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def save_full_vectors(version_dir: str, vectors):
+    import numpy as np
+
+    np.save(os.path.join(version_dir, VECTORS_NAME), np.ascontiguousarray(vectors, dtype="float32"))
+
+
+def load_full_vectors(version_dir: str):
+    """mmap read-only: baris yang dibaca saat rescoring saja yang masuk page cache."""
+    import numpy as np
+
+    path = os.path.join(version_dir, VECTORS_NAME)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def rescore(qvec, ids, full_vectors):
+    """
+    Exact inner product untuk shortlist.
+    qvec: (1, dim); ids: array id kandidat (boleh ada -1).
+    Return (scores, ids) terurut menurun.
+    """
+    import numpy as np
+
+    ids = np.asarray(ids, dtype="int64")
+    ids = ids[ids >= 0]
+    if ids.size == 0:
+        return np.empty(0, dtype="float32"), ids
+
+    # fancy-index dari mmap lebih cepat kalau id terurut
+    order = np.argsort(ids)
+    rows = np.asarray(full_vectors[ids[order]], dtype="float32")
+    scores = np.empty(ids.size, dtype="float32")
+    scores[order] = rows @ qvec[0]
+
+    best = np.argsort(-scores, kind="stable")
+    return scores[best], ids[best]
+
+
+def evaluate_storage(index, vectors, k: int = 10, rescore_factor: int = 4,
+                     sample: int = 200, seed: int = 0) -> dict:
+    """
+    Bandingkan index kompak vs IndexFlatIP exact (brute force numpy) pada sampel
+    vektor corpus sebagai query. Return ukuran memori & recall@k yang tersisa.
+    """
+    import numpy as np
+    import faiss
+
+    n, dim = vectors.shape
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    qids = rng.choice(n, size=min(sample, n), replace=False)
+    queries = np.ascontiguousarray(vectors[qids], dtype="float32")
+
+    # ground truth exact; recall dihitung tie-aware: hasil dianggap benar kalau
+    # skor exact-nya >= skor exact ke-k (vektor duplikat sering punya skor sama persis)
+    exact = queries @ vectors.T
+    kth = -np.partition(-exact, k - 1, axis=1)[:, k - 1]
+
+    shortlist = min(n, k * max(1, rescore_factor))
+    _, first = index.search(queries, shortlist)
+
+    def _hits(row, ids):
+        ids = np.asarray(ids[:k], dtype="int64")
+        ids = ids[ids >= 0]
+        return int(np.count_nonzero(exact[row, ids] >= kth[row] - 1e-6))
+
+    hit_first = 0
+    hit_rescored = 0
+    for row in range(len(qids)):
+        hit_first += _hits(row, first[row])
+        _, ids = rescore(queries[row:row + 1], first[row], vectors)
+        hit_rescored += _hits(row, ids)
+
+    total = len(qids) * k
+    bytes_flat = n * dim * 4
+    bytes_compact = int(faiss.serialize_index(index).nbytes)
+
+    return {
+        "bytes_flat": int(bytes_flat),
+        "bytes_compact": bytes_compact,
+        "memory_saved_ratio": round(1.0 - bytes_compact / bytes_flat, 4) if bytes_flat else 0.0,
+        "recall_k": int(k),
+        "recall_first_pass": round(hit_first / total, 4),
+        "recall_rescored": round(hit_rescored / total, 4),
+        "eval_queries": int(len(qids)),
+    }
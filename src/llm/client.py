@@ -1,63 +1,241 @@
+# src/llm/client.py
+"""
+Panggilan API provider (embeddings, STT, chat, TTS).
+
+Implementasi utamanya async (AsyncOpenAI): aembed_texts, aembed_text,
+atranscribe_audio, achat_completion, atext_to_speech, astream_speech.
+Versi sync (embed_texts, chat_completion, ...) hanya wrapper tipis yang
+menjalankan coroutine-nya di event loop bersama (thread daemon), jadi kode
+lama & thread pool (hedging, spekulatif) tetap bisa memakainya. contextvars
+pemanggil (prioritas/sesi scheduler) ikut ke loop itu.
+"""
+import contextvars
 import os
-import numpy as np
-import faiss
-from openai import OpenAI
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from src.llm.scheduler import APIScheduler, estimate_tokens, parse_limits
+from src.monitoring.metrics import track_api
+
+# Catatan startup: numpy, asyncio & OpenAI SDK di-import di dalam fungsi,
+# supaya import app.py / app_gui.py tidak ikut menarik dependency berat.
 
-_client = None
+# satu AsyncOpenAI per event loop (koneksi httpx terikat ke loop pembuatnya)
+_clients = weakref.WeakKeyDictionary()
+
+def _client_instance():
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI
 
-def _client_instance() -> OpenAI:
-    global _client
-    if _client is None:
         key = os.getenv("OPENAI_API_KEY")
         print("DEBUG OPENAI_API_KEY prefix:", (key[:10] if key else None))
-        _client = OpenAI(api_key=key)
-    return _client
+        client = _clients[loop] = AsyncOpenAI(api_key=key)
+    return client
+
+# ---------- Event loop untuk wrapper sync ----------
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+def _background_loop():
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                import asyncio
+
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="cbt-api-loop", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+def run_sync(coro):
+    """Jalankan coroutine di event loop bersama dan tunggu hasilnya (dari thread mana pun)."""
+    from concurrent.futures import Future
+
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync dipanggil dari event loop API; pakai versi async-nya")
+
+    ctx = contextvars.copy_context()
+    result = Future()
+
+    def _done(task):
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    loop.call_soon_threadsafe(lambda: loop.create_task(coro, context=ctx).add_done_callback(_done))
+    return result.result()
+
+# ---------- Scheduler (kuota bersama semua endpoint) ----------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# perkiraan token jawaban chat untuk kuota tpm (jawaban terapis pendek)
+CHAT_COMPLETION_TOKENS = 400
+
+def get_scheduler() -> APIScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from config import Config
+
+                cfg = Config()
+                _scheduler = APIScheduler(parse_limits(cfg.API_RATE_LIMITS), reserve=cfg.API_RESERVE)
+    return _scheduler
+
+@asynccontextmanager
+async def _call(endpoint: str, tokens: float = 0.0):
+    """Antri di scheduler (rpm/tpm, prioritas, fair per sesi) lalu catat metrik."""
+    async with get_scheduler().aslot(endpoint, tokens):
+        with track_api(endpoint):
+            yield
 
 # ---------- Embeddings ----------
-def embed_texts(texts: list[str], model: str) -> np.ndarray:
+def normalize_rows(vecs):
+    """
+    L2-normalize per baris (in-place, float32), setara faiss.normalize_L2
+    tapi tanpa perlu import faiss di jalur query.
+    """
+    import numpy as np
+
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vecs /= norms
+    return vecs
+
+def _embed_kwargs(dimensions: int | None) -> dict:
+    # text-embedding-3-* bisa memotong dimensi di sisi server
+    return {"dimensions": int(dimensions)} if dimensions else {}
+
+async def aembed_texts(texts: list[str], model: str, dimensions: int | None = None):
     """
     Returns normalized vectors for cosine similarity (FAISS IP index).
     """
+    import numpy as np
+
     client = _client_instance()
-    r = client.embeddings.create(model=model, input=texts)
+    async with _call("embeddings", tokens=estimate_tokens(texts)):
+        r = await client.embeddings.create(model=model, input=texts, **_embed_kwargs(dimensions))
     vecs = np.array([d.embedding for d in r.data], dtype="float32")
-    faiss.normalize_L2(vecs)
-    return vecs
+    return normalize_rows(vecs)
+
+async def aembed_text(text: str, model: str, dimensions: int | None = None):
+    import numpy as np
 
-def embed_text(text: str, model: str) -> np.ndarray:
     client = _client_instance()
-    r = client.embeddings.create(model=model, input=text)
+    async with _call("embeddings", tokens=estimate_tokens(text)):
+        r = await client.embeddings.create(model=model, input=text, **_embed_kwargs(dimensions))
     vec = np.array(r.data[0].embedding, dtype="float32").reshape(1, -1)
-    faiss.normalize_L2(vec)
-    return vec
+    return normalize_rows(vec)
+
+def embed_texts(texts: list[str], model: str, dimensions: int | None = None):
+    return run_sync(aembed_texts(texts, model, dimensions))
+
+def embed_text(text: str, model: str, dimensions: int | None = None):
+    return run_sync(aembed_text(text, model, dimensions))
 
 # ---------- STT ----------
-def transcribe_audio(wav_path: str, model: str) -> str:
+async def atranscribe_audio(wav_path: str, model: str) -> str:
     client = _client_instance()
     with open(wav_path, "rb") as f:
-        r = client.audio.transcriptions.create(
+        data = f.read()
+    t0 = time.perf_counter()
+    async with _call("stt"):
+        r = await client.audio.transcriptions.create(
             model=model,
-            file=f,
+            file=(os.path.basename(wav_path), data),
         )
+    print(f"📤 STT: upload {len(data) / 1024:.1f} KB ({os.path.splitext(wav_path)[1] or '?'}), "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
     return (r.text or "").strip()
 
+def transcribe_audio(wav_path: str, model: str) -> str:
+    return run_sync(atranscribe_audio(wav_path, model))
+
 # ---------- Chat ----------
-def chat_completion(messages, model: str, temperature: float = 0.4) -> str:
+async def achat_completion(messages, model: str, temperature: float = 0.4,
+                           max_tokens: int | None = None) -> str:
     client = _client_instance()
-    r = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-    )
+    prompt_tokens = estimate_tokens([m.get("content") or "" for m in messages])
+    extra = {"max_tokens": int(max_tokens)} if max_tokens else {}
+    async with _call("chat", tokens=prompt_tokens + (max_tokens or CHAT_COMPLETION_TOKENS)):
+        r = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **extra,
+        )
     return (r.choices[0].message.content or "").strip()
 
+def chat_completion(messages, model: str, temperature: float = 0.4, max_tokens: int | None = None) -> str:
+    return run_sync(achat_completion(messages, model, temperature, max_tokens))
+
 # ---------- TTS ----------
-def text_to_speech(text: str, out_path: str, model: str, voice: str):
+async def atext_to_speech(text: str, out_path: str, model: str, voice: str, response_format: str = "mp3"):
     client = _client_instance()
-    audio = client.audio.speech.create(
+    async with _call("tts"):
+        audio = await client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=response_format,
+        )
+        data = await audio.aread()
+    with open(out_path, "wb") as f:
+        f.write(data)
+
+def text_to_speech(text: str, out_path: str, model: str, voice: str, response_format: str = "mp3"):
+    return run_sync(atext_to_speech(text, out_path, model, voice, response_format))
+
+async def astream_speech(text: str, model: str, voice: str, response_format: str = "pcm",
+                         chunk_size: int = 4096):
+    """
+    Async generator bytes audio TTS selagi masih di-download (mis. raw PCM 16-bit 24 kHz),
+    supaya playback bisa mulai sebelum seluruh audio selesai.
+    """
+    client = _client_instance()
+    async with _call("tts"), client.audio.speech.with_streaming_response.create(
         model=model,
         voice=voice,
         input=text,
-    )
-    with open(out_path, "wb") as f:
-        f.write(audio.read())
+        response_format=response_format,
+    ) as response:
+        async for chunk in response.iter_bytes(chunk_size):
+            if chunk:
+                yield chunk
+
+async def _next_chunk(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def _close_stream(agen):
+    await agen.aclose()
+
+def stream_speech(text: str, model: str, voice: str, response_format: str = "pcm",
+                  chunk_size: int = 4096):
+    """Versi generator sync dari astream_speech; close() menutup koneksi stream."""
+    agen = astream_speech(text, model, voice, response_format, chunk_size)
+    try:
+        while True:
+            chunk = run_sync(_next_chunk(agen))
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        run_sync(_close_stream(agen))
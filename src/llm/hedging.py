@@ -0,0 +1,270 @@
+# src/llm/hedging.py
+"""
+Hedged request + deadline untuk panggilan API yang ekornya panjang.
+
+    call_hedged("chat", lambda: chat_completion(...), deadline_s=6.0)
+
+- Request pertama dikirim; kalau belum selesai setelah delay hedge
+  (persentil HEDGE_PERCENTILE dari latency endpoint tsb, minimal
+  min_delay_s), request duplikat dikirim dan yang pertama selesai dipakai.
+- Kalau deadline lewat sebelum ada yang berhasil -> DeadlineExceeded;
+  pemanggil yang memutuskan jalur degradasinya (lihat src/pipeline/turn.py).
+- Statistik: jumlah hedge, hedge yang menang, dan latency yang dihemat
+  (selisih waktu request asli vs pemenang, diukur saat request asli selesai).
+
+Versi sync (call_hedged): request yang kalah tidak bisa dibatalkan dari
+thread, hasilnya dibuang. Versi asyncio (acall_hedged, untuk client async di
+src/llm/client.py): request yang kalah di-cancel, koneksinya ikut ditutup.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.monitoring.metrics import REGISTRY
+
+HEDGES = REGISTRY.counter("cbt_hedge_sent_total", "Request duplikat (hedge) yang dikirim.", ("endpoint",))
+HEDGE_WINS = REGISTRY.counter("cbt_hedge_wins_total", "Hedge yang selesai lebih dulu dari request asli.", ("endpoint",))
+DEADLINES = REGISTRY.counter("cbt_deadline_exceeded_total", "Panggilan yang melewati deadline.", ("endpoint",))
+HEDGE_SAVED = REGISTRY.histogram("cbt_hedge_saved_seconds", "Latency yang dihemat oleh hedge yang menang.", ("endpoint",))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class LatencyTracker:
+    """Jendela latency terakhir per endpoint (untuk menentukan delay hedge)."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.window = window
+
+    def observe(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, endpoint: str, q: float, min_samples: int = 20) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < min_samples:
+            return None
+        idx = min(len(samples) - 1, int(round(q / 100.0 * (len(samples) - 1))))
+        return samples[idx]
+
+
+class Hedger:
+    def __init__(self, percentile: float = 90.0, min_delay_s: float = 0.5, default_delay_s: float = 2.0,
+                 max_hedges: int = 1, workers: int = 64):
+        """
+        percentile     : delay hedge = persentil latency endpoint (default p90)
+        default_delay_s: dipakai sampai sampel latency cukup
+        max_hedges     : 0 = hanya deadline, tanpa request duplikat
+        workers        : thread bersama untuk semua panggilan; harus > jumlah sesi
+                         paralel, kalau tidak hedge ikut mengantre di belakang primary
+        """
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s
+        self.default_delay_s = default_delay_s
+        self.max_hedges = max_hedges
+        self.latency = LatencyTracker()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cbt-hedge")
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def _stat(self, endpoint: str) -> dict:
+        return self.stats.setdefault(endpoint, {
+            "calls": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "saved_ms": 0.0,
+        })
+
+    def hedge_delay(self, endpoint: str) -> float:
+        p = self.latency.percentile(endpoint, self.percentile)
+        return max(self.min_delay_s, p if p is not None else self.default_delay_s)
+
+    def _submit(self, fn, endpoint: str):
+        # contextvars (prioritas/sesi scheduler) ikut ke thread pool
+        ctx = contextvars.copy_context()
+        started = time.perf_counter()
+        fut = self._pool.submit(ctx.run, fn)
+
+        def _done(f):
+            if f.exception() is None:
+                self.latency.observe(endpoint, time.perf_counter() - started)
+
+        fut.add_done_callback(_done)
+        return fut
+
+    def call(self, endpoint: str, fn, deadline_s: float | None = None, hedge: bool = True, discard=None):
+        """
+        Jalankan fn() dengan hedge + deadline. Return hasil request pertama yang berhasil.
+        discard: callback(hasil) untuk request yang kalah tapi tetap selesai (mis. tutup stream).
+        """
+        t0 = time.perf_counter()
+        end = t0 + deadline_s if deadline_s else None
+        with self._lock:
+            self._stat(endpoint)["calls"] += 1
+
+        primary = self._submit(fn, endpoint)
+        pending = {primary}
+        hedges = 0
+        next_hedge = t0 + self.hedge_delay(endpoint) if hedge and self.max_hedges > 0 else None
+        last_error = None
+
+        while True:
+            now = time.perf_counter()
+            if end is not None and now >= end:
+                break
+            if next_hedge is not None and now >= next_hedge:
+                hedges += 1
+                pending.add(self._submit(fn, endpoint))
+                HEDGES.labels(endpoint).inc()
+                with self._lock:
+                    self._stat(endpoint)["hedges"] += 1
+                next_hedge = now + self.hedge_delay(endpoint) if hedges < self.max_hedges else None
+            if not pending:
+                raise last_error  # semua request gagal sebelum deadline
+
+            timeouts = [x - now for x in (next_hedge, end) if x is not None]
+            done, pending = wait(pending, timeout=max(0.0, min(timeouts)) if timeouts else None,
+                                 return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is not None:
+                    last_error = f.exception()
+                    continue
+                if f is not primary:
+                    self._record_win(endpoint, primary)
+                self._discard_rest(pending | (done - {f}), discard)
+                return f.result()
+
+        self._discard_rest(pending, discard)
+        DEADLINES.labels(endpoint).inc()
+        with self._lock:
+            self._stat(endpoint)["deadline_exceeded"] += 1
+        raise DeadlineExceeded(f"{endpoint}: deadline {deadline_s:.1f}s lewat")
+
+    @staticmethod
+    def _discard_rest(futures, discard):
+        if discard is None:
+            return
+        for f in futures:
+            f.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+
+    async def acall(self, endpoint: str, afn, deadline_s: float | None = None, hedge: bool = True):
+        """
+        call() untuk coroutine: afn() -> awaitable baru tiap dipanggil. Request yang
+        kalah (atau semua, saat deadline / pemanggil di-cancel) di-cancel.
+        saved_ms tidak dicatat di sini: request asli dibatalkan sebelum selesai.
+        """
+        import asyncio
+
+        t0 = time.perf_counter()
+        end = t0 + deadline_s if deadline_s else None
+        with self._lock:
+            self._stat(endpoint)["calls"] += 1
+
+        def _start():
+            started = time.perf_counter()
+            task = asyncio.ensure_future(afn())
+
+            def _done(t):
+                if not t.cancelled() and t.exception() is None:
+                    self.latency.observe(endpoint, time.perf_counter() - started)
+
+            task.add_done_callback(_done)
+            return task
+
+        primary = _start()
+        pending = {primary}
+        hedges = 0
+        next_hedge = t0 + self.hedge_delay(endpoint) if hedge and self.max_hedges > 0 else None
+        last_error = None
+        try:
+            while True:
+                now = time.perf_counter()
+                if end is not None and now >= end:
+                    break
+                if next_hedge is not None and now >= next_hedge:
+                    hedges += 1
+                    pending.add(_start())
+                    HEDGES.labels(endpoint).inc()
+                    with self._lock:
+                        self._stat(endpoint)["hedges"] += 1
+                    next_hedge = now + self.hedge_delay(endpoint) if hedges < self.max_hedges else None
+                if not pending:
+                    raise last_error  # semua request gagal sebelum deadline
+
+                timeouts = [x - now for x in (next_hedge, end) if x is not None]
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, min(timeouts)) if timeouts else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for f in done:
+                    if f.exception() is not None:
+                        last_error = f.exception()
+                        continue
+                    if f is not primary:
+                        self._count_win(endpoint)
+                    return f.result()
+        finally:
+            for f in pending:
+                f.cancel()
+
+        DEADLINES.labels(endpoint).inc()
+        with self._lock:
+            self._stat(endpoint)["deadline_exceeded"] += 1
+        raise DeadlineExceeded(f"{endpoint}: deadline {deadline_s:.1f}s lewat")
+
+    def _count_win(self, endpoint: str):
+        HEDGE_WINS.labels(endpoint).inc()
+        with self._lock:
+            self._stat(endpoint)["hedge_wins"] += 1
+
+    def _record_win(self, endpoint: str, primary):
+        self._count_win(endpoint)
+        won_at = time.perf_counter()
+
+        def _saved(f):
+            # request asli akhirnya selesai: selisihnya adalah ekor yang terpotong
+            if f.exception() is None:
+                saved = max(0.0, time.perf_counter() - won_at)
+                HEDGE_SAVED.labels(endpoint).observe(saved)
+                with self._lock:
+                    self._stat(endpoint)["saved_ms"] += saved * 1000.0
+
+        primary.add_done_callback(_saved)
+
+    def summary(self) -> dict:
+        with self._lock:
+            out = {}
+            for ep, st in self.stats.items():
+                out[ep] = dict(st)
+                out[ep]["hedge_rate"] = round(st["hedges"] / st["calls"], 3) if st["calls"] else 0.0
+                out[ep]["saved_ms"] = round(st["saved_ms"], 1)
+            return out
+
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    global _hedger
+    if _hedger is None:
+        with _hedger_lock:
+            if _hedger is None:
+                from config import Config
+
+                cfg = Config()
+                _hedger = Hedger(percentile=cfg.HEDGE_PERCENTILE, min_delay_s=cfg.HEDGE_MIN_DELAY_MS / 1000.0,
+                                 max_hedges=cfg.HEDGE_MAX)
+    return _hedger
+
+
+def call_hedged(endpoint: str, fn, deadline_s: float | None = None, hedge: bool = True, discard=None):
+    return get_hedger().call(endpoint, fn, deadline_s=deadline_s, hedge=hedge, discard=discard)
+
+
+async def acall_hedged(endpoint: str, afn, deadline_s: float | None = None, hedge: bool = True):
+    return await get_hedger().acall(endpoint, afn, deadline_s=deadline_s, hedge=hedge)
@@ -0,0 +1,167 @@
+# src/llm/lexicon.py
+import re
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+
+# Mode pencocokan per lexicon:
+# - "word"  : harus utuh di batas kata ("baik" tidak match di "sebaiknya")
+# - "exact" : harus sama dengan seluruh teks yang sudah dinormalisasi
+# - "sub"   : substring biasa, tanpa batas kata (fragmen gumaman seperti "mmmm",
+#             keyword safety: "kepengen mati", "membunuh diri", "self harming")
+MATCH_MODES = {"word", "exact", "sub"}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalisasi yang dipakai semua lexicon:
+    - unicode NFKC + lowercase
+    - tanda baca -> spasi ("self-harm" == "self harm")
+    - spasi ganda dirapikan
+    """
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    t = _NON_WORD.sub(" ", t)
+    return _SPACES.sub(" ", t).strip()
+
+
+@dataclass(frozen=True)
+class LexiconHit:
+    lexicon: str
+    pattern: str
+    start: int
+    end: int
+
+
+class AhoCorasick:
+    """
+    Automaton multi-pattern (Aho–Corasick) sederhana berbasis dict.
+    Sekali build, lalu satu kali jalan per teks untuk semua pattern.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload):
+        if self._built:
+            raise RuntimeError("Automaton sudah di-build, tidak bisa tambah pattern.")
+        if not pattern:
+            return
+
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), payload))
+
+    def build(self):
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+
+                # output node ikut mewarisi output dari fail-link
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, payload) untuk setiap kemunculan pattern."""
+        if not self._built:
+            self.build()
+
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+
+            for length, payload in self._out[node]:
+                yield i + 1 - length, i + 1, payload
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class LexiconMatcher:
+    """
+    Gabungan banyak lexicon dalam SATU automaton.
+
+    lexicons: {nama: (list_pattern, mode)}
+    Pattern dinormalisasi dengan normalize_text() yang sama seperti input.
+    """
+
+    def __init__(self, lexicons: dict):
+        self.lexicons = {}
+        self._automaton = AhoCorasick()
+
+        for name, (patterns, mode) in lexicons.items():
+            if mode not in MATCH_MODES:
+                raise ValueError(f"Mode lexicon tidak dikenal: {mode} (lexicon {name})")
+
+            seen = set()
+            for p in patterns:
+                key = normalize_text(p)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                self._automaton.add(key, (name, mode, key))
+
+            self.lexicons[name] = mode
+
+        self._automaton.build()
+
+    def scan(self, text: str, normalized: bool = False, lexicons=None) -> list[LexiconHit]:
+        """
+        Satu kali jalan di atas teks, kembalikan semua hit yang lolos aturan batas kata.
+        lexicons: batasi hasil ke nama lexicon tertentu (opsional).
+        """
+        t = text if normalized else normalize_text(text)
+        if not t:
+            return []
+
+        n = len(t)
+        hits = []
+        for start, end, (name, mode, pattern) in self._automaton.iter_matches(t):
+            if lexicons is not None and name not in lexicons:
+                continue
+
+            if mode == "exact":
+                if start != 0 or end != n:
+                    continue
+            elif mode == "word":
+                if start > 0 and _is_word_char(t[start - 1]):
+                    continue
+                if end < n and _is_word_char(t[end]):
+                    continue
+
+            hits.append(LexiconHit(lexicon=name, pattern=pattern, start=start, end=end))
+
+        return hits
+
+    def scan_many(self, texts, lexicons=None) -> list[list[LexiconHit]]:
+        """Batch: automaton yang sama dipakai untuk semua teks."""
+        return [self.scan(t, lexicons=lexicons) for t in texts]
@@ -1,5 +1,9 @@
 # src/llm/prompt.py
 import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from src.llm.lexicon import LexiconMatcher, normalize_text
 
 # =========================
 # Safety (minimal)
@@ -11,8 +15,7 @@ HIGH_RISK_KEYWORDS = [
 ]
 
 def safety_check(user_text: str) -> bool:
-    t = (user_text or "").lower()
-    return any(k in t for k in HIGH_RISK_KEYWORDS)
+    return analyze_text(user_text).high_risk
 
 def safety_reply() -> str:
     return (
@@ -43,22 +46,7 @@ def is_stop_intent(text: str) -> bool:
     True jika user mengindikasikan ingin berhenti.
     Dibuat konservatif supaya kata 'sudah' dalam kalimat biasa tidak salah deteksi.
     """
-    t = (text or "").lower().strip()
-    t = re.sub(r"[^\w\s]", "", t)  # hapus tanda baca
-
-    if not t:
-        return False
-
-    # exact short utterance
-    tokens = [x for x in t.split() if x]
-    if 1 <= len(tokens) <= 3 and t in STOP_PHRASES_EXACT:
-        return True
-
-    # contains clear stop phrases
-    if any(p in t for p in STOP_PHRASES_CONTAINS):
-        return True
-
-    return False
+    return analyze_text(text).stop
 
 
 # =========================
@@ -69,33 +57,129 @@ FILLER_WORDS = {
     "hah", "oh", "aha", "anu", "eee", "em", "emm", "ya", "yah",
     "iya", "oke", "ok"
 }
+# fragmen gumaman untuk utterance sangat pendek ("mmmm", "ehh")
+FILLER_FRAGMENTS = ["mm", "mmm", "hmm", "eh", "uh", "hah", "oh", "aha", "em"]
+FILLER_COMPACT_MAX_CHARS = 6
 
 def is_mostly_filler(text: str) -> bool:
     """
     True jika transkrip kebanyakan filler/gumaman dan belum bermakna.
     Gunakan ini setelah STT sebelum RAG/LLM.
     """
-    t = (text or "").lower().strip()
-    if not t:
-        return True
+    return analyze_text(text).filler
 
-    t2 = re.sub(r"[^a-zA-Z0-9\s]", " ", t)
-    tokens = [x for x in t2.split() if x]
 
-    if len(tokens) == 0:
-        return True
+# =========================
+# Mood meter (dipakai sidebar GUI)
+# =========================
+# urutan = prioritas: zona pertama yang kena menentukan skor
+MOOD_LEXICONS = [
+    ("mood_red", 8, ["sedih", "takut", "cemas", "bingung", "sakit", "capek", "lelah", "mati"]),
+    ("mood_orange", 7, ["marah", "kesal", "benci", "sebal"]),
+    ("mood_green", 2, ["senang", "bahagia", "tenang", "lega", "makasih", "baik"]),
+]
+MOOD_NEUTRAL_SCORE = 5
 
-    # hanya 1-2 token dan semuanya filler
-    if len(tokens) <= 2 and all(tok in FILLER_WORDS for tok in tokens):
-        return True
 
-    # repetisi pendek seperti "mmmm" / "ehh"
-    compact = re.sub(r"\s+", "", t)
-    if len(compact) <= 6 and any(ch.isalpha() for ch in compact):
-        if any(f in compact for f in ["mm", "mmm", "hmm", "eh", "uh", "hah", "oh", "aha", "em"]):
-            return True
+# =========================
+# Single-pass text signals (satu automaton untuk semua lexicon)
+# =========================
+@dataclass(frozen=True)
+class TextSignals:
+    high_risk: bool = False
+    stop: bool = False
+    filler: bool = True
+    mood_score: int = MOOD_NEUTRAL_SCORE
+    mood_counts: dict = field(default_factory=dict)
+    hits: tuple = ()
+
+
+@lru_cache(maxsize=1)
+def _matcher() -> LexiconMatcher:
+    lexicons = {
+        # safety: substring tanpa batas kata, sama seperti cek lama `k in text`
+        # ("kepengen mati", "membunuh diri", "mengakhiri hidupku" tetap kena)
+        "high_risk": (HIGH_RISK_KEYWORDS, "sub"),
+        "stop_exact": (sorted(STOP_PHRASES_EXACT), "exact"),
+        "stop_contains": (STOP_PHRASES_CONTAINS, "word"),
+        "filler": (sorted(FILLER_WORDS), "word"),
+        "filler_fragment": (FILLER_FRAGMENTS, "sub"),
+    }
+    for name, _, words in MOOD_LEXICONS:
+        lexicons[name] = (words, "word")
+    return LexiconMatcher(lexicons)
+
+
+@lru_cache(maxsize=256)
+def analyze_text(text: str) -> TextSignals:
+    """
+    Satu kali scan -> semua flag intent (safety/stop/filler) + skor mood.
+    Hasil di-cache per teks, jadi safety_check/is_stop_intent/is_mostly_filler
+    untuk utterance yang sama cuma memicu satu scan.
+    """
+    raw = (text or "").lower().strip()
+    if not raw:
+        return TextSignals()
+
+    matcher = _matcher()
+    t = normalize_text(raw)
+    tokens = t.split()
+    hits = matcher.scan(t, normalized=True)
+
+    by_lexicon = {}
+    for h in hits:
+        by_lexicon[h.lexicon] = by_lexicon.get(h.lexicon, 0) + 1
+
+    # stop: ucapan pendek yang persis frasa stop, atau mengandung frasa stop yang jelas
+    stop = bool(by_lexicon.get("stop_contains")) or (
+        1 <= len(tokens) <= 3 and bool(by_lexicon.get("stop_exact"))
+    )
+
+    # filler: 1-2 token yang semuanya filler, atau repetisi pendek ("mmmm" / "ehh")
+    filler = len(tokens) == 0 or (
+        len(tokens) <= 2 and by_lexicon.get("filler", 0) == len(tokens)
+    )
+    if not filler:
+        compact = re.sub(r"\s+", "", raw)
+        if len(compact) <= FILLER_COMPACT_MAX_CHARS and any(ch.isalpha() for ch in compact):
+            filler = bool(matcher.scan(compact, normalized=True, lexicons={"filler_fragment"}))
+
+    mood_counts = {name: by_lexicon.get(name, 0) for name, _, _ in MOOD_LEXICONS}
+    mood_score = next(
+        (score for name, score, _ in MOOD_LEXICONS if mood_counts[name] > 0),
+        MOOD_NEUTRAL_SCORE,
+    )
+
+    return TextSignals(
+        high_risk=bool(by_lexicon.get("high_risk")),
+        stop=stop,
+        filler=filler,
+        mood_score=mood_score,
+        mood_counts=mood_counts,
+        hits=tuple(hits),
+    )
 
-    return False
+
+def analyze_texts(texts) -> list[TextSignals]:
+    """Batch: scan banyak teks (mis. seluruh log transkrip) dengan automaton yang sama."""
+    return [analyze_text(t) for t in texts]
+
+
+def score_transcript(messages: list[dict]) -> dict:
+    """
+    Skor satu log transkrip (list {"role", "content"}).
+    Hanya pesan user yang discan; kembalikan sinyal per pesan + ringkasan.
+    """
+    user_texts = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+    signals = analyze_texts(user_texts)
+
+    return {
+        "signals": signals,
+        "last_mood_score": signals[-1].mood_score if signals else MOOD_NEUTRAL_SCORE,
+        "high_risk_turns": sum(1 for s in signals if s.high_risk),
+        "stop_turns": sum(1 for s in signals if s.stop),
+        "filler_turns": sum(1 for s in signals if s.filler),
+    }
 
 
 # =========================
@@ -0,0 +1,190 @@
+# src/llm/safety.py
+"""
+Safety screening semantik di atas HIGH_RISK_KEYWORDS (src/llm/prompt.py).
+
+Keyword hanya menangkap frasa persis; parafrase ("aku capek hidup",
+"semua orang lebih baik tanpa aku") lolos. Di sini vektor query turn — yang
+memang sudah di-embed untuk retrieval — dibandingkan dengan matriks embedding
+CRISIS_EXEMPLARS dalam satu matmul, jadi tidak ada panggilan API tambahan
+per turn. Hanya kalau retrieval tidak menghasilkan vektor (deadline, index
+masih dibangun) query di-embed sendiri untuk screening.
+
+- Keyword (analyze_text) tetap jalan duluan sebagai pre-filter cepat.
+- Matriks contoh di-embed sekali per (model, dimensi) index aktif dan
+  disimpan di cache_dir (mis. INDEX_DIR/safety), jadi restart tidak memanggil
+  API lagi. Selama matriks belum ada, embedding jalan di background dan
+  screen() return None (hanya keyword) — turn tidak pernah menunggu.
+- Ambang (SAFETY_SEMANTIC_THRESHOLD) bergantung model embedding; kalibrasi
+  dengan python -m src.bench.safety_screen.
+"""
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+
+from src.llm.prompt import HIGH_RISK_KEYWORDS
+from src.llm.scheduler import PRIORITY_WARMUP, api_context
+
+# parafrase ide/niat bunuh diri & melukai diri (ID + EN, dataset berbahasa Inggris)
+CRISIS_EXEMPLARS = HIGH_RISK_KEYWORDS + [
+    "aku nggak mau hidup lagi",
+    "aku capek hidup",
+    "rasanya lebih baik aku nggak ada",
+    "semua orang bakal lebih baik tanpa aku",
+    "aku pengen tidur dan nggak bangun lagi",
+    "aku udah nggak kuat, pengen semuanya berakhir",
+    "buat apa aku hidup",
+    "aku kepikiran untuk mengakhiri semuanya",
+    "aku sudah menyiapkan cara untuk pergi selamanya",
+    "aku sering menyakiti diriku sendiri",
+    "aku menyayat tanganku lagi",
+    "aku nggak pantas hidup",
+    "I don't want to be alive anymore",
+    "I want to die",
+    "everyone would be better off without me",
+    "I wish I could go to sleep and never wake up",
+    "I've been thinking about ending it all",
+    "there's no point in living anymore",
+    "I have a plan to take my own life",
+    "I've been cutting myself again",
+    "I hurt myself on purpose when it gets bad",
+    "I don't see a way out except dying",
+    "I just want to disappear forever",
+    "I wrote goodbye letters to my family",
+]
+
+
+@dataclass(frozen=True)
+class SafetyHit:
+    score: float
+    exemplar: str
+
+
+class SemanticSafety:
+    def __init__(self, threshold: float = 0.6, embed_fn=None, exemplars: list[str] | None = None,
+                 cache_dir: str | None = None, background: bool = True):
+        """
+        embed_fn : callable(texts, model, dimensions) -> (n, dim) ternormalisasi.
+                   Default embed_texts (client); bisa diganti embedder lokal untuk benchmark.
+        cache_dir: simpan matriks contoh (.npy) per model/dimensi; None = tanpa cache disk
+        background=False: matriks yang belum ada langsung di-embed di thread pemanggil
+        """
+        self.threshold = float(threshold)
+        self.exemplars = list(exemplars or CRISIS_EXEMPLARS)
+        self.cache_dir = cache_dir
+        self.background = background
+        self._embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._matrices = {}   # (model, dimensions) -> (n, dim) float32
+        self._building = set()
+
+    # ---------- matriks contoh ----------
+    def _cache_path(self, model: str, dimensions: int | None) -> str | None:
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1("\n".join(self.exemplars).encode("utf-8")).hexdigest()[:10]
+        safe_model = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+        return os.path.join(self.cache_dir, f"{safe_model}-{dimensions or 0}-{digest}.npy")
+
+    def _build(self, model: str, dimensions: int | None):
+        import numpy as np
+
+        key = (model, dimensions)
+        try:
+            embed_fn = self._embed_fn
+            if embed_fn is None:
+                from src.llm.client import embed_texts as embed_fn
+            with api_context(PRIORITY_WARMUP, session="safety"):
+                matrix = np.ascontiguousarray(embed_fn(self.exemplars, model=model, dimensions=dimensions),
+                                              dtype="float32")
+            path = self._cache_path(model, dimensions)
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(path + ".part.npy", matrix, allow_pickle=False)
+                os.replace(path + ".part.npy", path)
+            with self._lock:
+                self._matrices[key] = matrix
+        except Exception as e:
+            print(f"⚠️ Embedding contoh safety gagal ({model}): {e}")
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def matrix(self, model: str, dimensions: int | None = None):
+        """Matriks contoh untuk model ini, atau None kalau masih di-embed (build dimulai di sini)."""
+        key = (model, dimensions)
+        with self._lock:
+            if key in self._matrices:
+                return self._matrices[key]
+            if key in self._building:
+                return None
+
+        path = self._cache_path(model, dimensions)
+        if path and os.path.exists(path):
+            import numpy as np
+
+            matrix = np.load(path, allow_pickle=False)
+            with self._lock:
+                self._matrices[key] = matrix
+            return matrix
+
+        with self._lock:
+            if key in self._building:
+                return None
+            self._building.add(key)
+        if self.background:
+            threading.Thread(target=self._build, args=(model, dimensions),
+                             name="cbt-safety-embed", daemon=True).start()
+            return None
+        self._build(model, dimensions)
+        with self._lock:
+            return self._matrices.get(key)
+
+    def warm(self, model: str, dimensions: int | None = None):
+        """Siapkan matriks lebih awal (mis. saat startup) supaya turn pertama sudah ter-screen."""
+        self.matrix(model, dimensions)
+
+    # ---------- screening ----------
+    def embed_query(self, text: str, model: str, dimensions: int | None = None):
+        """
+        Vektor (1, dim) untuk text dengan embed_fn yang sama dengan matriks contoh.
+        Hanya untuk turn yang tidak punya vektor retrieval (deadline / index masih dibangun).
+        """
+        import numpy as np
+
+        embed_fn = self._embed_fn
+        if embed_fn is None:
+            from src.llm.client import embed_texts as embed_fn
+        return np.asarray(embed_fn([text], model=model, dimensions=dimensions), dtype="float32").reshape(1, -1)
+
+    def score(self, qvec, model: str, dimensions: int | None = None) -> SafetyHit | None:
+        """Contoh paling mirip dengan qvec (1, dim), atau None kalau matriks belum siap / dimensi beda."""
+        import numpy as np
+
+        matrix = self.matrix(model, dimensions)
+        q = np.asarray(qvec, dtype="float32").reshape(-1)
+        if matrix is None or matrix.shape[1] != q.shape[0]:
+            return None
+        sims = matrix @ q
+        best = int(sims.argmax())
+        return SafetyHit(round(float(sims[best]), 4), self.exemplars[best])
+
+    def screen(self, qvec, model: str, dimensions: int | None = None) -> SafetyHit | None:
+        """SafetyHit kalau similarity >= threshold; None = lolos (atau belum bisa dinilai)."""
+        hit = self.score(qvec, model, dimensions)
+        return hit if hit is not None and hit.score >= self.threshold else None
+
+
+def build_semantic_safety(cfg, retriever=None, background: bool = True) -> SemanticSafety | None:
+    """
+    SemanticSafety dari config (None kalau ENABLE_SAFETY mati atau ambang 0).
+    Kalau retriever sudah punya index, matriks contoh langsung disiapkan
+    (di background, atau ditunggu kalau background=False mis. untuk batch).
+    """
+    if not cfg.ENABLE_SAFETY or cfg.SAFETY_SEMANTIC_THRESHOLD <= 0:
+        return None
+    safety = SemanticSafety(threshold=cfg.SAFETY_SEMANTIC_THRESHOLD,
+                            cache_dir=os.path.join(cfg.INDEX_DIR, "safety"), background=background)
+    if retriever is not None and getattr(retriever, "available", True):
+        safety.warm(*retriever.embed_args())
+    return safety
@@ -0,0 +1,376 @@
+# src/llm/scheduler.py
+"""
+Scheduler bersama untuk semua traffic API provider.
+
+- Token bucket per endpoint: requests/menit (rpm) dan tokens/menit (tpm).
+- Kelas prioritas: INTERACTIVE (turn live) > WARMUP (spekulatif, pre-fetch)
+  > BULK (embedding ingest). Request prioritas lebih rendah hanya boleh
+  memakai kuota di atas `reserve` (porsi bucket yang disisakan untuk turn
+  live), jadi rebuild index di background tidak membuat turn kena 429.
+- Fair queuing: di dalam satu kelas, sesi dilayani round-robin (satu sesi
+  dengan banyak request tidak memblokir sesi lain).
+
+Coroutine menunggu lewat aacquire()/aslot(): waiter-nya future di event loop
+pemanggil yang dibangunkan scheduler (bukan thread dari executor), jadi
+ratusan request BULK yang antre kuota tidak menghabiskan thread dan request
+INTERACTIVE tetap langsung dapat giliran.
+
+Prioritas & sesi dibawa lewat contextvars, jadi pemanggil cukup:
+
+    with api_context(PRIORITY_BULK, session="ingest"):
+        embed_texts(...)
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from src.monitoring.metrics import REGISTRY
+
+QUEUE_WAIT = REGISTRY.histogram(
+    "cbt_api_queue_wait_seconds", "Waktu tunggu di scheduler API sebelum request dikirim.",
+    ("endpoint", "priority"),
+)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_WARMUP = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_WARMUP: "warmup", PRIORITY_BULK: "bulk"}
+
+_priority = contextvars.ContextVar("api_priority", default=PRIORITY_INTERACTIVE)
+_session = contextvars.ContextVar("api_session", default="default")
+
+
+@contextmanager
+def api_context(priority: int | None = None, session: str | None = None):
+    """Set prioritas / sesi untuk semua panggilan API di blok ini (per thread/task)."""
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if session is not None:
+        tokens.append((_session, _session.set(str(session))))
+    try:
+        yield
+    finally:
+        for var, tok in reversed(tokens):
+            var.reset(tok)
+
+
+def current_context() -> tuple[int, str]:
+    return _priority.get(), _session.get()
+
+
+class TokenBucket:
+    """Bucket per menit; kapasitas = limit per menit (burst maksimal 1 menit kuota)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, floor: float = 0.0) -> float:
+        """Detik sampai `amount` bisa diambil tanpa membuat level < floor."""
+        self._refill(now)
+        # request lebih besar dari kapasitas tetap bisa lewat (saat bucket penuh)
+        amount = min(amount, max(0.0, self.capacity - floor))
+        missing = amount + floor - self.level
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def drain(self):
+        self.level = min(self.level, 0.0)
+
+
+class _Ticket:
+    __slots__ = ("priority", "session", "tokens", "granted", "waker")
+
+    def __init__(self, priority: int, session: str, tokens: float):
+        self.priority = priority
+        self.session = session
+        self.tokens = tokens
+        self.granted = False
+        self.waker = None   # (loop, future) selagi coroutine pemiliknya menunggu
+
+
+class _EndpointQueue:
+    def __init__(self, rpm: float | None, tpm: float | None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        # prioritas -> {session: deque[ticket]}, dengan urutan round-robin sesi
+        self.waiting = {}
+        self.rr = {}
+        self.paused_until = 0.0
+
+    def head(self):
+        """Ticket berikutnya: prioritas tertinggi, sesi berikutnya secara round-robin."""
+        for prio in sorted(self.waiting):
+            sessions = self.waiting[prio]
+            order = self.rr[prio]
+            while order:
+                s = order[0]
+                if sessions.get(s):
+                    return sessions[s][0]
+                order.popleft()
+                sessions.pop(s, None)
+        return None
+
+    def push(self, t: _Ticket):
+        sessions = self.waiting.setdefault(t.priority, {})
+        order = self.rr.setdefault(t.priority, deque())
+        if t.session not in sessions or not sessions[t.session]:
+            sessions[t.session] = deque()
+            if t.session not in order:
+                order.append(t.session)
+        sessions[t.session].append(t)
+
+    def pop(self, t: _Ticket):
+        sessions = self.waiting[t.priority]
+        order = self.rr[t.priority]
+        sessions[t.session].popleft()
+        # sesi ini sudah dapat giliran -> pindah ke belakang
+        order.remove(t.session)
+        if sessions[t.session]:
+            order.append(t.session)
+        else:
+            del sessions[t.session]
+        if not order:
+            del self.waiting[t.priority]
+            del self.rr[t.priority]
+
+    def remove(self, t: _Ticket):
+        """Keluarkan ticket yang belum granted (pemiliknya di-cancel)."""
+        sessions = self.waiting.get(t.priority, {})
+        queue = sessions.get(t.session)
+        if not queue or t not in queue:
+            return
+        queue.remove(t)
+        if not queue:
+            del sessions[t.session]
+            self.rr[t.priority].remove(t.session)
+            if not self.rr[t.priority]:
+                del self.waiting[t.priority]
+                del self.rr[t.priority]
+
+    def wait_time(self, t: _Ticket, now: float, reserve: float) -> float:
+        wait = max(0.0, self.paused_until - now)
+        for bucket, amount in ((self.requests, 1.0), (self.tokens, t.tokens)):
+            if bucket is None:
+                continue
+            floor = reserve * bucket.capacity if t.priority > PRIORITY_INTERACTIVE else 0.0
+            wait = max(wait, bucket.wait_time(amount, now, floor))
+        return wait
+
+    def take(self, t: _Ticket):
+        if self.requests is not None:
+            self.requests.take(1.0)
+        if self.tokens is not None:
+            self.tokens.take(t.tokens)
+
+
+class APIScheduler:
+    def __init__(self, limits: dict | None = None, reserve: float = 0.2):
+        """
+        limits : {endpoint: (rpm, tpm)}; None/0 = tidak dibatasi.
+        reserve: porsi bucket yang hanya boleh dipakai prioritas INTERACTIVE.
+        """
+        self.reserve = float(reserve)
+        self._cond = threading.Condition()
+        self._queues = {ep: _EndpointQueue(rpm, tpm) for ep, (rpm, tpm) in (limits or {}).items()}
+        self._async_waiting = set()   # ticket coroutine yang sedang menunggu
+        self.stats = {}
+
+    def _stat(self, endpoint: str, priority: int) -> dict:
+        key = f"{endpoint}:{PRIORITY_NAMES.get(priority, priority)}"
+        return self.stats.setdefault(key, {"granted": 0, "waited": 0, "wait_ms": 0.0, "rate_limited": 0})
+
+    def _resolve(self, priority: int | None, session: str | None) -> tuple[int, str]:
+        ctx_prio, ctx_session = current_context()
+        return (ctx_prio if priority is None else priority), (ctx_session if session is None else session)
+
+    def _notify(self):
+        """Bangunkan semua waiter (thread + coroutine). Dipanggil dengan _cond dipegang."""
+        self._cond.notify_all()
+        for t in self._async_waiting:
+            if t.waker is not None:
+                loop, fut = t.waker
+                t.waker = None
+                loop.call_soon_threadsafe(_wake, fut)
+
+    def _try_grant(self, q: _EndpointQueue, ticket: _Ticket) -> float | None:
+        """
+        Dipanggil dengan _cond dipegang. 0 = granted (jatah sudah diambil),
+        > 0 = detik sampai kuota cukup, None = belum giliran ticket ini.
+        """
+        if q.head() is not ticket:
+            return None  # tunggu giliran (dibangunkan oleh pop/release)
+        wait = q.wait_time(ticket, time.monotonic(), self.reserve)
+        if wait > 0:
+            return wait
+        q.pop(ticket)
+        q.take(ticket)
+        ticket.granted = True
+        self._notify()  # ticket berikutnya mungkin sudah bisa jalan
+        return 0.0
+
+    def _record(self, endpoint: str, priority: int, waited: float):
+        QUEUE_WAIT.labels(endpoint, PRIORITY_NAMES.get(priority, priority)).observe(waited)
+        st = self._stat(endpoint, priority)
+        st["granted"] += 1
+        if waited > 0.001:
+            st["waited"] += 1
+            st["wait_ms"] += waited * 1000.0
+
+    def acquire(self, endpoint: str, tokens: float = 0.0, priority: int | None = None,
+                session: str | None = None) -> float:
+        """Blok sampai request boleh jalan. Return detik menunggu."""
+        q = self._queues.get(endpoint)
+        priority, session = self._resolve(priority, session)
+        if q is None:
+            with self._cond:
+                self._stat(endpoint, priority)["granted"] += 1
+            return 0.0
+
+        t0 = time.monotonic()
+        ticket = _Ticket(priority, session, float(tokens))
+        with self._cond:
+            q.push(ticket)
+            while True:
+                wait = self._try_grant(q, ticket)
+                if wait == 0.0:
+                    break
+                # ticket berprioritas lebih tinggi bisa datang kapan saja -> cek ulang berkala
+                self._cond.wait(timeout=min(wait, 1.0) if wait is not None else 1.0)
+
+            waited = time.monotonic() - t0
+            self._record(endpoint, priority, waited)
+        return waited
+
+    async def aacquire(self, endpoint: str, tokens: float = 0.0, priority: int | None = None,
+                       session: str | None = None) -> float:
+        """
+        acquire() untuk coroutine: menunggu di future event loop ini (tanpa thread).
+        Kalau di-cancel sebelum giliran, ticket dikeluarkan dari antrean.
+        """
+        import asyncio
+
+        q = self._queues.get(endpoint)
+        priority, session = self._resolve(priority, session)
+        if q is None:
+            with self._cond:
+                self._stat(endpoint, priority)["granted"] += 1
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        t0 = time.monotonic()
+        ticket = _Ticket(priority, session, float(tokens))
+        with self._cond:
+            q.push(ticket)
+            self._async_waiting.add(ticket)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(q, ticket)
+                    if wait == 0.0:
+                        break
+                    fut = loop.create_future()
+                    ticket.waker = (loop, fut)
+                await asyncio.wait({fut}, timeout=min(wait, 1.0) if wait is not None else 1.0)
+        except BaseException:
+            with self._cond:
+                if not ticket.granted:
+                    q.remove(ticket)
+                    self._notify()  # ticket di belakangnya mungkin jadi head
+            raise
+        finally:
+            with self._cond:
+                ticket.waker = None
+                self._async_waiting.discard(ticket)
+
+        waited = time.monotonic() - t0
+        with self._cond:
+            self._record(endpoint, priority, waited)
+        return waited
+
+    def rate_limited(self, endpoint: str, retry_after: float | None = None):
+        """Provider tetap membalas 429: kosongkan bucket dan jeda endpoint sebentar."""
+        q = self._queues.get(endpoint)
+        with self._cond:
+            self._stat(endpoint, current_context()[0])["rate_limited"] += 1
+            if q is None:
+                return
+            for bucket in (q.requests, q.tokens):
+                if bucket is not None:
+                    bucket.drain()
+            q.paused_until = max(q.paused_until, time.monotonic() + (retry_after or 1.0))
+            self._notify()
+
+    def _check_rate_limited(self, endpoint: str, e: Exception):
+        if getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError":
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after", 0)) or None
+            except (TypeError, ValueError):
+                retry_after = None
+            self.rate_limited(endpoint, retry_after)
+
+    @contextmanager
+    def slot(self, endpoint: str, tokens: float = 0.0):
+        """acquire() + deteksi 429 dari exception provider."""
+        self.acquire(endpoint, tokens)
+        try:
+            yield
+        except Exception as e:
+            self._check_rate_limited(endpoint, e)
+            raise
+
+    @asynccontextmanager
+    async def aslot(self, endpoint: str, tokens: float = 0.0):
+        """slot() untuk coroutine (aacquire: menunggu kuota tanpa memblokir event loop)."""
+        await self.aacquire(endpoint, tokens)
+        try:
+            yield
+        except Exception as e:
+            self._check_rate_limited(endpoint, e)
+            raise
+
+    def summary(self) -> dict:
+        with self._cond:
+            out = {}
+            for key, st in self.stats.items():
+                out[key] = dict(st)
+                out[key]["avg_wait_ms"] = round(st["wait_ms"] / st["waited"], 1) if st["waited"] else 0.0
+            return out
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def parse_limits(spec: str) -> dict:
+    """
+    "chat=500/200000,embeddings=3000/1000000,stt=50,tts=50"
+      -> {"chat": (500, 200000), "embeddings": (3000, 1000000), "stt": (50, None), ...}
+    Format: endpoint=rpm[/tpm]
+    """
+    limits = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        endpoint, _, rest = part.partition("=")
+        rpm, _, tpm = rest.partition("/")
+        limits[endpoint.strip()] = (float(rpm) if rpm else None, float(tpm) if tpm else None)
+    return limits
+
+
+def estimate_tokens(text_or_texts) -> int:
+    """Perkiraan kasar ~4 karakter per token (cukup untuk kuota tpm)."""
+    if isinstance(text_or_texts, str):
+        return max(1, len(text_or_texts) // 4)
+    return sum(max(1, len(t or "") // 4) for t in text_or_texts)
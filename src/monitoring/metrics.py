@@ -0,0 +1,474 @@
+# src/monitoring/metrics.py
+"""
+Metrik runtime (counter / gauge / histogram) dalam format teks Prometheus,
+diekspos lewat HTTP lokal: GET /metrics (dan GET /tracemalloc kalau aktif).
+
+Tanpa dependency tambahan (hanya stdlib). Nilai yang mahal/berubah sendiri
+(RSS, ukuran index, isi TMP_DIR, cache hit) dihitung saat di-scrape lewat
+gauge callback, jadi tidak ada biaya di hot path.
+
+Pakai:
+    from src.monitoring import metrics
+    metrics.start_metrics_server(cfg.METRICS_PORT)
+    with metrics.track_api("chat"): ...
+    with metrics.trace_section("retrieval"): ...   # tracemalloc (opsional)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# detik; cukup rapat di 10ms-2s (search lokal s/d panggilan API)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values, extra: dict | None = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: butuh label {self.labelnames}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._children.items())
+        for values, child in items:
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_fmt_labels(labelnames, values)} {_fmt_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        with self._lock:
+            self.value = float(value)
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    self.counts[i] += 1
+                    break
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total, n = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for b, c in zip(self.buckets, counts):
+            cumulative += c
+            lines.append(f"{name}_bucket{_fmt_labels(labelnames, values, {'le': _fmt_value(b)})} {cumulative}")
+        lines.append(f"{name}_bucket{_fmt_labels(labelnames, values, {'le': '+Inf'})} {n}")
+        lines.append(f"{name}_sum{_fmt_labels(labelnames, values)} {_fmt_value(total)}")
+        lines.append(f"{name}_count{_fmt_labels(labelnames, values)} {n}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    @contextmanager
+    def time(self, *labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(*labels).observe(time.perf_counter() - t0)
+
+
+class CallbackGauge(_Metric):
+    """Gauge yang nilainya dihitung saat scrape: fn() -> float | {label_tuple: float}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn, labelnames=(), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines  # sumber belum siap (mis. retriever belum dibuat)
+        if value is None:
+            return lines
+        if not isinstance(value, dict):
+            value = {(): value}
+        for values, v in value.items():
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(float(v))}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args, **kwargs)
+            return m
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def callback(self, name, help, fn, labelnames=(), kind: str = "gauge") -> CallbackGauge:
+        """Daftarkan (atau ganti) gauge callback."""
+        with self._lock:
+            m = self._metrics[name] = CallbackGauge(name, help, fn, labelnames, kind=kind)
+            return m
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- metrik standar ----------
+API_CALLS = REGISTRY.counter("cbt_api_calls_total", "Panggilan API provider per endpoint.", ("endpoint",))
+API_ERRORS = REGISTRY.counter("cbt_api_errors_total", "Panggilan API yang gagal per endpoint.", ("endpoint",))
+API_LATENCY = REGISTRY.histogram("cbt_api_latency_seconds", "Latency panggilan API provider.", ("endpoint",))
+RETRIEVAL_LATENCY = REGISTRY.histogram("cbt_retrieval_seconds", "Latency CBTRetriever.search (termasuk embed query kalau qvec belum ada).")
+
+
+@contextmanager
+def track_api(endpoint: str):
+    """Hitung panggilan, error, dan latency satu request API."""
+    API_CALLS.labels(endpoint).inc()
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        API_ERRORS.labels(endpoint).inc()
+        raise
+    finally:
+        API_LATENCY.labels(endpoint).observe(time.perf_counter() - t0)
+
+
+# ---------- proses & filesystem ----------
+def process_rss_bytes() -> float:
+    """RSS saat ini (Linux /proc); fallback ke peak RSS dari getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return float(pages * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(peak if os.uname().sysname == "Darwin" else peak * 1024)
+
+
+def dir_usage(path: str) -> tuple[int, int]:
+    """(jumlah file, total byte) di bawah path."""
+    files = total = 0
+    for root, _, names in os.walk(path):
+        for n in names:
+            try:
+                total += os.path.getsize(os.path.join(root, n))
+                files += 1
+            except OSError:
+                pass
+    return files, total
+
+
+def register_process_metrics(tmp_dir: str | None = None):
+    REGISTRY.callback("cbt_process_rss_bytes", "Resident set size proses.", process_rss_bytes)
+    REGISTRY.callback("cbt_process_threads", "Jumlah thread Python aktif.", threading.active_count)
+    if tmp_dir:
+        REGISTRY.callback("cbt_tmp_dir_files", "Jumlah file di TMP_DIR.", lambda: dir_usage(tmp_dir)[0])
+        REGISTRY.callback("cbt_tmp_dir_bytes", "Total ukuran file di TMP_DIR.", lambda: dir_usage(tmp_dir)[1])
+
+
+def register_cache(name: str, cached_fn):
+    """Hit/miss/size dari functools.lru_cache."""
+    def _info(field):
+        return lambda: getattr(cached_fn.cache_info(), field)
+
+    REGISTRY.callback(f"cbt_cache_{name}_hits_total", f"Cache hit {name}.", _info("hits"), kind="counter")
+    REGISTRY.callback(f"cbt_cache_{name}_misses_total", f"Cache miss {name}.", _info("misses"), kind="counter")
+    REGISTRY.callback(f"cbt_cache_{name}_size", f"Jumlah entri cache {name}.", _info("currsize"))
+
+
+def register_retriever(retriever):
+    """Gauge kesehatan index dari snapshot aktif retriever (ikut hot-reload)."""
+    doc_bytes = {}
+
+    def _docs_bytes():
+        import sys
+
+        version, docs = retriever.version, retriever.docs
+        if version not in doc_bytes:
+            # estimasi sekali per versi (list + dict + string), bukan tiap scrape
+            total = sys.getsizeof(docs)
+            for d in docs:
+                total += sys.getsizeof(d) + sum(sys.getsizeof(v) for v in d.values())
+            doc_bytes.clear()
+            doc_bytes[version] = total
+        return doc_bytes[version]
+
+    def _file_size(path):
+        return float(os.path.getsize(path)) if path and os.path.exists(path) else 0.0
+
+    REGISTRY.callback("cbt_index_ntotal", "Jumlah vektor di index aktif.", lambda: retriever.index.ntotal)
+    REGISTRY.callback("cbt_index_dim", "Dimensi vektor index aktif.", lambda: retriever.index.d)
+    REGISTRY.callback("cbt_index_docs", "Jumlah docs di index aktif.", lambda: len(retriever.docs))
+    REGISTRY.callback("cbt_index_docs_memory_bytes", "Estimasi memori docs (Python objects).", _docs_bytes)
+    REGISTRY.callback("cbt_index_file_bytes", "Ukuran file index aktif.", lambda: _file_size(retriever.index_path))
+    REGISTRY.callback(
+        "cbt_index_full_vectors_bytes",
+        "Ukuran vektor float32 penuh (mmap) untuk rescoring.",
+        lambda: float(getattr(retriever.full_vectors, "nbytes", 0) or 0),
+    )
+    REGISTRY.callback(
+        "cbt_index_info", "Versi index aktif (nilai selalu 1).",
+        lambda: {(retriever.version or "legacy", retriever.storage): 1},
+        labelnames=("version", "storage"),
+    )
+
+
+# ---------- tracemalloc (opsional) ----------
+TRACE_PEAK = REGISTRY.gauge("cbt_tracemalloc_peak_bytes", "Peak alokasi Python terakhir per section.", ("section",))
+TRACE_NET = REGISTRY.gauge("cbt_tracemalloc_net_bytes", "Selisih alokasi Python terakhir per section.", ("section",))
+_trace_lock = threading.Lock()
+_trace_active = []   # state section yang sedang jalan: {"overlap": bool}
+
+
+def enable_tracemalloc(frames: int = 10):
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+@contextmanager
+def trace_section(section: str):
+    """
+    Ukur alokasi Python satu blok (mis. "ingest", "retrieval") kalau tracemalloc aktif.
+
+    Peak tracemalloc bersifat global per proses (reset_peak() me-reset untuk
+    semua thread), jadi peak hanya valid untuk section yang jalan SENDIRIAN.
+    Kalau section lain berjalan bersamaan (nested atau beda thread, mis.
+    ingest background vs retrieval), peak section tsb tidak dilaporkan (gauge
+    peak tetap nilai valid terakhir). Net bytes tetap dicatat, tapi ikut
+    memuat alokasi section lain yang overlap.
+    """
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        yield
+        return
+
+    state = {"overlap": False}
+    with _trace_lock:
+        if _trace_active:
+            state["overlap"] = True
+            for other in _trace_active:
+                other["overlap"] = True
+        else:
+            tracemalloc.reset_peak()
+        _trace_active.append(state)
+        before, _ = tracemalloc.get_traced_memory()
+    try:
+        yield
+    finally:
+        with _trace_lock:
+            after, peak = tracemalloc.get_traced_memory()
+            _trace_active.remove(state)
+        TRACE_NET.labels(section).set(after - before)
+        if not state["overlap"]:
+            TRACE_PEAK.labels(section).set(max(0, peak - before))
+
+
+def tracemalloc_top(limit: int = 25, path_filter: str = "src") -> str:
+    """Top alokasi per baris (difilter ke kode repo), format teks."""
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return "tracemalloc tidak aktif (set METRICS_TRACEMALLOC=1)\n"
+    snap = tracemalloc.take_snapshot()
+    if path_filter:
+        snap = snap.filter_traces([tracemalloc.Filter(True, f"*{os.sep}{path_filter}{os.sep}*")])
+    lines = []
+    for stat in snap.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KB  {stat.count:8d}  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- HTTP ----------
+_server = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Jalankan endpoint /metrics di thread daemon (sekali per proses). Return server."""
+    global _server
+    if _server is not None:
+        return _server
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                body, ctype = REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.startswith("/tracemalloc"):
+                body, ctype = tracemalloc_top(), "text/plain; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # jangan campur log akses ke output percakapan
+
+    _server = ThreadingHTTPServer((host, int(port)), _Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 Metrics: http://{host}:{_server.server_address[1]}/metrics")
+    return _server
+
+
+def serve_runtime_metrics(cfg, retriever=None, speculative=None):
+    """Daftarkan metrik standar app (proses, cache, index, speculative) lalu buka endpoint."""
+    if not getattr(cfg, "METRICS_PORT", 0):
+        return None
+
+    from src.llm.prompt import analyze_text
+
+    register_process_metrics(cfg.TMP_DIR)
+    register_cache("analyze_text", analyze_text)
+    if retriever is not None:
+        register_retriever(retriever)
+    if callable(getattr(retriever, "status", None)):
+        # IndexService: progres build index di background
+        REGISTRY.callback("cbt_index_build_progress", "Progres embedding build index (0-1).",
+                          lambda: retriever.status()["progress"])
+        REGISTRY.callback("cbt_index_ready", "1 kalau index hasil build terakhir sudah aktif.",
+                          lambda: float(retriever.ready))
+    if speculative is not None:
+        REGISTRY.callback(
+            "cbt_speculative_hit_ratio", "Hit rate retrieval spekulatif.",
+            lambda: speculative.summary()["hit_rate"],
+        )
+        REGISTRY.callback(
+            "cbt_speculative_waste_ratio", "Porsi spekulasi yang dihitung tapi tidak terpakai.",
+            lambda: speculative.summary()["waste_rate"],
+        )
+    return start_metrics_server(cfg.METRICS_PORT, host=cfg.METRICS_HOST)
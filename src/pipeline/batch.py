@@ -0,0 +1,204 @@
+# src/pipeline/batch.py
+"""
+Batch offline untuk arsip rekaman client (tanpa mikrofon):
+
+    WAV -> transcribe -> gate stop/filler/safety -> retrieval -> chat (draft balasan)
+
+Dipakai batch_app.py. Tiap file diproses lewat pipeline yang sama dengan
+turn live (arun_text_turn), dengan N worker coroutine (bounded concurrency)
+di satu event loop, prioritas API BULK supaya turn live tetap didahulukan.
+
+Output JSONL ditulis streaming (satu baris per file, di-flush begitu file
+selesai) dan sekaligus jadi checkpoint: saat run diulang, file yang sudah
+punya baris status "ok" dengan key yang sama (path relatif + ukuran + mtime)
+dilewati. File yang gagal ("error") atau terdegradasi ("degraded", mis.
+balasan ACK_REPLY / tanpa contoh RAG) dicoba lagi di run berikutnya; baris
+terakhir yang terpotong (proses mati saat menulis) diabaikan.
+
+Deadline per tahap (RETRIEVAL_/CHAT_DEADLINE_MS) dimatikan untuk batch:
+deadline itu untuk turn live, sedangkan request BULK memang boleh lama
+mengantre di scheduler.
+"""
+import dataclasses
+import json
+import os
+import time
+
+from src.llm.scheduler import PRIORITY_BULK, api_context
+from src.pipeline.turn import arun_text_turn
+
+AUDIO_EXTENSIONS = (".wav",)
+
+# metadata contoh retrieval di output (teks penuh ada di index)
+EXAMPLE_FIELDS = ("score", "dataset", "session_id", "source_file", "query", "response")
+
+
+def file_key(path: str, root: str) -> str:
+    """Key checkpoint: path relatif + ukuran + mtime (file yang diganti diproses ulang)."""
+    st = os.stat(path)
+    rel = os.path.relpath(path, root).replace(os.sep, "/")
+    return f"{rel}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def iter_audio_files(root: str, extensions=AUDIO_EXTENSIONS):
+    """Semua file audio di bawah root (rekursif), urut nama supaya run bisa diulang."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                yield os.path.join(dirpath, name)
+
+
+def load_checkpoint(out_path: str) -> set[str]:
+    """Key file yang sudah selesai (status "ok") di output sebelumnya."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # baris terakhir terpotong
+            if rec.get("status") == "ok" and rec.get("key"):
+                done.add(rec["key"])
+    return done
+
+
+class JsonlWriter:
+    """Append satu baris JSON per hasil, langsung di-flush (aman untuk resume)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # baris terakhir run sebelumnya bisa terpotong -> mulai di baris baru
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._f = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._f.write("\n")
+
+    def write(self, rec: dict):
+        self._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+class BatchRunner:
+    def __init__(self, cfg, retriever, workers: int = 4, safety=None, atranscribe_fn=None, achat_fn=None):
+        """
+        atranscribe_fn: async callable(wav_path, model) -> str. Default atranscribe_audio.
+        achat_fn      : diteruskan ke arun_text_turn (default achat_completion).
+        """
+        # tanpa deadline per tahap: waktu antre BULK tidak boleh memicu jalur degradasi
+        self.cfg = dataclasses.replace(cfg, RETRIEVAL_DEADLINE_MS=0, CHAT_DEADLINE_MS=0, CHAT_FALLBACK_MS=0)
+        self.retriever = retriever
+        self.workers = max(1, int(workers))
+        self.safety = safety
+        self.achat_fn = achat_fn
+        if atranscribe_fn is None:
+            from src.llm.client import atranscribe_audio as atranscribe_fn
+        self.atranscribe_fn = atranscribe_fn
+
+        self.stats = {"processed": 0, "skipped": 0, "errors": 0, "degraded": 0, "kinds": {}}
+
+    async def _process(self, path: str, root: str, key: str) -> dict:
+        rec = {
+            "key": key,
+            "file": os.path.relpath(path, root).replace(os.sep, "/"),
+            "status": "error",
+            "processed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        timings = {}
+        try:
+            t0 = time.perf_counter()
+            text = (await self.atranscribe_fn(path, model=self.cfg.STT_MODEL) or "").strip()
+            timings["stt_ms"] = _ms_since(t0)
+            rec["transcript"] = text
+            if not text:
+                rec.update(status="ok", kind="empty", reply=None)
+            else:
+                turn = await arun_text_turn(text, self.cfg, self.retriever, achat_fn=self.achat_fn,
+                                            safety=self.safety)
+                timings.update(turn.timings)
+                # hasil terdegradasi bukan checkpoint: run berikutnya memproses ulang
+                rec.update(
+                    status="degraded" if turn.degraded else "ok",
+                    kind=turn.kind,
+                    reply=turn.reply,
+                    examples=[{k: ex.get(k) for k in EXAMPLE_FIELDS} for ex in turn.examples],
+                    degraded=turn.degraded,
+                    safety={"score": turn.safety.score, "exemplar": turn.safety.exemplar} if turn.safety else None,
+                )
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+        rec["timings"] = timings
+        return rec
+
+    async def run(self, root: str, out_path: str, resume: bool = True, limit: int | None = None) -> dict:
+        import asyncio
+
+        done = load_checkpoint(out_path) if resume else set()
+        writer = JsonlWriter(out_path)
+        files = iter(iter_audio_files(root))
+        t0 = time.perf_counter()
+        budget = [limit if limit else float("inf")]
+
+        def _next_file():
+            # dipanggil dari worker di event loop yang sama -> tidak perlu lock
+            for path in files:
+                if budget[0] <= 0:
+                    return None
+                key = file_key(path, root)
+                if key in done:
+                    self.stats["skipped"] += 1
+                    continue
+                budget[0] -= 1
+                return path, key
+            return None
+
+        async def worker():
+            # semua request batch: prioritas BULK, satu "sesi" di antrean fair scheduler
+            with api_context(PRIORITY_BULK, session="batch"):
+                while (item := _next_file()) is not None:
+                    rec = await self._process(item[0], root, item[1])
+                    writer.write(rec)
+                    self._count(rec)
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(self.workers):
+                    tg.create_task(worker())
+        finally:
+            writer.close()
+
+        wall = time.perf_counter() - t0
+        return {
+            **self.stats,
+            "wall_seconds": round(wall, 2),
+            "files_per_s": round(self.stats["processed"] / wall, 3) if wall else 0.0,
+        }
+
+    def _count(self, rec: dict):
+        self.stats["processed"] += 1
+        if rec["status"] == "error":
+            self.stats["errors"] += 1
+            print(f"⚠️ {rec['file']}: {rec.get('error')}")
+            return
+        if rec["status"] == "degraded":
+            self.stats["degraded"] += 1
+            print(f"⏱️ {rec['file']}: degraded ({', '.join(rec['degraded'])}), dicoba lagi di run berikutnya")
+            return
+        kinds = self.stats["kinds"]
+        kinds[rec["kind"]] = kinds.get(rec["kind"], 0) + 1
+        print(f"✅ {rec['file']} [{rec['kind']}] {(rec.get('transcript') or '')[:60]}")
@@ -0,0 +1,238 @@
+# src/pipeline/speculative.py
+"""
+Retrieval + prompt assembly spekulatif dari transkrip sementara.
+
+Alur per turn:
+1) begin_turn()
+2) offer(partial_text)  -> dipanggil tiap ada transkrip sementara (mis. saat user jeda);
+                           CBTRetriever.search + build_messages jalan di background
+3) finalize(final_text) -> kalau teks final cukup mirip dengan teks spekulasi terakhir,
+                           hasil background dipakai (retrieval hilang dari critical path);
+                           kalau tidak, dihitung ulang seperti biasa. Vektor query ikut
+                           dikembalikan (dipakai safety screening semantik)
+
+Statistik hit/waste disimpan di .stats supaya bisa dipantau (diubah dari
+thread STT/pool, jadi selalu di bawah lock; baca lewat summary()).
+Transkrip sementara yang datang terlambat dari turn sebelumnya dibuang
+lewat nomor turn (begin_turn -> turn_id, offer(..., turn=turn_id)).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.llm.lexicon import normalize_text
+from src.llm.prompt import build_messages
+from src.llm.scheduler import PRIORITY_WARMUP, api_context, current_context
+
+
+def token_overlap(partial: str, final: str) -> float:
+    """Porsi token final yang sudah ada di teks spekulasi (0..1)."""
+    p = set(normalize_text(partial).split())
+    f = normalize_text(final).split()
+    if not f:
+        return 0.0
+    return sum(1 for t in f if t in p) / len(f)
+
+
+class _Speculation:
+    def __init__(self, text: str, future, turn: int):
+        self.text = text
+        self.future = future
+        self.turn = turn
+        self.created = time.perf_counter()
+
+
+class SpeculativeRetriever:
+    def __init__(self, retriever, k: int = 3, min_overlap: float = 0.7,
+                 min_cosine: float | None = None, min_tokens: int = 3):
+        """
+        min_overlap: ambang token overlap (teks final vs spekulasi) untuk dianggap hit.
+        min_cosine : kalau diisi, kemiripan diukur via cosine embedding query
+                     (butuh 1 embed untuk teks final, tapi lebih tahan parafrase STT).
+        """
+        self.retriever = retriever
+        self.k = k
+        self.min_overlap = min_overlap
+        self.min_cosine = min_cosine
+        self.min_tokens = min_tokens
+
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cbt-speculative")
+        self._lock = threading.Lock()
+        self._current = None
+        self._turn = 0
+
+        self.stats = {
+            "offered": 0,
+            "started": 0,
+            "hits": 0,
+            "misses": 0,
+            "wasted": 0,     # spekulasi yang dihitung tapi tidak terpakai
+            "saved_ms": 0.0,  # estimasi waktu retrieval yang keluar dari critical path
+        }
+
+    # ---------- background work ----------
+    def _compute(self, text: str, session: str) -> dict:
+        t0 = time.perf_counter()
+        # spekulasi boleh tertunda kalau kuota API dipakai turn live
+        with api_context(PRIORITY_WARMUP, session=session):
+            qvec = self.retriever.embed_query(text)
+            examples = self.retriever.search(text, k=self.k, qvec=qvec)
+        messages = build_messages(text, examples)
+        return {
+            "qvec": qvec,
+            "examples": examples,
+            "messages": messages,
+            "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+        }
+
+    def _bump(self, key: str, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    # ---------- API ----------
+    @property
+    def turn_id(self) -> int:
+        return self._turn
+
+    def begin_turn(self) -> int:
+        """Mulai turn baru: spekulasi turn sebelumnya dibuang. Return nomor turn."""
+        with self._lock:
+            self._discard(self._current)
+            self._current = None
+            self._turn += 1
+            return self._turn
+
+    def offer(self, partial_text: str, turn: int | None = None):
+        """
+        Mulai spekulasi untuk transkrip sementara (non-blocking).
+        turn: nomor turn saat audio direkam; kalau sudah lewat, teks dibuang.
+        """
+        text = (partial_text or "").strip()
+        self._bump("offered")
+        if len(normalize_text(text).split()) < self.min_tokens:
+            return
+
+        with self._lock:
+            if turn is not None and turn != self._turn:
+                return  # transkrip telat dari turn sebelumnya
+            if self._current is not None and normalize_text(self._current.text) == normalize_text(text):
+                return
+            # spekulasi lama digantikan yang lebih baru
+            self._discard(self._current)
+            session = current_context()[1]
+            self._current = _Speculation(text, self._pool.submit(self._compute, text, session), self._turn)
+            self.stats["started"] += 1
+
+    def _discard(self, spec):
+        # dipanggil dengan self._lock dipegang
+        if spec is None:
+            return
+        # kalau belum sempat jalan, batalkan; kalau sudah jalan, hitung sebagai waste
+        if not spec.future.cancel():
+            self.stats["wasted"] += 1
+
+    def _is_close(self, spec, result: dict, final_text: str):
+        if token_overlap(spec.text, final_text) >= self.min_overlap:
+            return True, None
+        if self.min_cosine is not None:
+            import numpy as np
+
+            final_vec = self.retriever.embed_query(final_text)
+            cos = float(np.dot(result["qvec"][0], final_vec[0]))
+            return cos >= self.min_cosine, final_vec
+        return False, None
+
+    def finalize(self, final_text: str, timeout: float | None = None,
+                 final_vec: bool = False) -> tuple[list[dict], list[dict], bool, object]:
+        """
+        Return (examples, messages, hit, qvec). messages selalu berisi teks FINAL user.
+        qvec: vektor teks final, atau (hit tanpa min_cosine) vektor transkrip sementara.
+        final_vec=True: qvec selalu vektor teks final (mis. untuk safety screening:
+                        klausa yang baru muncul di teks final tetap ikut dinilai),
+                        walaupun hit lewat token overlap.
+        """
+        final_text = (final_text or "").strip()
+        with self._lock:
+            spec, self._current = self._current, None
+            # offer() telat dari turn ini tidak boleh jadi spekulasi turn berikutnya
+            self._turn += 1
+
+        need_final = final_vec
+        final_vec = None
+        if spec is not None and not spec.future.cancelled():
+            try:
+                result = spec.future.result(timeout=timeout)
+            except Exception as e:
+                print(f"⚠️ Speculative retrieval gagal: {e}")
+                result = None
+
+            if result is not None:
+                close, final_vec = self._is_close(spec, result, final_text)
+                if close:
+                    with self._lock:
+                        self.stats["hits"] += 1
+                        self.stats["saved_ms"] += result["elapsed_ms"]
+                    messages = list(result["messages"])
+                    messages[-1] = {"role": "user", "content": final_text}
+                    if final_vec is None and need_final and final_text:
+                        same = normalize_text(spec.text) == normalize_text(final_text)
+                        final_vec = result["qvec"] if same else self.retriever.embed_query(final_text)
+                    qvec = final_vec if final_vec is not None else result["qvec"]
+                    return result["examples"], messages, True, qvec
+            self._bump("wasted")
+
+        self._bump("misses")
+        if final_vec is None and final_text:
+            final_vec = self.retriever.embed_query(final_text)
+        examples = self.retriever.search(final_text, k=self.k, qvec=final_vec)
+        return examples, build_messages(final_text, examples), False, final_vec
+
+    def summary(self) -> dict:
+        with self._lock:
+            st = dict(self.stats)
+        finalized = st["hits"] + st["misses"]
+        st["hit_rate"] = round(st["hits"] / finalized, 3) if finalized else 0.0
+        st["waste_rate"] = round(st["wasted"] / st["started"], 3) if st["started"] else 0.0
+        return st
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def make_partial_transcriber(speculative: SpeculativeRetriever, tmp_dir: str, stt_model: str):
+    """
+    Buat callback on_pause untuk record_wav(): audio sementara disimpan,
+    ditranskrip di thread terpisah, lalu ditawarkan ke speculative.offer().
+    """
+    from src.llm.client import transcribe_audio
+
+    lock = threading.Lock()
+    counter = [0]
+
+    def _worker(audio, sample_rate, path, session, turn):
+        import soundfile as sf
+
+        try:
+            sf.write(path, audio, sample_rate)
+            with api_context(PRIORITY_WARMUP, session=session):
+                text = transcribe_audio(path, model=stt_model)
+            if text:
+                speculative.offer(text, turn=turn)
+        except Exception as e:
+            print(f"⚠️ Transkrip sementara gagal: {e}")
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def on_pause(audio, sample_rate):
+        with lock:
+            counter[0] += 1
+            path = os.path.join(tmp_dir, f"user_partial_{counter[0]}.wav")
+        session = current_context()[1]
+        turn = speculative.turn_id
+        threading.Thread(target=_worker, args=(audio, sample_rate, path, session, turn), daemon=True).start()
+
+    return on_pause
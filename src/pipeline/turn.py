@@ -0,0 +1,341 @@
+# src/pipeline/turn.py
+"""
+Bagian teks dari satu turn (setelah STT, sebelum TTS):
+
+    gate stop / filler / safety -> embed query -> safety semantik -> retrieval
+    -> build_messages -> chat
+
+Safety semantik (src/llm/safety.py) memakai vektor query yang sama dengan
+retrieval, jadi tidak menambah panggilan API; keyword tetap pre-filter di gate.
+Kalau retrieval tidak menghasilkan vektor, query di-embed khusus untuk safety;
+kalau itu juga lewat deadline, turn ditandai "safety_unscreened".
+
+Dipakai app.py, app_gui.py dan load generator (src/bench/replay.py), jadi
+urutan gate dan prompt yang diuji sama persis dengan yang jalan di CLI/GUI.
+
+Deadline per tahap (0 = tanpa deadline), dengan hedged request (src/llm/hedging.py):
+- retrieval lewat RETRIEVAL_DEADLINE_MS -> jawab tanpa contoh RAG
+- chat lewat CHAT_DEADLINE_MS -> retry dengan CHAT_FALLBACK_MAX_TOKENS;
+  kalau itu juga lewat CHAT_FALLBACK_MS -> ACK_REPLY
+Selama index pertama masih dibangun di background (src/data/index_service.py)
+turn dijawab tanpa contoh RAG ("index_building").
+Jalur degradasi yang dipakai dicatat di TurnResult.degraded.
+
+arun_text_turn: versi asyncio (client async di src/llm/client.py). Tahap yang
+tidak saling bergantung (retrieval, prefetch mis. klip ack) jalan bersamaan
+di satu asyncio.TaskGroup; kalau turn di-cancel (user menyela) atau satu
+tahap gagal, semua request yang masih jalan ikut di-cancel.
+"""
+import time
+from dataclasses import dataclass, field
+
+from src.data.index_service import IndexNotReady
+from src.llm.hedging import DeadlineExceeded, acall_hedged, call_hedged
+from src.llm.prompt import analyze_text, build_messages, safety_reply
+
+# (opsional) pesan untuk filler
+FILLER_REPLY = (
+    "Aku denger kok. Nggak apa-apa kalau kamu lagi mikir atau jeda sebentar. "
+    "Lanjutkan aja pelan-pelan, aku dengerin."
+)
+
+# (opsional) pesan penutup saat user bilang "sudah/stop"
+STOP_REPLY = (
+    "Oke, kita berhenti dulu ya. Terima kasih sudah cerita—jaga diri baik-baik. "
+    "Kalau kapan-kapan kamu mau lanjut, aku siap dengerin. Sampai ketemu lagi."
+)
+
+# balasan terakhir kalau LLM tidak menjawab dalam deadline
+ACK_REPLY = (
+    "Maaf, aku butuh waktu sebentar untuk mencerna ceritamu. "
+    "Boleh ceritakan sedikit lagi apa yang paling terasa berat buat kamu?"
+)
+
+
+@dataclass
+class TurnResult:
+    kind: str                      # "stop" | "filler" | "safety" | "chat"
+    reply: str
+    examples: list = field(default_factory=list)
+    messages: list | None = None
+    timings: dict = field(default_factory=dict)
+    speculative_hit: bool | None = None
+    degraded: list = field(default_factory=list)   # mis. ["no_retrieval", "chat_short"]
+    safety: object | None = None                   # SafetyHit kalau kena screening semantik
+    prefetched: dict = field(default_factory=dict)  # hasil tahap prefetch (arun_text_turn)
+
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+def _seconds(ms) -> float | None:
+    return ms / 1000.0 if ms else None
+
+
+def _retrieve(user_text: str, cfg, retriever, degraded: list):
+    """
+    Embed query (hedged, ber-deadline) lalu search; lewat deadline -> tanpa contoh.
+    Return (examples, qvec); qvec None kalau embedding tidak didapat.
+    """
+    try:
+        qvec = call_hedged("embeddings", lambda: retriever.embed_query(user_text),
+                           deadline_s=_seconds(cfg.RETRIEVAL_DEADLINE_MS))
+        return retriever.search(user_text, k=cfg.TOP_K, qvec=qvec), qvec
+    except DeadlineExceeded:
+        degraded.append("no_retrieval")
+    except IndexNotReady:
+        degraded.append("index_building")
+    return [], None
+
+
+def _screens(cfg, safety) -> bool:
+    return safety is not None and cfg.ENABLE_SAFETY
+
+
+def _safety_args(cfg, retriever) -> tuple[str, int | None]:
+    """(model, dimensions) untuk screening: milik index aktif, atau config selama index dibangun."""
+    try:
+        return retriever.embed_args()
+    except IndexNotReady:
+        return cfg.EMBED_MODEL, cfg.EMBED_DIMENSIONS or None
+
+
+def _screen_vec(safety, qvec, model: str, dimensions: int | None):
+    hit = safety.screen(qvec, model, dimensions)
+    if hit is not None:
+        print(f"⚠️ Safety semantik: {hit.score:.2f} mirip \"{hit.exemplar}\"")
+    return hit
+
+
+def _screen(user_text: str, cfg, retriever, safety, qvec, degraded: list):
+    """
+    Safety semantik dengan vektor query retrieval; None = lolos / tidak bisa dinilai.
+    Tanpa vektor retrieval, query di-embed sendiri (matriks contoh tidak butuh index).
+    """
+    if not _screens(cfg, safety):
+        return None
+    model, dimensions = _safety_args(cfg, retriever)
+    if qvec is None:
+        try:
+            qvec = call_hedged("embeddings", lambda: safety.embed_query(user_text, model, dimensions),
+                               deadline_s=_seconds(cfg.RETRIEVAL_DEADLINE_MS))
+        except DeadlineExceeded:
+            degraded.append("safety_unscreened")
+            return None
+    return _screen_vec(safety, qvec, model, dimensions)
+
+
+def _chat(messages, cfg, chat_fn, degraded: list) -> str:
+    try:
+        return call_hedged(
+            "chat", lambda: chat_fn(messages, model=cfg.CHAT_MODEL, temperature=0.4),
+            deadline_s=_seconds(cfg.CHAT_DEADLINE_MS),
+        )
+    except DeadlineExceeded:
+        degraded.append("chat_short")
+
+    # retry jawaban pendek (lebih cepat selesai), tanpa hedge supaya tidak menumpuk request
+    try:
+        return call_hedged(
+            "chat",
+            lambda: chat_fn(messages, model=cfg.CHAT_MODEL, temperature=0.4,
+                            max_tokens=cfg.CHAT_FALLBACK_MAX_TOKENS),
+            deadline_s=_seconds(cfg.CHAT_FALLBACK_MS), hedge=False,
+        )
+    except DeadlineExceeded:
+        degraded.append("chat_ack")
+        return ACK_REPLY
+
+
+def gate_turn(user_text: str, cfg) -> TurnResult | None:
+    """Gate stop / filler / safety; None = lanjut ke retrieval + chat."""
+    signals = analyze_text(user_text)
+
+    # stop intent: user bilang "sudah/stop/selesai" -> tutup sesi tanpa tanya lagi
+    if signals.stop:
+        return TurnResult("stop", STOP_REPLY)
+
+    # filler/gumaman: "mmm/eh/hah/oh" -> jangan proses RAG/LLM
+    if signals.filler:
+        return TurnResult("filler", FILLER_REPLY)
+
+    # safety gate
+    if cfg.ENABLE_SAFETY and signals.high_risk:
+        return TurnResult("safety", safety_reply())
+    return None
+
+
+def run_text_turn(user_text: str, cfg, retriever, chat_fn=None, speculative=None,
+                  safety=None) -> TurnResult:
+    """
+    chat_fn: callable(messages, model, temperature, max_tokens=None) -> str. Default chat_completion
+             (bisa diganti stand-in lokal untuk load test).
+    speculative: SpeculativeRetriever (opsional); kalau ada, retrieval diambil dari finalize().
+    safety: SemanticSafety (opsional); query yang mirip contoh krisis -> balasan safety.
+    """
+    gated = gate_turn(user_text, cfg)
+    if gated is not None:
+        return gated
+
+    # retrieve (gabungan HOPE + HQC)
+    t0 = time.perf_counter()
+    hit = None
+    degraded = []
+    if speculative is not None and getattr(retriever, "available", True):
+        # safety aktif: screening pakai vektor teks FINAL, bukan transkrip sementara
+        examples, messages, hit, qvec = speculative.finalize(user_text, final_vec=_screens(cfg, safety))
+    else:
+        examples, qvec = _retrieve(user_text, cfg, retriever, degraded)
+        messages = build_messages(user_text, examples)
+    timings = {"retrieval_ms": _ms_since(t0)}
+
+    # safety semantik: satu matmul dengan vektor query yang sudah ada
+    risk = _screen(user_text, cfg, retriever, safety, qvec, degraded)
+    if risk is not None:
+        return TurnResult("safety", safety_reply(), timings=timings, speculative_hit=hit,
+                          degraded=degraded, safety=risk)
+
+    # LLM
+    if chat_fn is None:
+        from src.llm.client import chat_completion as chat_fn
+
+    t0 = time.perf_counter()
+    reply = _chat(messages, cfg, chat_fn, degraded)
+    timings["llm_ms"] = _ms_since(t0)
+
+    return TurnResult("chat", reply, examples=examples, messages=messages, timings=timings,
+                      speculative_hit=hit, degraded=degraded)
+
+
+
+# ---------- asyncio ----------
+async def _aretrieve(user_text: str, cfg, retriever, degraded: list):
+    import asyncio
+
+    try:
+        qvec = await acall_hedged("embeddings", lambda: retriever.aembed_query(user_text),
+                                  deadline_s=_seconds(cfg.RETRIEVAL_DEADLINE_MS))
+        # search = matmul faiss/numpy (melepas GIL) -> thread, loop tetap bebas
+        return await asyncio.to_thread(retriever.search, user_text, k=cfg.TOP_K, qvec=qvec), qvec
+    except DeadlineExceeded:
+        degraded.append("no_retrieval")
+    except IndexNotReady:
+        degraded.append("index_building")
+    return [], None
+
+
+async def _ascreen(user_text: str, cfg, retriever, safety, qvec, degraded: list):
+    """_screen() untuk coroutine: embed khusus safety jalan di thread, loop tetap bebas."""
+    import asyncio
+
+    if not _screens(cfg, safety):
+        return None
+    model, dimensions = _safety_args(cfg, retriever)
+    if qvec is None:
+        try:
+            qvec = await acall_hedged(
+                "embeddings",
+                lambda: asyncio.to_thread(safety.embed_query, user_text, model, dimensions),
+                deadline_s=_seconds(cfg.RETRIEVAL_DEADLINE_MS),
+            )
+        except DeadlineExceeded:
+            degraded.append("safety_unscreened")
+            return None
+    return _screen_vec(safety, qvec, model, dimensions)
+
+
+async def _achat(messages, cfg, achat_fn, degraded: list) -> str:
+    try:
+        return await acall_hedged(
+            "chat", lambda: achat_fn(messages, model=cfg.CHAT_MODEL, temperature=0.4),
+            deadline_s=_seconds(cfg.CHAT_DEADLINE_MS),
+        )
+    except DeadlineExceeded:
+        degraded.append("chat_short")
+
+    try:
+        return await acall_hedged(
+            "chat",
+            lambda: achat_fn(messages, model=cfg.CHAT_MODEL, temperature=0.4,
+                             max_tokens=cfg.CHAT_FALLBACK_MAX_TOKENS),
+            deadline_s=_seconds(cfg.CHAT_FALLBACK_MS), hedge=False,
+        )
+    except DeadlineExceeded:
+        degraded.append("chat_ack")
+        return ACK_REPLY
+
+
+async def _timed(coro, timings: dict, key: str):
+    t0 = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[key] = _ms_since(t0)
+
+
+async def arun_text_turn(user_text: str, cfg, retriever, achat_fn=None, speculative=None,
+                         prefetch: dict | None = None, safety=None) -> TurnResult:
+    """
+    Sama dengan run_text_turn, tapi async.
+
+    achat_fn : async callable(messages, model, temperature, max_tokens=None) -> str.
+               Default achat_completion.
+    prefetch : {nama: callable() -> awaitable} yang dijalankan bersamaan dengan
+               retrieval + chat (mis. siapkan klip ack TTS); hasilnya di
+               TurnResult.prefetched, durasinya di timings["<nama>_ms"].
+               Turn selesai setelah semua prefetch selesai; prefetch yang gagal
+               dicatat di degraded ("prefetch_<nama>") tanpa menggagalkan turn.
+    """
+    import asyncio
+
+    gated = gate_turn(user_text, cfg)
+    if gated is not None:
+        return gated
+
+    if achat_fn is None:
+        from src.llm.client import achat_completion as achat_fn
+
+    degraded = []
+    timings = {}
+    hit = None
+    risk = None
+
+    async def _retrieval():
+        nonlocal hit
+        if speculative is not None and getattr(retriever, "available", True):
+            examples, messages, hit, qvec = await asyncio.to_thread(
+                speculative.finalize, user_text, final_vec=_screens(cfg, safety))
+            return examples, messages, qvec
+        examples, qvec = await _aretrieve(user_text, cfg, retriever, degraded)
+        return examples, build_messages(user_text, examples), qvec
+
+    async def _answer():
+        nonlocal risk
+        examples, messages, qvec = await _timed(_retrieval(), timings, "retrieval_ms")
+        risk = await _ascreen(user_text, cfg, retriever, safety, qvec, degraded)
+        if risk is not None:
+            return examples, messages, None
+        reply = await _timed(_achat(messages, cfg, achat_fn, degraded), timings, "llm_ms")
+        return examples, messages, reply
+
+    async def _prefetch(name: str, fn):
+        # prefetch opsional: gagal -> dicatat, turn tetap jalan
+        try:
+            return await _timed(fn(), timings, f"{name}_ms")
+        except Exception as e:
+            degraded.append(f"prefetch_{name}")
+            print(f"⚠️ Prefetch {name} gagal: {e}")
+            return None
+
+    async with asyncio.TaskGroup() as tg:
+        answer = tg.create_task(_answer())
+        extra = {name: tg.create_task(_prefetch(name, fn)) for name, fn in (prefetch or {}).items()}
+
+    examples, messages, reply = answer.result()
+    prefetched = {name: t.result() for name, t in extra.items()}
+    if risk is not None:
+        return TurnResult("safety", safety_reply(), timings=timings, speculative_hit=hit,
+                          degraded=degraded, safety=risk, prefetched=prefetched)
+    return TurnResult("chat", reply, examples=examples, messages=messages, timings=timings,
+                      speculative_hit=hit, degraded=degraded, prefetched=prefetched)